@@ -0,0 +1,62 @@
+# anomaly.py
+from collections import OrderedDict
+import pandas as pd
+import fx, ledger
+
+
+# ---------- Settings ----------
+WINDOW = 30          # trailing expenses per (user, category) used as "normal"
+MIN_HISTORY = 5      # fewer earlier expenses than this and nothing is judged
+THRESHOLD = 3.5      # robust z-score above which an expense is flagged
+
+_cache = OrderedDict()   # (ledger version, fx version) -> scores
+_CACHE_SIZE = 4
+
+
+# ---------- Detection ----------
+# Scores every expense in the ledger in one pass. Each expense is compared
+# with the WINDOW expenses before it in the same user and category: the
+# rolling median is the centre and the rolling interquartile range (scaled
+# to a standard deviation) the spread, so a few earlier outliers do not
+# hide the next one. The current expense is shifted out of its own window.
+def score(df):
+    exp = df[df["Type"] == "Expense"]
+    out = pd.DataFrame(index=exp.index, columns=["Median", "Score", "Flag"])
+    if exp.empty:
+        return out.astype({"Flag": bool})
+
+    frame = pd.DataFrame({
+        "User": exp["User"].fillna(""),
+        "Category": exp["Category"].fillna(""),
+        "Date": pd.to_datetime(exp["Date"], errors="coerce"),
+        "Amount": fx.to_base(exp).astype(float),
+    }, index=exp.index).sort_values("Date", kind="stable")
+    keys = ["User", "Category"]
+    frame["Prior"] = frame.groupby(keys, sort=False)["Amount"].shift(1)
+
+    rolling = frame.groupby(keys, sort=False)["Prior"].rolling(WINDOW, min_periods=MIN_HISTORY)
+    median = rolling.median().droplevel(keys)
+    iqr = (rolling.quantile(0.75) - rolling.quantile(0.25)).droplevel(keys)
+
+    # A flat history (rent, subscriptions) has no spread; fall back to a
+    # small share of the median so a jump still registers. Amounts are minor
+    # units, so the floor is one whole unit.
+    scale = pd.concat([iqr / 1.349, median.abs() * 0.05], axis=1).max(axis=1).clip(lower=ledger.MINOR_UNITS)
+    z = (frame["Amount"] - median.reindex(frame.index)) / scale.reindex(frame.index)
+
+    out["Median"] = median.reindex(exp.index)
+    out["Score"] = z.reindex(exp.index)
+    out["Flag"] = (out["Score"].abs() > THRESHOLD).fillna(False)
+    return out
+
+# Batch scores are computed once per ledger version and FX table.
+def detect(df, version):
+    key = (version, fx.load_rates()["version"])
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+    result = score(df)
+    _cache[key] = result
+    while len(_cache) > _CACHE_SIZE:
+        _cache.popitem(last=False)
+    return result
@@ -0,0 +1,303 @@
+# api.py
+import json, math, re, threading, argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import pandas as pd
+import cube, dedupe, fx, ledger, migrate, quota
+
+
+# ---------- Settings ----------
+HOST = "127.0.0.1"
+PORT = 8765
+MAX_LIMIT = 5000
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ---------- Shared ledger handle ----------
+# Every request thread works on one loaded ledger instead of opening and
+# parsing the CSV per request. It is reloaded only when the file version
+# changes (e.g. the Streamlit app wrote it), and writes go through the lock
+# so request threads never interleave a read-modify-write. Row labels are
+# kept equal to row positions in the file, so an idx handed out by one
+# response addresses the same row as a fresh load of that version.
+_lock = threading.RLock()
+_store = {"version": None, "df": None}
+
+
+def _frame():
+    with _lock:
+        version = ledger.ledger_version()
+        if _store["version"] != version:
+            df = ledger.load_ledger()
+            quota.sync(df)
+            cube.sync(df)
+            dedupe.sync(df)
+            _store.update(version=version, df=df)
+        return _store["df"], _store["version"]
+
+def _write(change):
+    with _lock, ledger.locked():
+        df, version = _frame()
+        df = change(df).reset_index(drop=True)
+        _store.update(version=ledger.ledger_version(), df=df)
+        return _store["version"]
+
+def _plan(user):
+    plan = quota.plan_of(user)
+    if plan is None:
+        raise ApiError(404, f"unknown user {user!r}")
+    return plan
+
+
+# ---------- Records in and out ----------
+def _record_out(idx, row):
+    out = {"idx": int(idx)}
+    for c in ledger.LEDGER_COLUMNS:
+        value = row[c]
+        if c in ledger.MONEY_COLUMNS:
+            value = ledger.format_minor(value) or None
+        elif c == "Date":
+            value = value.strftime("%Y-%m-%d") if pd.notna(value) else None
+        elif c == "Units":
+            value = None if pd.isna(value) else float(value)
+        out[c] = value
+    return out
+
+# Validates one JSON record (decimal amounts, ISO dates) and converts it to
+# ledger form. `partial` allows a subset of fields, for edits.
+def _record_in(body, partial=False):
+    if not isinstance(body, dict):
+        raise ApiError(400, "a record must be a JSON object")
+    unknown = set(body) - set(ledger.LEDGER_COLUMNS) - {"idx"}
+    if unknown:
+        raise ApiError(400, f"unknown fields: {sorted(unknown)}")
+    required = [] if partial else ["Type", "Amount", "Category", "Date"]
+    missing = [c for c in required if body.get(c) in (None, "")]
+    if missing:
+        raise ApiError(400, f"missing fields: {missing}")
+    record = {c: v for c, v in body.items() if c in ledger.LEDGER_COLUMNS and c != "User"}
+    if "Type" in record and record["Type"] not in migrate.TYPES:
+        raise ApiError(400, f"Type must be one of {migrate.TYPES}")
+    try:
+        for c in ledger.MONEY_COLUMNS:
+            if record.get(c) not in (None, ""):
+                record[c] = ledger.to_minor(record[c])
+                if record[c] < 0:
+                    raise ApiError(400, f"{c} must not be negative")
+        if "Date" in record:
+            record["Date"] = pd.Timestamp(record["Date"])
+        if record.get("Units") not in (None, ""):
+            record["Units"] = float(record["Units"])
+            if not math.isfinite(record["Units"]):
+                raise ApiError(400, "Units must be a finite number")
+    except (TypeError, ValueError, OverflowError) as e:
+        raise ApiError(400, str(e))
+    if "Currency" in record:
+        _currency(record["Currency"])
+    return record
+
+def _currency(currency):
+    if currency not in fx.currencies():
+        raise ApiError(400, f"unknown currency {currency!r}")
+    return currency
+
+def _count(name, value):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"{name} must be a whole number, not {value!r}")
+    if value < 0:
+        raise ApiError(400, f"{name} must not be negative")
+    return value
+
+def _owned(df, user, idx):
+    try:
+        idx = int(idx)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"bad idx {idx!r}")
+    if idx not in df.index:
+        raise ApiError(404, f"no record {idx}")
+    if df.at[idx, "User"] not in (user, ""):
+        raise ApiError(403, f"record {idx} belongs to another user")
+    return idx
+
+
+# ---------- Operations ----------
+def list_records(user, type=None, category=None, month=None, q=None, limit=100, offset=0):
+    df, version = _frame()
+    rows = ledger.user_rows(df, user)
+    if type:
+        rows = rows[rows["Type"] == type]
+    if category:
+        rows = rows[rows["Category"] == category]
+    if month:
+        rows = rows[rows["Date"].dt.strftime("%Y-%m") == month]
+    if q:
+        rows = rows[rows["Note"].str.contains(q, case=False, na=False, regex=False)]
+    limit, offset = min(_count("limit", limit), MAX_LIMIT), _count("offset", offset)
+    page = rows.iloc[offset:offset + limit]
+    return {
+        "version": version,
+        "total": len(rows),
+        "records": [_record_out(idx, row) for idx, row in page.iterrows()],
+    }
+
+# Applies a batch of adds, edits and deletes for one user in a single ledger
+# write. With `version`, the batch is refused if the ledger changed since
+# the client read it, so idx values cannot point at shifted rows. Added
+# records identical to one already recorded, or to another in the batch,
+# are refused like the app's add forms do, unless `allow_duplicates`.
+def apply_batch(user, add=(), update=(), delete=(), version=None, allow_duplicates=False):
+    plan = _plan(user)
+    add = [_record_in(r) for r in add]
+    edits = {}
+    for r in update:
+        if not isinstance(r, dict) or "idx" not in r:
+            raise ApiError(400, "each update needs an idx")
+        edits[r["idx"]] = _record_in({k: v for k, v in r.items() if k != "idx"}, partial=True)
+
+    def change(df):
+        if version is not None and version != _store["version"]:
+            raise ApiError(409, "the ledger changed since this version; reload and retry")
+        updates = {_owned(df, user, idx): rec for idx, rec in edits.items()}
+        deletes = [_owned(df, user, idx) for idx in delete]
+        if add and not allow_duplicates:
+            hashes = dedupe.content_hashes(dedupe.normalize(pd.DataFrame(add, columns=ledger.LEDGER_COLUMNS), user))
+            kinds = dedupe.check(add, user)
+            for n, (kind, repeated) in enumerate(zip(kinds, hashes.duplicated())):
+                if kind == dedupe.EXACT or repeated:
+                    raise ApiError(409, f"added record {n} is identical to one already recorded; "
+                                        "send allow_duplicates to add it anyway")
+        if add:
+            try:
+                quota.admit(user, plan, len(add))
+            except quota.QuotaExceeded as e:
+                raise ApiError(409, str(e))
+        try:
+            return ledger.apply_changes(df, add=add, update=updates, delete=deletes, user=user)
+        except ledger.Conflict as e:
+            raise ApiError(409, str(e))
+
+    new_version = _write(change)
+    return {"version": new_version, "added": len(add), "updated": len(edits), "deleted": len(delete)}
+
+# Dashboard cards: per-Type sums and counts, and the balance.
+def totals(user, currency=fx.BASE_CURRENCY):
+    _currency(currency)
+    _frame()
+    view = cube.view(user, currency)
+    out = {}
+    for typ in migrate.TYPES:
+        total, count = cube.totals(view, typ)
+        out[typ] = {"sum": round(total, 2), "count": count}
+    out["Balance"] = round(out["Income"]["sum"] - out["Expense"]["sum"] - out["Investment"]["sum"], 2)
+    return {"currency": currency, "totals": out}
+
+def monthly(user, currency=fx.BASE_CURRENCY, type=None):
+    _currency(currency)
+    _frame()
+    view = cube.view(user, currency)
+    if type:
+        view = view[view["Type"] == type]
+    grouped = view[view["Month"] != ""].groupby(["Month", "Type"], as_index=False)[["Sum", "Count"]].sum()
+    return {
+        "currency": currency,
+        "months": [{"month": m, "type": t, "sum": round(float(s), 2), "count": int(c)}
+                   for m, t, s, c in grouped[["Month", "Type", "Sum", "Count"]].itertuples(index=False)],
+    }
+
+
+# ---------- HTTP ----------
+RECORD_PATH = re.compile(r"^/records/(\d+)$")
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            raise ApiError(400, "body is not valid JSON")
+
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            body = self._body() if method in ("POST", "PATCH") else {}
+            user = params.pop("user", None) or body.get("user")
+            if not user:
+                raise ApiError(400, "user is required")
+            match = RECORD_PATH.match(url.path)
+            if method == "GET" and url.path == "/records":
+                result = list_records(user, **params)
+            elif method == "GET" and url.path == "/totals":
+                result = totals(user, **params)
+            elif method == "GET" and url.path == "/monthly":
+                result = monthly(user, **params)
+            elif method == "POST" and url.path == "/records":
+                result = apply_batch(user, add=[body.get("record")], version=body.get("version"),
+                                     allow_duplicates=bool(body.get("allow_duplicates")))
+            elif method == "POST" and url.path == "/batch":
+                result = apply_batch(user, body.get("add", []), body.get("update", []),
+                                     body.get("delete", []), body.get("version"),
+                                     bool(body.get("allow_duplicates")))
+            elif method == "PATCH" and match:
+                record = dict(body.get("record") or {}, idx=int(match.group(1)))
+                result = apply_batch(user, update=[record], version=body.get("version"))
+            elif method == "DELETE" and match:
+                result = apply_batch(user, delete=[int(match.group(1))], version=params.get("version"))
+            else:
+                raise ApiError(404, f"no route for {method} {url.path}")
+            self._send(200, result)
+        except ApiError as e:
+            self._send(e.status, {"error": str(e)})
+        except TypeError as e:
+            self._send(400, {"error": str(e)})
+        except Exception as e:
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+def make_server(host=HOST, port=PORT):
+    migrate.ensure()
+    _frame()
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local JSON API over the ledger.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+    server = make_server(args.host, args.port)
+    print(f"Serving on http://{args.host}:{args.port}")
+    server.serve_forever()
@@ -4,14 +4,13 @@ from datetime import date
 from streamlit_option_menu import option_menu
 import pandas as pd
 import plotly.express as px
-import os, json
-from pandas.errors import EmptyDataError
+import os, json, functools
+import anomaly, auth, categorizer, cube, dedupe, forecast, fx, ledger, goals, memory, migrate, photos, prices, quota, recurring, sessions, theme, timeline
 
 
 # ---------- Files for persistence ----------
 DATA_FILE = "expenses.csv"
 ACCOUNTS_FILE = "accounts.json"
-LOGIN_FILE = "login.json"
 
 # ---------- Utility functions ----------
 def load_accounts():
@@ -27,22 +26,41 @@ def save_accounts(accounts):
     with open(ACCOUNTS_FILE, "w") as f:
         json.dump(accounts, f)
 
+# A login is remembered for this browser only, by the session token in the
+# page URL (?sid=...). Reloading the page keeps it; other browsers start at
+# the login page. The token is short-lived and replaced with a new one each
+# time a page load restores the login (see sessions.py).
 def load_login():
-    if os.path.exists(LOGIN_FILE):
-        try:
-            with open(LOGIN_FILE, "r") as f:
-                return json.load(f)
-        except:
-            return None
-    return None
+    email, token = sessions.rotate(st.query_params.get("sid"))
+    found = next((acc for acc in st.session_state.accounts if acc["email"] == email), None) if email else None
+    if found is None:
+        sessions.revoke(token)
+        st.query_params.pop("sid", None)
+    else:
+        st.query_params["sid"] = token
+    return found
 
 def save_login(user):
-    with open(LOGIN_FILE, "w") as f:
-        json.dump(user, f)
+    st.query_params["sid"] = sessions.create(user["email"])
 
 def clear_login():
-    if os.path.exists(LOGIN_FILE):
-        os.remove(LOGIN_FILE)
+    sessions.revoke(st.query_params.get("sid"))
+    st.query_params.pop("sid", None)
+
+# ---------- Theme ----------
+# One shared stylesheet per run, and the run's render payload is metered.
+theme.inject()
+
+# ---------- Schema ----------
+# Legacy files are consolidated into the ledger and accounts.json once; on
+# every later start this is a constant-time version check.
+try:
+    report = migrate.ensure()
+except Exception as e:
+    st.error(f"Data migration failed: {e}")
+    st.stop()
+if report and report["quarantined"]:
+    st.toast(f"{report['quarantined']} unreadable record(s) were moved to quarantine during migration.")
 
 # ---------- Session Defaults ----------
 if "accounts" not in st.session_state:
@@ -56,7 +74,7 @@ if "show_signup" not in st.session_state:
     st.session_state.show_signup = False
 
 if "data" not in st.session_state:
-    st.session_state.data = pd.DataFrame(columns=["Type", "Amount", "Category", "Date", "Note"])
+    st.session_state.data = ledger.empty_ledger()
 
 # ----------------- Authentication -----------------
 def login_page():
@@ -75,13 +93,26 @@ def login_page():
         password = st.text_input("Password", type="password", key="login_pass")
         if st.button("Login", use_container_width=True):
             found = next((acc for acc in st.session_state.accounts if acc["email"] == email), None)
-            if found and password == found.get("password"):
+            # Hashing runs on the auth worker pool; accounts still holding a
+            # plain-text password are re-saved with a hash on their next login.
+            try:
+                ok, rehashed = auth.verify(email, password, found.get("password") if found else None)
+                if rehashed:
+                    found["password"] = rehashed
+                    save_accounts(st.session_state.accounts)
+            except auth.RateLimited as e:
+                st.error(f"Too many failed attempts. Please try again in {e.retry_after} seconds.")
+                ok = None
+            except auth.Busy:
+                st.error("The server is busy signing people in. Please try again in a moment.")
+                ok = None
+            if ok:
                 st.session_state.logged_in = True
                 st.session_state.user = found
                 save_login(found)  # persist login
                 st.success(f"Welcome back, {found['first_name']}!")
                 st.rerun()
-            else:
+            elif ok is not None:
                 st.error("Invalid credentials or user not found.")
 
         st.markdown("Don't have an account?")
@@ -107,12 +138,19 @@ def signup_page():
         password = st.text_input("Password", type="password", key="signup_pass")
 
         if st.button("Register", use_container_width=True):
-            if fname and lname and email and password:
+            if any(acc["email"].strip().lower() == email.strip().lower() for acc in st.session_state.accounts):
+                st.error("An account with this email already exists. Please log in.")
+            elif fname and lname and email and password:
+                try:
+                    hashed = auth.hash_password(password)
+                except auth.Busy:
+                    st.error("The server is busy signing people in. Please try again in a moment.")
+                    st.stop()
                 new_acc = {
                     "first_name": fname,
                     "last_name": lname,
                     "email": email,
-                    "password": password,
+                    "password": hashed,
                     "date_joined": date.today().strftime("%Y-%m-%d")
                 }
                 st.session_state.accounts.append(new_acc)
@@ -138,350 +176,290 @@ if not st.session_state.logged_in:
         login_page()
     st.stop()
 
+# Each run of a logged-in page keeps the remembered login from going idle.
+sessions.touch(st.query_params.get("sid"))
+
 # ---------- Load Expenses Data ----------
-BASE_DIR = os.path.dirname(__file__) if "__file__" in globals() else os.getcwd()
-DATA_FILE = os.path.join(BASE_DIR, "expenses.csv")
+DATA_FILE = ledger.DATA_FILE
+
+# All sessions in the process share one parsed copy of each ledger version;
+# the file is read again only after it changed.
+try:
+    df, version = ledger.shared_ledger()
+except Exception as e:
+    st.error(f"Error reading {DATA_FILE}: {e}")
+    df, version = ledger.empty_ledger(), None
+
+PLAN = st.session_state.user.get("plan", quota.DEFAULT_PLAN)
+quota.sync(df)
+cube.sync(df)
+categorizer.sync(df)
+dedupe.sync(df)
+
+# Recurring rules are written into the ledger only up to today, in one batch.
+loaded = df
+try:
+    df = recurring.materialize(df, st.session_state.user["email"], date.today(), plan=PLAN)
+except quota.QuotaExceeded as e:
+    st.warning(f"Recurring entries were not added: {e}")
+if version is not None and df is not loaded:
+    version = ledger.ledger_version()
 
-if os.path.exists(DATA_FILE):
+st.session_state.data = df
+st.session_state.data_version = version
+
+# ---------- Fragments ----------
+# Widgets inside a fragment rerun only that fragment, on the rows loaded by
+# the last full run. The fragment always runs first, so a click it received
+# is acted on: writes go to the current ledger whatever the session loaded.
+# If the ledger changed since the last full run (another tab, the API or the
+# CLI wrote it), the whole script then runs to show the current rows.
+def ledger_fragment(fn):
+    @functools.wraps(fn)
+    def run():
+        fn()
+        version = st.session_state.get("data_version")
+        if version is not None and version != ledger.ledger_version():
+            st.rerun()
+    return st.fragment(run)
+
+# ---------- Entry forms ----------
+# Add and edit forms send their fields together on submit. The submit
+# callback validates them and writes the ledger before the rerun the submit
+# triggers, so one entry costs one rerun and one write; the outcome is shown
+# on that rerun.
+def notify_form(form, kind, text):
+    st.session_state[f"{form}_notice"] = (kind, text)
+
+def form_notice(form):
+    kind, text = st.session_state.pop(f"{form}_notice", (None, None))
+    if kind:
+        getattr(st, kind)(text)
+
+def clear_fields(keys):
+    for key in keys:
+        st.session_state.pop(key, None)
+
+def add_entry(form, label, record, allow_duplicate, message, fields):
+    email = st.session_state.user["email"]
+    with ledger.locked():
+        duplicate = dedupe.check([record], email)[0]
+        try:
+            if duplicate == dedupe.EXACT and not allow_duplicate:
+                raise ValueError(f"an identical {label} is already recorded.")
+            quota.admit(email, PLAN, 1)
+        except (ValueError, quota.QuotaExceeded) as e:
+            notify_form(form, "error", f"Entry not saved: {e}")
+            return
+        st.session_state.data = ledger.add_records(st.session_state.data, [record], user=email)
+    if duplicate == dedupe.NEAR:
+        st.toast(f"A similar {label} was recorded within a few days; saved anyway.")
+    notify_form(form, "success", message)
+    clear_fields(fields)
+
+# The row keys of the frame in st.session_state.data, hashed once per frame.
+def current_row_keys():
+    cached = st.session_state.get("row_keys_of")
+    if cached is None or cached[0] is not st.session_state.data:
+        cached = st.session_state.row_keys_of = (st.session_state.data, ledger.row_keys(st.session_state.data)["Key"])
+    return cached[1]
+
+# An open edit form remembers its row by ledger.row_keys key under `target`,
+# never by label: labels change whenever a row before it is deleted, by this
+# session or another writer. Returns the row's label in
+# st.session_state.data, or None (and closes the form) once the row is gone.
+def edit_target(target):
+    key = st.session_state.get(target)
+    if key is None:
+        return None
+    keys = current_row_keys()
+    hits = keys.index[keys.values == key]
+    if not len(hits):
+        del st.session_state[target]
+        return None
+    return hits[0]
+
+# Edits and deletes name a row of the frame this session loaded. The ledger
+# applies them to its current version, or refuses when another writer has
+# changed or deleted that row since; the outcome is shown above the table.
+def update_entry(notice, label, target, record):
+    idx = edit_target(target)
+    st.session_state.pop(target, None)
+    if idx is None:
+        notify_form(notice, "error", f"{label} not updated: this entry was deleted; reload the page and try again.")
+        return
     try:
-        df = pd.read_csv(DATA_FILE, parse_dates=["Date"])
-        expected = ["Type", "Amount", "Category", "Date", "Note"]
-        for c in expected:
-            if c not in df.columns:
-                df[c] = None
-        df = df[expected]
-    except EmptyDataError:
-        df = pd.DataFrame(columns=["Type", "Amount", "Category", "Date", "Note"])
-    except Exception as e:
-        st.error(f"Error reading {DATA_FILE}: {e}")
-        df = pd.DataFrame(columns=["Type", "Amount", "Category", "Date", "Note"])
-else:
-    df = pd.DataFrame(columns=["Type", "Amount", "Category", "Date", "Note"])
+        st.session_state.data = ledger.update_record(st.session_state.data, idx, record)
+    except ledger.Conflict as e:
+        notify_form(notice, "error", f"{label} not updated: {e}")
+        return
+    notify_form(notice, "success", f"{label} updated successfully!")
 
-if "Date" in df.columns:
+def delete_entry(notice, label, idx):
     try:
-        df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
-    except:
-        pass
-st.session_state.data = df
+        st.session_state.data = ledger.delete_record(st.session_state.data, idx)
+    except ledger.Conflict as e:
+        notify_form(notice, "error", f"{label} not deleted: {e}")
+        return
+    notify_form(notice, "success", f"{label} deleted!")
+
+# Amounts are shown in the user's display currency. The converted ledger is
+# cached per (ledger version, currency), so switching currency or rerunning
+# does not convert again.
+CURRENCY = st.session_state.user.get("currency", fx.BASE_CURRENCY)
+if CURRENCY not in fx.currencies():
+    CURRENCY = fx.BASE_CURRENCY
+
+def money(value):
+    return fx.format_money(value, CURRENCY)
+
+# Every page works on the logged-in user's rows; mutations go through the
+# full ledger in st.session_state.data so row labels stay valid. The
+# converted rows are built once per (ledger version, user, currency, rates)
+# and shared by all of that user's sessions.
+def user_view():
+    return ledger.user_rows(fx.convert_ledger(st.session_state.data, version, CURRENCY),
+                            st.session_state.user["email"])
+
+if version is None:
+    data = user_view()
+else:
+    data = ledger.shared_view(version, ("user_rows", st.session_state.user["email"], CURRENCY,
+                                        fx.load_rates()["version"]), user_view)
+
+# Row buttons are keyed by content rather than by label, since labels shift
+# whenever another writer adds or deletes rows.
+def row_keys():
+    return ledger.row_keys(st.session_state.data)
 
-data = st.session_state.data
+row_key = (row_keys() if version is None else ledger.shared_view(version, ("row_keys",), row_keys))["Key"]
+st.session_state.row_keys_of = (st.session_state.data, row_key)
+
+# Page totals and the forecast's monthly series come from the aggregate cube,
+# which is kept current on every ledger write instead of regrouping raw rows.
+summary = cube.view(st.session_state.user["email"], CURRENCY)
 
 # ----------------- Dashboard -----------------
-def dashboard():
-    st.subheader("Overview")
-
-    incomes = data[data["Type"] == "Income"]["Amount"].sum()
-    expenses = data[data["Type"] == "Expense"]["Amount"].sum()
-    invest = data[data["Type"] == "Investment"]["Amount"].sum() \
-             if "Investment" in data["Type"].unique() else 0
-    balance = incomes - expenses - invest
-
-    st.markdown("""<style>.metric-card{border:1px solid #e5e7eb;border-radius:12px;padding:14px;text-align:center;background:#fff;box-shadow:0 2px 6px rgba(0,0,0,0.05);} 
-    .metric-value{font-size:1.3rem;font-weight:600;} .metric-label{color:#6b7280;font-size:0.9rem;margin-top:4px;}</style>""", unsafe_allow_html=True)
-    c1, c2, c3, c4 = st.columns(4)
-    with c1:
-        st.markdown(f"<div class='metric-card'>💰<div class='metric-value'>₹{incomes:,.2f}</div><div class='metric-label'>Income</div></div>", unsafe_allow_html=True)
-    with c2:
-        st.markdown(f"<div class='metric-card'>📉<div class='metric-value'>₹{expenses:,.2f}</div><div class='metric-label'>Spent</div></div>", unsafe_allow_html=True)
-    with c3:
-        st.markdown(f"<div class='metric-card'>📊<div class='metric-value'>₹{invest:,.2f}</div><div class='metric-label'>Invest</div></div>", unsafe_allow_html=True)
-    with c4:
-        st.markdown(f"<div class='metric-card'>🟢<div class='metric-value'>₹{balance:,.2f}</div><div class='metric-label'>Balance</div></div>", unsafe_allow_html=True)
+# The user's rows indexed by date, once per ledger version, so the dashboard
+# range is answered by binary search instead of filtering every row.
+def date_index():
+    return timeline.build(data)
 
-    st.markdown("---")
-    st.subheader("Report")
-    col_left, col_right = st.columns([5, 1])
-    with col_right:
-        st.date_input("📅", date.today(), label_visibility="collapsed")
+def dashboard():
+    if version is None:
+        index = date_index()
+    else:
+        index = ledger.shared_view(version, ("date_index", st.session_state.user["email"], CURRENCY,
+                                             fx.load_rates()["version"]), date_index)
+
+    # --- Cards and report charts follow the date range and rerun on their own ---
+    @ledger_fragment
+    def report():
+        first, last = timeline.bounds(index)
+        col_left, col_right = st.columns([3, 2])
+        with col_left:
+            st.subheader("Overview")
+        with col_right:
+            picked = st.date_input("📅", (first, max(last, date.today())), format="YYYY-MM-DD",
+                                   label_visibility="collapsed", key="dashboard_range")
+        # While the second day is being picked the range has one end.
+        start, end = (picked[0], picked[-1]) if picked else (first, last)
+
+        incomes, _ = timeline.total(index, "Income", start, end)
+        expenses, _ = timeline.total(index, "Expense", start, end)
+        invest, _ = timeline.total(index, "Investment", start, end)
+        balance = incomes - expenses - invest
+
+        theme.metric_row([
+            ("💰", money(incomes), "Income"),
+            ("📉", money(expenses), "Spent"),
+            ("📊", money(invest), "Invest"),
+            ("🟢", money(balance), "Balance"),
+        ])
+
+        st.markdown("---")
+        st.subheader("Report")
 
         left, right = st.columns([1, 2])
-
+        df_expense = timeline.rows(index, "Expense", start, end)
         with left:
-          df_expense = data[data["Type"] == "Expense"] if not data.empty else pd.DataFrame()
-          if not df_expense.empty:
-             donut = px.pie(
-             df_expense,
-             values="Amount",
-             names="Category",
-             hole=0.5,
-             title="Expense Breakdown",
-             color_discrete_sequence=px.colors.qualitative.Set2
-        )
-        st.plotly_chart(donut, use_container_width=True)
+            if not df_expense.empty:
+                by_category = df_expense.groupby("Category", as_index=False)["Amount"].sum()
+                donut = px.pie(by_category, values="Amount", names="Category",
+                               hole=0.5, title="Expense Breakdown",
+                               color_discrete_sequence=px.colors.qualitative.Set2)
+                st.plotly_chart(donut, use_container_width=True)
 
         with right:
-          if not data.empty and "Date" in data.columns:
-            df_monthly = data.copy()
-            df_monthly["Date"] = pd.to_datetime(df_monthly["Date"], errors="coerce")
-            df_monthly = df_monthly.dropna(subset=["Date"])
-        if not df_monthly.empty:
-            df_monthly["Month"] = df_monthly["Date"].dt.strftime("%b")
-            monthly = df_monthly.groupby("Month", sort=False)["Amount"].sum().reset_index()
-
-            # Create line chart
-            line_chart = px.line(
-                monthly,
-                x="Month",
-                y="Amount",
-                title="Activity",
-                markers=True
-            )
-            line_chart.update_traces(line=dict(shape="spline", width=3, color="#0077ff"))
-            line_chart.update_layout(
+            if not df_expense.empty:
+                # Rows are already in date order, so months come out in calendar order
+                months = df_expense["Date"].dt.to_period("M")
+                monthly = df_expense.groupby(months, sort=False)["Amount"].sum().reset_index()
+                label = "%b %Y" if start.year != end.year else "%b"
+                monthly["Month"] = monthly["Date"].dt.strftime(label)
+
+                # Plot line chart
+                line_chart = px.line(
+                    monthly,
+                    x="Month",
+                    y="Amount",
+                    title="Monthly Expenses",
+                    markers=True,
+                    color_discrete_sequence=["#2527a2"]  # Change to your exact color
+                )
+
+                # Make line smooth like your image
+                line_chart.update_traces(line=dict(shape="spline", width=3))
+
+                # Layout styling to match dashboard
+                line_chart.update_layout(
+                    yaxis_title=None,
+                    xaxis_title=None,
+                    showlegend=False,
+                    plot_bgcolor="white",
+                    margin=dict(l=10, r=10, t=40, b=10),
+                    xaxis=dict(tickmode="linear")
+                )
+
+                st.plotly_chart(line_chart, use_container_width=True)
+            else:
+                st.info("No expenses in this date range.")
+
+    report()
+
+    # ---------- Forecast ----------
+    @ledger_fragment
+    def forecast_section():
+        st.markdown("---")
+        st.subheader("Forecast")
+        horizon = st.slider("Months ahead", 1, 12, 3, key="forecast_horizon")
+        projected = forecast.project(summary, st.session_state.user["email"], CURRENCY, horizon,
+                                     st.session_state.data_version)
+        if projected.empty:
+            st.info("Add some income and expenses to see a forecast.")
+        else:
+            history = forecast.flows(summary[summary["Month"] != ""], "Sum").tail(12)
+            ahead = forecast.flows(projected, "Forecast")
+            flow_df = pd.concat([history.assign(Kind="Actual"), ahead.assign(Kind="Forecast")]).reset_index()
+            flow_df = flow_df.melt(id_vars=["Month", "Kind"], value_vars=["Income", "Expense", "Net"],
+                                   var_name="Flow", value_name="Amount")
+            forecast_chart = px.line(flow_df, x="Month", y="Amount", color="Flow", line_dash="Kind",
+                                     markers=True, title="Cash Flow Forecast")
+            forecast_chart.update_layout(
                 yaxis_title=None,
                 xaxis_title=None,
-                showlegend=False,
                 plot_bgcolor="white",
                 margin=dict(l=10, r=10, t=40, b=10)
             )
-            st.plotly_chart(line_chart, use_container_width=True)
-    
-
-    
-            # solve erroers# app.py
-
-#
-# ---------- Utility functions ----------
-def load_accounts():
-    if os.path.exists(ACCOUNTS_FILE):
-        try:
-            with open(ACCOUNTS_FILE, "r") as f:
-                return json.load(f)
-        except:
-            return []
-    return []
-
-def save_accounts(accounts):
-    with open(ACCOUNTS_FILE, "w") as f:
-        json.dump(accounts, f)
-
-def load_login():
-    if os.path.exists(LOGIN_FILE):
-        try:
-            with open(LOGIN_FILE, "r") as f:
-                return json.load(f)
-        except:
-            return None
-    return None
-
-def save_login(user):
-    with open(LOGIN_FILE, "w") as f:
-        json.dump(user, f)
-
-def clear_login():
-    if os.path.exists(LOGIN_FILE):
-        os.remove(LOGIN_FILE)
-
-# ---------- Session Defaults ----------
-if "accounts" not in st.session_state:
-    st.session_state.accounts = load_accounts()
-
-if "user" not in st.session_state:
-    st.session_state.user = load_login()
-    st.session_state.logged_in = bool(st.session_state.user)
-
-if "show_signup" not in st.session_state:
-    st.session_state.show_signup = False
-
-if "data" not in st.session_state:
-    st.session_state.data = pd.DataFrame(columns=["Type", "Amount", "Category", "Date", "Note"])
-
-# ----------------- Authentication -----------------
-def login_page():
-    col1, col2 = st.columns([1, 1])
-    with col1:
-        try:
-            st.markdown("## Hi, Welcome Back")
-            st.markdown("Sign in to Smart Finance!")
-            st.image("Images/signup_hero.png")
-        except:
-            st.warning("signup_hero.png not found")
-        
-    with col2:
-        st.caption("Enter your details below.")
-        email = st.text_input("Email address", key="login_email")
-        password = st.text_input("Password", type="password", key="login_pass")
-        if st.button("Login", use_container_width=True):
-            found = next((acc for acc in st.session_state.accounts if acc["email"] == email), None)
-            if found and password == found.get("password"):
-                st.session_state.logged_in = True
-                st.session_state.user = found
-                save_login(found)  # persist login
-                st.success(f"Welcome back, {found['first_name']}!")
-                st.rerun()
-            else:
-                st.error("Invalid credentials or user not found.")
-
-        st.markdown("Don't have an account?")
-        if st.button("Sign Up"):
-            st.session_state.show_signup = True
-            st.rerun()
-
-def signup_page():
-    col1, col2 = st.columns([1, 1])
-    with col1:
-        try:
-            st.markdown("## Manage your expenses more effectively")
-            st.image("Images/login_hero.png")
-        except:
-            st.warning("login_hero.png not found")
-        
-    with col2:
-        st.markdown("### ✨ Create your account")
-        st.caption("Fill details below to register.")
-        fname = st.text_input("First Name", key="signup_fname")
-        lname = st.text_input("Last Name", key="signup_lname")
-        email = st.text_input("Email address", key="signup_email")
-        password = st.text_input("Password", type="password", key="signup_pass")
-
-        if st.button("Register", use_container_width=True):
-            if fname and lname and email and password:
-                new_acc = {
-                    "first_name": fname,
-                    "last_name": lname,
-                    "email": email,
-                    "password": password,
-                    "date_joined": date.today().strftime("%Y-%m-%d")
-                }
-                st.session_state.accounts.append(new_acc)
-                save_accounts(st.session_state.accounts)
-                st.session_state.user = new_acc
-                st.session_state.logged_in = True
-                save_login(new_acc)  # persist login
-                st.success(f"Account created for {fname} {lname}!")
-                st.rerun()
-            else:
-                st.error("Please fill all fields.")
-
-        st.markdown("Already have an account?")
-        if st.button("Login"):
-            st.session_state.show_signup = False
-            st.rerun()
-
-# ---------- Redirect if not logged in ----------
-if not st.session_state.logged_in:
-    if st.session_state.show_signup:
-        signup_page()
-    else:
-        login_page()
-    st.stop()
-
-# ---------- Load Expenses Data ----------
-BASE_DIR = os.path.dirname(__file__) if "__file__" in globals() else os.getcwd()
-DATA_FILE = os.path.join(BASE_DIR, "expenses.csv")
-
-if os.path.exists(DATA_FILE):
-    try:
-        df = pd.read_csv(DATA_FILE, parse_dates=["Date"])
-        expected = ["Type", "Amount", "Category", "Date", "Note"]
-        for c in expected:
-            if c not in df.columns:
-                df[c] = None
-        df = df[expected]
-    except EmptyDataError:
-        df = pd.DataFrame(columns=["Type", "Amount", "Category", "Date", "Note"])
-    except Exception as e:
-        st.error(f"Error reading {DATA_FILE}: {e}")
-        df = pd.DataFrame(columns=["Type", "Amount", "Category", "Date", "Note"])
-else:
-    df = pd.DataFrame(columns=["Type", "Amount", "Category", "Date", "Note"])
-
-if "Date" in df.columns:
-    try:
-        df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
-    except:
-        pass
-st.session_state.data = df
-
-data = st.session_state.data
-
-# ----------------- Dashboard -----------------
-def dashboard():
-    st.subheader("Overview")
-
-    incomes = data[data["Type"] == "Income"]["Amount"].sum()
-    expenses = data[data["Type"] == "Expense"]["Amount"].sum()
-    invest = data[data["Type"] == "Investment"]["Amount"].sum() \
-             if "Investment" in data["Type"].unique() else 0
-    balance = incomes - expenses - invest
-
-    st.markdown("""<style>.metric-card{border:1px solid #e5e7eb;border-radius:12px;padding:14px;text-align:center;background:#fff;box-shadow:0 2px 6px rgba(0,0,0,0.05);} 
-    .metric-value{font-size:1.3rem;font-weight:600;} .metric-label{color:#6b7280;font-size:0.9rem;margin-top:4px;}</style>""", unsafe_allow_html=True)
-    c1, c2, c3, c4 = st.columns(4)
-    with c1:
-        st.markdown(f"<div class='metric-card'>💰<div class='metric-value'>₹{incomes:,.2f}</div><div class='metric-label'>Income</div></div>", unsafe_allow_html=True)
-    with c2:
-        st.markdown(f"<div class='metric-card'>📉<div class='metric-value'>₹{expenses:,.2f}</div><div class='metric-label'>Spent</div></div>", unsafe_allow_html=True)
-    with c3:
-        st.markdown(f"<div class='metric-card'>📊<div class='metric-value'>₹{invest:,.2f}</div><div class='metric-label'>Invest</div></div>", unsafe_allow_html=True)
-    with c4:
-        st.markdown(f"<div class='metric-card'>🟢<div class='metric-value'>₹{balance:,.2f}</div><div class='metric-label'>Balance</div></div>", unsafe_allow_html=True)
-
-    st.markdown("---")
-    st.subheader("Report")
-    col_left, col_right = st.columns([5, 1])
-    with col_right:
-        st.date_input("📅", date.today(), label_visibility="collapsed")
-
-    left, right = st.columns([1, 2])
-    with left:
-        df_expense = data[data["Type"] == "Expense"] if not data.empty else pd.DataFrame()
-        if not df_expense.empty:
-            donut = px.pie(df_expense, values="Amount", names="Category",
-                           hole=0.5, title="Expense Breakdown",
-                           color_discrete_sequence=px.colors.qualitative.Set2)
-            st.plotly_chart(donut, use_container_width=True)
-    with right:
-        if not data.empty and "Date" in data.columns:
-            df_monthly = data.copy()
-            df_monthly["Date"] = pd.to_datetime(df_monthly["Date"], errors="coerce")
-            df_monthly = df_monthly.dropna(subset=["Date"])
-            if not df_monthly.empty:
-                df_monthly["Month"] = df_monthly["Date"].dt.strftime("%b")
-                monthly = df_monthly.groupby("Month", sort=False)["Amount"].sum().reset_index()
-
-
-    with right:
-        if not data.empty and "Date" in data.columns:
-            df_monthly = data.copy()
-            df_monthly["Date"] = pd.to_datetime(df_monthly["Date"], errors="coerce")
-            df_monthly = df_monthly.dropna(subset=["Date"])
-            df_expense = df_monthly[df_monthly["Type"] == "Expense"]  # Only expenses
-
-        if not df_expense.empty:
-            # Extract month number and name
-            df_expense["MonthNum"] = df_expense["Date"].dt.month
-            df_expense["Month"] = df_expense["Date"].dt.strftime("%b")
-
-            # Group by month number to ensure calendar order
-            monthly = df_expense.groupby(["MonthNum", "Month"], sort=True)["Amount"].sum().reset_index()
-            monthly = monthly.sort_values("MonthNum")  # Ascending order Jan → Dec
-
-            # Plot line chart
-            line_chart = px.line(
-                monthly,
-                x="Month",
-                y="Amount",
-                title="Monthly Expenses",
-                markers=True,
-                color_discrete_sequence=["#2527a2"]  # Change to your exact color
-            )
+            st.plotly_chart(forecast_chart, use_container_width=True)
 
-            # Make line smooth like your image
-            line_chart.update_traces(line=dict(shape="spline", width=3))
+            by_category = projected[projected["Type"] == "Expense"].pivot_table(
+                index="Category", columns="Month", values="Forecast", aggfunc="sum")
+            if not by_category.empty:
+                st.caption("Projected expenses by category")
+                st.dataframe(by_category.style.format(money), use_container_width=True)
 
-            # Layout styling to match dashboard
-            line_chart.update_layout(
-                yaxis_title=None,
-                xaxis_title=None,
-                showlegend=False,
-                plot_bgcolor="white",
-                margin=dict(l=10, r=10, t=40, b=10),
-                xaxis=dict(tickmode="linear")
-            )
-
-            st.plotly_chart(line_chart, use_container_width=True)
+    forecast_section()
 
     # # ---------- Expense Form ----------
     # st.markdown("---")
@@ -519,1070 +497,545 @@ def dashboard():
     #                 del st.session_state[k]
     #         st.rerun()
 
+# ----------------- Recurring Transactions -----------------
+def recurring_section(typ, categories):
+    email = st.session_state.user["email"]
+    key = typ.lower()
+    with st.expander(f"🔁 Recurring {typ}"):
+        rules = recurring.user_rules(email, typ)
+        if rules:
+            for rule in rules:
+                nxt = recurring.next_occurrence(rule, date.today())
+                cols = st.columns([2, 2, 2, 2, 1])
+                cols[0].write(rule["Note"])
+                cols[1].write(fx.format_money(rule["Amount"], rule.get("Currency", fx.BASE_CURRENCY)))
+                cols[2].write(rule["Category"])
+                cols[3].write(f"{rule['cadence'].title()} · next {nxt.strftime('%b %d, %Y') if nxt is not None else '—'}")
+                if cols[4].button("🗑️", key=f"del_rule_{rule['id']}"):
+                    recurring.delete_rule(rule["id"])
+                    st.rerun()
+        else:
+            st.info(f"No recurring {key} yet.")
+
+        with st.form(f"recurring_{key}_form", clear_on_submit=True):
+            name = st.text_input("Name")
+            amount = st.number_input(f"Amount ({CURRENCY})", min_value=0.0)
+            category = st.selectbox("Category", categories)
+            cadence = st.selectbox("Repeats", list(recurring.CADENCES), index=2)
+            start = st.date_input("Start Date", date.today())
+            end = st.date_input("End Date (optional)", value=None)
+            if st.form_submit_button("Save Rule"):
+                if not name or amount <= 0:
+                    st.error("Please enter a name and an amount above zero.")
+                elif end is not None and end < start:
+                    st.error("End date is before the start date.")
+                else:
+                    recurring.add_rule(email, typ, amount, category, name, cadence, start, end, currency=CURRENCY)
+                    try:
+                        st.session_state.data = recurring.materialize(st.session_state.data, email, date.today(), plan=PLAN)
+                    except quota.QuotaExceeded as e:
+                        st.warning(f"Rule saved, but its past entries were not added: {e}")
+                    else:
+                        st.success(f"Recurring {key} saved: {name}")
+                        st.rerun()
+
 # ----------------- Other Pages -----------------
 
 def income_page():
     st.title("💰 Income")
 
-    df_income = st.session_state.data[st.session_state.data["Type"] == "Income"]
-
-    total_income = len(df_income)
-    total_amount = df_income["Amount"].sum()
-
-    # --- Same style as Dashboard summary boxes ---
-    st.markdown("""
-    <style>
-    .metric-card {
-        border:1px solid #e5e7eb;
-        border-radius:12px;
-        padding:14px;
-        text-align:center;
-        background:#fff;
-        box-shadow:0 2px 6px rgba(0,0,0,0.05);
-    }
-    .metric-value {
-        font-size:1.3rem;
-        font-weight:600;
-    }
-    .metric-label {
-        color:#6b7280;
-        font-size:0.9rem;
-        margin-top:4px;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-
-    c1, c2 = st.columns(2)
-    with c1:
-        st.markdown(
-            f"<div class='metric-card'>📊<div class='metric-value'>{total_income}</div><div class='metric-label'>Total Incomes</div></div>",
-            unsafe_allow_html=True,
-        )
-    with c2:
-        st.markdown(
-            f"<div class='metric-card'>💰<div class='metric-value'>₹{total_amount:,.2f}</div><div class='metric-label'>Total Amount</div></div>",
-            unsafe_allow_html=True,
-        )
-
-    st.markdown("---")
-
-    # --- Filter by Month ---
-    st.subheader("Income Records")
-    selected_month = st.selectbox(
-        "Filter by Month",
-        ["All"] + sorted(df_income["Date"].dt.strftime("%B").unique().tolist())
-        if not df_income.empty else ["All"],
-    )
-
-    filtered_income = df_income.copy()
-    if selected_month != "All":
-        filtered_income = filtered_income[filtered_income["Date"].dt.strftime("%B") == selected_month]
-
-    # --- Show Table with Edit/Delete ---
-    if not filtered_income.empty:
-        st.markdown("### Income Records")
-        for idx, row in filtered_income.iterrows():
-            with st.container():
-                c1, c2, c3, c4, c5, c6 = st.columns([2,2,2,2,2,1])
-                with c1: st.write(row["Note"])  # Name
-                with c2: st.write(f"₹{row['Amount']:,.2f}")  # Amount
-                with c3: st.write(row["Date"].strftime("%b %d, %Y"))  # Date
-                with c4: st.write(row["Category"])  # Category
-                with c5: st.write(row.get("ExtraNote",""))  # Optional Notes
-                with c6:
-                    edit = st.button("✏️", key=f"edit_income_{idx}")
-                    delete = st.button("🗑️", key=f"del_income_{idx}")
-
-                if edit:
-                    st.session_state.edit_income_idx = idx
-
-                if delete:
-                    st.session_state.data.drop(idx, inplace=True)
-                    st.session_state.data.to_csv(DATA_FILE, index=False)
-                    st.success("Income deleted!")
-                    st.rerun()
-    else:
-        st.info("No income records found.")
-
-    st.markdown("---")
-
-    # --- Add / Edit Form ---
-    if "edit_income_idx" in st.session_state:
-        st.subheader("✏️ Edit Income")
-        idx = st.session_state.edit_income_idx
-        row = st.session_state.data.loc[idx]
-
-        name = st.text_input("Income Name", value=row["Note"], key="edit_income_name")
-        amount = st.number_input("Amount", min_value=0.0, value=float(row["Amount"]), key="edit_income_amount")
-        category = st.selectbox("Category", ["Salary","Business","Other"], index=0, key="edit_income_category")
-        date_in = st.date_input("Date", value=row["Date"], key="edit_income_date")
-
-        if st.button("Update Income"):
-            st.session_state.data.loc[idx] = {
-                "Type": "Income",
-                "Amount": amount,
-                "Category": category,
-                "Date": pd.to_datetime(date_in),
-                "Note": name
-            }
-            st.session_state.data.to_csv(DATA_FILE, index=False)
-            st.success("Income updated successfully!")
-            del st.session_state.edit_income_idx
-            st.rerun()
+    df_income = data[data["Type"] == "Income"]
 
-    else:
-        st.subheader("➕ Add Income")
-        name = st.text_input("Income Name", key="new_income_name")
-        amount = st.number_input("Amount", min_value=0.0, key="new_income_amount")
-        category = st.selectbox("Category", ["Salary","Business","Other"], key="new_income_category")
-        date_in = st.date_input("Date", date.today(), key="new_income_date")
-
-        if st.button("Save Income"):
-            new_income = {
-                "Type": "Income",
-                "Amount": amount,
-                "Category": category,
-                "Date": pd.to_datetime(date_in),
-                "Note": name
-            }
-            st.session_state.data = pd.concat([st.session_state.data, pd.DataFrame([new_income])], ignore_index=True)
-            st.session_state.data.to_csv(DATA_FILE, index=False)
-            st.success(f"Added income: {name} - ₹{amount:,.2f}")
-            st.rerun()
-#------------------------------------------------------------------------------------------------
-
-def expenses_page():
-    st.title("💸 Expenses")
-
-    df_expense = st.session_state.data[st.session_state.data["Type"] == "Expense"]
-
-    total_expenses = len(df_expense)
-    total_amount = df_expense["Amount"].sum()
+    total_amount, total_income = cube.totals(summary, "Income")
 
     # --- Summary cards like Dashboard ---
-    st.markdown("""
-    <style>
-    .metric-card {
-        border:1px solid #e5e7eb;
-        border-radius:12px;
-        padding:14px;
-        text-align:center;
-        background:#fff;
-        box-shadow:0 2px 6px rgba(0,0,0,0.05);
-    }
-    .metric-value {
-        font-size:1.3rem;
-        font-weight:600;
-    }
-    .metric-label {
-        color:#6b7280;
-        font-size:0.9rem;
-        margin-top:4px;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-
-    c1, c2 = st.columns(2)
-    with c1:
-        st.markdown(
-            f"<div class='metric-card'>📊<div class='metric-value'>{total_expenses}</div><div class='metric-label'>Total Expenses</div></div>",
-            unsafe_allow_html=True,
-        )
-    with c2:
-        st.markdown(
-            f"<div class='metric-card'>💰<div class='metric-value'>₹{total_amount:,.2f}</div><div class='metric-label'>Total Amount</div></div>",
-            unsafe_allow_html=True,
-        )
-
-    st.markdown("---")
-
-    # --- Filters ---
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        filter_name = st.text_input("🔍 Filter by Name", key="filter_expense_name")
-    with col2:
-        filter_category = st.selectbox(
-            "Category",
-            ["All"] + sorted(df_expense["Category"].dropna().unique().tolist())
-            if not df_expense.empty else ["All"],
-            key="filter_expense_category"
-        )
-    with col3:
-        filter_month = st.selectbox(
-            "📅 Filter by Month",
-            ["All"] + sorted(df_expense["Date"].dt.strftime("%B").unique().tolist())
-            if not df_expense.empty else ["All"],
-            key="filter_expense_month"
-        )
-
-    filtered = df_expense.copy()
-    if filter_name:
-        filtered = filtered[filtered["Note"].str.contains(filter_name, case=False, na=False)]
-    if filter_category != "All":
-        filtered = filtered[filtered["Category"] == filter_category]
-    if filter_month != "All":
-        filtered = filtered[filtered["Date"].dt.strftime("%B") == filter_month]
-
-    # --- Show full table with edit/delete buttons ---
-    if not filtered.empty:
-        st.markdown("### Expense Records")
-        for idx, row in filtered.iterrows():
-            cols = st.columns([2, 2, 2, 2, 2, 1])
-            cols[0].write(row["Note"])
-            cols[1].write(f"₹{row['Amount']:,.2f}")
-            cols[2].write(row["Date"].strftime("%b %d, %Y"))
-            cols[3].write(row["Category"])
-            cols[4].write(row.get("PaidVia",""))
-            edit_btn = cols[5].button("✏️", key=f"edit_expense_{idx}")
-            del_btn = cols[5].button("🗑️", key=f"del_expense_{idx}")
-
-            if edit_btn:
-                st.session_state.edit_expense_idx = idx
-            if del_btn:
-                st.session_state.data.drop(idx, inplace=True)
-                st.session_state.data.to_csv(DATA_FILE, index=False)
-                st.success("Expense deleted!")
-                st.rerun()
-    else:
-        st.info("No expense records found.")
+    theme.metric_row([
+        ("📊", total_income, "Total Incomes"),
+        ("💰", money(total_amount), "Total Amount"),
+    ])
 
     st.markdown("---")
 
-    # --- Add / Edit Expense Form ---
-    if "edit_expense_idx" in st.session_state:
-        st.subheader("✏️ Edit Expense")
-        idx = st.session_state.edit_expense_idx
-        row = st.session_state.data.loc[idx]
-
-        name = st.text_input("Expense Name", value=row["Note"], key="edit_expense_name")
-        amount = st.number_input("Amount", min_value=0.0, value=float(row["Amount"]), key="edit_expense_amount")
-        category = st.selectbox("Category", ["Food","Rent","Entertainment","Transport","Other"], index=0, key="edit_expense_category")
-        date_in = st.date_input("Date", value=row["Date"], key="edit_expense_date")
-        paid_via = st.text_input("Paid Via", value=row.get("PaidVia",""), key="edit_expense_paid")
-        notes = st.text_area("Notes", value=row.get("ExtraNote",""), key="edit_expense_notes")
-
-        if st.button("Update Expense"):
-            st.session_state.data.loc[idx] = {
-                "Type": "Expense",
-                "Amount": amount,
-                "Category": category,
-                "Date": pd.to_datetime(date_in),
-                "Note": name,
-                "PaidVia": paid_via,
-                "ExtraNote": notes
-            }
-            st.session_state.data.to_csv(DATA_FILE, index=False)
-            st.success("Expense updated successfully!")
-            del st.session_state.edit_expense_idx
-            st.rerun()
-
-    else:
-        st.subheader("➕ Add Expense")
-        name = st.text_input("Expense Name", key="new_expense_name")
-        amount = st.number_input("Amount", min_value=0.0, key="new_expense_amount")
-        category = st.selectbox("Category", ["Food","Rent","Entertainment","Transport","Other"], key="new_expense_category")
-        date_in = st.date_input("Date", date.today(), key="new_expense_date")
-        paid_via = st.text_input("Paid Via", key="new_expense_paid")
-        notes = st.text_area("Notes", key="new_expense_notes")
-
-        if st.button("Save Expense"):
-            new_expense = {
-                "Type": "Expense",
-                "Amount": amount,
-                "Category": category,
-                "Date": pd.to_datetime(date_in),
-                "Note": name,
-                "PaidVia": paid_via,
-                "ExtraNote": notes
-            }
-            st.session_state.data = pd.concat([st.session_state.data, pd.DataFrame([new_expense])], ignore_index=True)
-            st.session_state.data.to_csv(DATA_FILE, index=False)
-            st.success(f"Added expense: {name} - ₹{amount:,.2f}")
-            st.rerun()
-
-def savings_page():
-    st.title("💹 Investments")
-
-    df_invest = st.session_state.data[st.session_state.data["Type"] == "Investment"]
-
-    total_investments = len(df_invest)
-    total_amount = df_invest["Amount"].sum() if not df_invest.empty else 0
-
-    # --- Summary Cards ---
-    st.markdown("""
-    <style>
-    .metric-card {
-        border:1px solid #e5e7eb;
-        border-radius:12px;
-        padding:14px;
-        text-align:center;
-        background:#fff;
-        box-shadow:0 2px 6px rgba(0,0,0,0.05);
-    }
-    .metric-value {
-        font-size:1.3rem;
-        font-weight:600;
-    }
-    .metric-label {
-        color:#6b7280;
-        font-size:0.9rem;
-        margin-top:4px;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-
-    c1, c2 = st.columns(2)
-    with c1:
-        st.markdown(
-            f"<div class='metric-card'>📊<div class='metric-value'>{total_investments}</div><div class='metric-label'>Total Investments</div></div>",
-            unsafe_allow_html=True,
-        )
-    with c2:
-        st.markdown(
-            f"<div class='metric-card'>💰<div class='metric-value'>₹{total_amount:,.2f}</div><div class='metric-label'>Total Amount</div></div>",
-            unsafe_allow_html=True,
+    # --- Records: filter, table and edit form rerun on their own ---
+    edit_fields = ["edit_income_name", "edit_income_amount", "edit_income_category", "edit_income_date"]
+
+    @ledger_fragment
+    def records():
+        form_notice("income_records")
+        # --- Filter by Month ---
+        st.subheader("Income Records")
+        selected_month = st.selectbox(
+            "Filter by Month",
+            ["All"] + sorted(df_income["Date"].dt.strftime("%B").unique().tolist())
+            if not df_income.empty else ["All"],
         )
 
-    st.markdown("---")
-
-    # --- Filter by Month ---
-    selected_month = st.selectbox(
-        "📅 Filter by Month",
-        ["All"] + sorted(df_invest["Date"].dt.strftime("%B").unique().tolist()) if not df_invest.empty else ["All"]
-    )
-
-    filtered = df_invest.copy()
-    if selected_month != "All":
-        filtered = filtered[filtered["Date"].dt.strftime("%B") == selected_month]
-
-    # --- Show Table with Edit/Delete ---
-    if not filtered.empty:
-        st.markdown("### Investment Records")
-        for idx, row in filtered.iterrows():
-            cols = st.columns([2,1,1,1,2,1,2,1])
-            cols[0].write(row["Note"])  # Name
-            cols[1].write(row.get("Units",""))  # Units
-            cols[2].write(f"₹{row.get('SinglePrice',0):,.2f}")  # Single Stock Price
-            cols[3].write(f"₹{row['Amount']:,.2f}")  # Total Amount
-            cols[4].write(row["Date"].strftime("%b %d, %Y"))  # Bought Date
-            cols[5].write(row["Category"])  # Category
-            cols[6].write(row.get("ExtraNote",""))  # Notes
-            edit_btn = cols[7].button("✏️", key=f"edit_invest_{idx}")
-            del_btn = cols[7].button("🗑️", key=f"del_invest_{idx}")
-
-            if edit_btn:
-                st.session_state.edit_invest_idx = idx
-            if del_btn:
-                st.session_state.data.drop(idx, inplace=True)
-                st.session_state.data.to_csv(DATA_FILE, index=False)
-                st.success("Investment deleted!")
-                st.rerun()
-    else:
-        st.info("No investment records found.")
-
-    st.markdown("---")
-
-    # --- Add / Edit Investment Form ---
-    if "edit_invest_idx" in st.session_state:
-        st.subheader("✏️ Edit Investment")
-        idx = st.session_state.edit_invest_idx
-        row = st.session_state.data.loc[idx]
-
-        name = st.text_input("Investment Name", value=row["Note"], key="edit_invest_name")
-        units = st.number_input("Units", min_value=0.0, value=float(row.get("Units",0)), key="edit_invest_units")
-        single_price = st.number_input("Single Stock Price", min_value=0.0, value=float(row.get("SinglePrice",0)), key="edit_invest_price")
-        total_amount_input = units * single_price
-        category = st.selectbox("Category", ["Indian Stock","Crypto Currency","Mutual Funds","Other"], index=0, key="edit_invest_category")
-        date_in = st.date_input("Bought Date", value=row["Date"], key="edit_invest_date")
-        notes = st.text_area("Notes", value=row.get("ExtraNote",""), key="edit_invest_notes")
-
-        if st.button("Update Investment"):
-            st.session_state.data.loc[idx] = {
-                "Type": "Investment",
-                "Amount": total_amount_input,
-                "Category": category,
-                "Date": pd.to_datetime(date_in),
-                "Note": name,
-                "Units": units,
-                "SinglePrice": single_price,
-                "ExtraNote": notes
-            }
-            st.session_state.data.to_csv(DATA_FILE, index=False)
-            st.success("Investment updated successfully!")
-            del st.session_state.edit_invest_idx
-            st.rerun()
-    else:
-        st.subheader("➕ Add Investment")
-        name = st.text_input("Investment Name", key="new_invest_name")
-        units = st.number_input("Units", min_value=0.0, key="new_invest_units")
-        single_price = st.number_input("Single Stock Price", min_value=0.0, key="new_invest_price")
-        total_amount_input = units * single_price
-        category = st.selectbox("Category", ["Indian Stock","Crypto Currency","Mutual Funds","Other"], key="new_invest_category")
-        date_in = st.date_input("Bought Date", date.today(), key="new_invest_date")
-        notes = st.text_area("Notes", key="new_invest_notes")
-
-        if st.button("Save Investment"):
-            new_invest = {
-                "Type": "Investment",
-                "Amount": total_amount_input,
-                "Category": category,
-                "Date": pd.to_datetime(date_in),
-                "Note": name,
-                "Units": units,
-                "SinglePrice": single_price,
-                "ExtraNote": notes
-            }
-            st.session_state.data = pd.concat([st.session_state.data, pd.DataFrame([new_invest])], ignore_index=True)
-            st.session_state.data.to_csv(DATA_FILE, index=False)
-            st.success(f"Added investment: {name} - ₹{total_amount_input:,.2f}")
-            st.rerun()
-def goals_page():
-    st.title("🎯 Goals")
-    st.info("This is your goals page. You can add financial goals here.")
+        filtered_income = df_income
+        if selected_month != "All":
+            filtered_income = filtered_income[filtered_income["Date"].dt.strftime("%B") == selected_month]
+
+        # --- Show Table with Edit/Delete ---
+        if not filtered_income.empty:
+            st.markdown("### Income Records")
+            for idx, row in filtered_income.iterrows():
+                with st.container():
+                    c1, c2, c3, c4, c5, c6 = st.columns([2,2,2,2,2,1])
+                    with c1: st.write(row["Note"])  # Name
+                    with c2: st.write(f"{money(row['Amount'])}")  # Amount
+                    with c3: st.write(row["Date"].strftime("%b %d, %Y"))  # Date
+                    with c4: st.write(row["Category"])  # Category
+                    with c5: st.write(row.get("ExtraNote",""))  # Optional Notes
+                    with c6:
+                        edit = st.button("✏️", key=f"edit_income_{row_key[idx]}")
+                        delete = st.button("🗑️", key=f"del_income_{row_key[idx]}")
+
+                    if edit:
+                        st.session_state.edit_income_key = row_key[idx]
+                        clear_fields(edit_fields)
+
+                    if delete:
+                        delete_entry("income_records", "Income", idx)
+                        st.rerun()
+        else:
+            st.info("No income records found.")
+
+        # --- Edit Form ---
+        idx = edit_target("edit_income_key")
+        if idx is not None:
+            st.markdown("---")
+            st.subheader("✏️ Edit Income")
+            row = st.session_state.data.loc[idx]
+
+            def update_income():
+                s = st.session_state
+                name = s.edit_income_name.strip()
+                if not name or s.edit_income_amount <= 0:
+                    notify_form("edit_income_form", "error", "Please enter a name and an amount above zero.")
+                    return
+                update_entry("income_records", "Income", "edit_income_key", {
+                    "Type": "Income",
+                    "Amount": ledger.to_minor(s.edit_income_amount),
+                    "Category": s.edit_income_category,
+                    "Date": pd.to_datetime(s.edit_income_date),
+                    "Note": name
+                })
+                clear_fields(edit_fields)
 
+            with st.form("edit_income_form"):
+                st.text_input("Income Name", value=row["Note"], key="edit_income_name")
+                st.number_input(f"Amount ({row['Currency']})", min_value=0.0, value=ledger.to_major(row["Amount"]), key="edit_income_amount")
+                st.selectbox("Category", ["Salary","Business","Other"], index=0, key="edit_income_category")
+                st.date_input("Date", value=row["Date"], key="edit_income_date")
+                st.form_submit_button("Update Income", on_click=update_income)
+            form_notice("edit_income_form")
 
-def settings_page():
-    st.title("⚙️ Settings")
+    records()
     st.markdown("---")
-    st.markdown("### 👤 Your Profile")
 
-    if "profile" not in st.session_state:
-        st.session_state.profile = {
-            "First Name": "John",
-            "Last Name": "Doe",
-            "Username": st.session_state.user.get("first_name", "User"),
-            "Email": st.session_state.user.get("email", "user@email.com"),
-            "Photo": None
+    # --- Add Form ---
+    new_fields = ["new_income_name", "new_income_amount", "new_income_category", "new_income_date",
+                  "new_income_currency", "allow_duplicate_income"]
+
+    def save_income():
+        s = st.session_state
+        name = s.new_income_name.strip()
+        if not name or s.new_income_amount <= 0:
+            notify_form("income_form", "error", "Please enter a name and an amount above zero.")
+            return
+        category = categorizer.resolve(s.user["email"], "Income", s.new_income_category, name)
+        new_income = {
+            "Type": "Income",
+            "Amount": ledger.to_minor(s.new_income_amount),
+            "Category": category,
+            "Date": pd.to_datetime(s.new_income_date),
+            "Note": name,
+            "Currency": s.new_income_currency
         }
+        add_entry("income_form", "income", new_income, s.allow_duplicate_income,
+                  f"Added income: {name} - {fx.format_money(s.new_income_amount, s.new_income_currency)} ({category})",
+                  new_fields)
+
+    st.subheader("➕ Add Income")
+    with st.form("income_form"):
+        st.text_input("Income Name", key="new_income_name")
+        st.number_input("Amount", min_value=0.0, key="new_income_amount")
+        st.selectbox("Category", [categorizer.AUTO] + ["Salary","Business","Other"], key="new_income_category",
+                     help=f"{categorizer.AUTO} picks a category from the name when the entry is saved.")
+        st.date_input("Date", date.today(), key="new_income_date")
+        st.selectbox("Currency", fx.currencies(), index=fx.currencies().index(CURRENCY), key="new_income_currency")
+        st.checkbox("Save even if it duplicates an entry", key="allow_duplicate_income")
+        st.form_submit_button("Save Income", on_click=save_income)
+    form_notice("income_form")
+
+    recurring_section("Income", ["Salary","Business","Other"])
+#------------------------------------------------------------------------------------------------
 
-    profile = st.session_state.profile
-    edit_mode = st.checkbox("✏️ Edit Profile")
-
-    if edit_mode:
-        with st.form("profile_form", clear_on_submit=False):
-            uploaded_photo = st.file_uploader("Upload Profile Photo", type=["jpg", "png", "jpeg"])
-            if uploaded_photo:
-                profile["Photo"] = uploaded_photo.getvalue()
-
-            fname = st.text_input("First Name", value=profile["First Name"])
-            lname = st.text_input("Last Name", value=profile["Last Name"])
-            uname = st.text_input("Username", value=profile["Username"], disabled=True)
-            email = st.text_input("Email", value=profile["Email"])
-            submitted = st.form_submit_button("💾 Save Changes")
-            if submitted:
-                st.session_state.profile.update({
-                    "First Name": fname,
-                    "Last Name": lname,
-                    "Email": email,
-                })
-                st.success("✅ Profile updated successfully!")
-                st.rerun()
-    else:
-        st.markdown(
-            """
-            <style>
-            .details-card {
-                border: 1px solid #e5e7eb;
-                border-radius: 12px;
-                padding: 16px;
-                background: #fff;
-                box-shadow: 0 2px 6px rgba(0,0,0,0.05);
-            }
-            .details-grid {
-                display: grid;
-                grid-template-columns: 1fr 2fr;
-                row-gap: 10px;
-                column-gap: 20px;
-            }
-            .details-label { font-weight: 600; color: #374151; }
-            .details-value { color: #111827; }
-            </style>
-            """,
-            unsafe_allow_html=True,
-        )
-
-        st.markdown("<div class='details-card'>", unsafe_allow_html=True)
+def expenses_page():
+    st.title("💸 Expenses")
 
-        # Profile photo
-        if profile.get("Photo"):
-            st.image(profile["Photo"], width=100, caption="Profile Photo")
+    df_expense = data[data["Type"] == "Expense"]
 
-        st.markdown(
-            f"""
-            <div class="details-grid">
-                <div class="details-label">First Name</div><div class="details-value">{profile['First Name']}</div>
-                <div class="details-label">Last Name</div><div class="details-value">{profile['Last Name']}</div>
-                <div class="details-label">Username</div><div class="details-value">{profile['Username']}</div>
-                <div class="details-label">Email</div><div class="details-value">{profile['Email']}</div>
-            </div>
-            """,
-            unsafe_allow_html=True,
-        )
-        st.markdown("</div>", unsafe_allow_html=True)
+    total_amount, total_expenses = cube.totals(summary, "Expense")
 
-    st.markdown("---")
-
-    # --- Theme Switch ---
-    dark_mode = st.toggle("🌙 Theme", key="dark_mode")
+    # --- Summary cards like Dashboard ---
+    theme.metric_row([
+        ("📊", total_expenses, "Total Expenses"),
+        ("💰", money(total_amount), "Total Amount"),
+    ])
 
-    if dark_mode:
-        st.markdown(
-            """
-            <style>
-            body, .stApp {
-                background-color: #111827;
-                color: #f9fafb;
-            }
-            .metric-card, .details-card {
-                background: #1f2937 !important;
-                color: #f9fafb !important;
-            }
-            .details-label {
-                color: #d1d5db !important;
-            }
-            .details-value {
-                color: #f9fafb !important;
-            }
-            </style>
-            """,
-            unsafe_allow_html=True
-        )
     st.markdown("---")
 
-    # --- Plans ---
-    st.subheader("📦 Subscription Plan")
-
-    col1, col2 = st.columns(2)
-    with col1:
-        st.markdown(
-            """
-            <div class="metric-card">
-            <h4>Basic (Free)</h4>
-            <p><b>$0</b> per month</p>
-            <ul>
-                <li>Trend visualisation with charts</li>
-                <li>Add up to 100 entries per account</li>
-                <li>Track subscription billing dates</li>
-                <li>Choose preferred currency display</li>
-                <li>Email support available</li>
-            </ul>
-            <b>✅ Current plan</b>
-            </div>
-            """, unsafe_allow_html=True
-        )
-    with col2:
-        st.markdown(
-            """
-            <div class="metric-card">
-            <h4>Premium</h4>
-            <p><b>$20</b> per year</p>
-            <ul>
-                <li>Everything in Basic plan</li>
-                <li>Add up to 2000 entries per account</li>
-                <li>Advanced trend visualisation</li>
-                <li>Export data as CSV</li>
-                <li>Priority support</li>
-            </ul>
-            <button style="padding:8px 16px;background:#25a244;color:white;border:none;border-radius:8px;">Go Premium</button>
-            </div>
-            """, unsafe_allow_html=True
-        )
+    # --- Unusual spending, scored for the whole ledger once per version ---
+    scores = anomaly.detect(st.session_state.data, st.session_state.data_version)
+    unusual = scores.index[scores["Flag"]].intersection(df_expense.index)
+    if len(unusual):
+        st.warning(f"⚠️ {len(unusual)} unusual expense(s) compared with their category's normal range.")
+    duplicates = dedupe.detect(st.session_state.data, st.session_state.data_version).index.intersection(df_expense.index)
+    if len(duplicates):
+        st.info(f"🔁 {len(duplicates)} expense(s) look like duplicates of an earlier entry.")
+
+    # --- Records: filters, table and edit form rerun on their own ---
+    edit_fields = ["edit_expense_name", "edit_expense_amount", "edit_expense_category", "edit_expense_date",
+                   "edit_expense_paid", "edit_expense_notes"]
+
+    @ledger_fragment
+    def records():
+        form_notice("expense_records")
+        # --- Filters ---
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            filter_name = st.text_input("🔍 Filter by Name", key="filter_expense_name")
+        with col2:
+            filter_category = st.selectbox(
+                "Category",
+                ["All"] + sorted(df_expense["Category"].dropna().unique().tolist())
+                if not df_expense.empty else ["All"],
+                key="filter_expense_category"
+            )
+        with col3:
+            filter_month = st.selectbox(
+                "📅 Filter by Month",
+                ["All"] + sorted(df_expense["Date"].dt.strftime("%B").unique().tolist())
+                if not df_expense.empty else ["All"],
+                key="filter_expense_month"
+            )
 
+        filtered = df_expense
+        if filter_name:
+            filtered = filtered[filtered["Note"].str.contains(filter_name, case=False, na=False)]
+        if filter_category != "All":
+            filtered = filtered[filtered["Category"] == filter_category]
+        if filter_month != "All":
+            filtered = filtered[filtered["Date"].dt.strftime("%B") == filter_month]
+        if len(unusual) and st.checkbox("⚠️ Show unusual only", key="filter_expense_unusual"):
+            filtered = filtered[filtered.index.isin(unusual)]
+        flagged = filtered.index.isin(unusual)
+
+        # --- Show full table with edit/delete buttons ---
+        if not filtered.empty:
+            st.markdown("### Expense Records")
+            for (idx, row), is_unusual in zip(filtered.iterrows(), flagged):
+                cols = st.columns([2, 2, 2, 2, 2, 1])
+                cols[0].write(row["Note"])
+                cols[1].write(f"{'⚠️ ' if is_unusual else ''}{'🔁 ' if idx in duplicates else ''}{money(row['Amount'])}")
+                cols[2].write(row["Date"].strftime("%b %d, %Y"))
+                cols[3].write(row["Category"])
+                cols[4].write(row.get("PaidVia",""))
+                edit_btn = cols[5].button("✏️", key=f"edit_expense_{row_key[idx]}")
+                del_btn = cols[5].button("🗑️", key=f"del_expense_{row_key[idx]}")
+
+                if edit_btn:
+                    st.session_state.edit_expense_key = row_key[idx]
+                    clear_fields(edit_fields)
+                if del_btn:
+                    delete_entry("expense_records", "Expense", idx)
+                    st.rerun()
+        else:
+            st.info("No expense records found.")
+
+        # --- Edit Form ---
+        idx = edit_target("edit_expense_key")
+        if idx is not None:
+            st.markdown("---")
+            st.subheader("✏️ Edit Expense")
+            row = st.session_state.data.loc[idx]
+
+            def update_expense():
+                s = st.session_state
+                name = s.edit_expense_name.strip()
+                if not name or s.edit_expense_amount <= 0:
+                    notify_form("edit_expense_form", "error", "Please enter a name and an amount above zero.")
+                    return
+                update_entry("expense_records", "Expense", "edit_expense_key", {
+                    "Type": "Expense",
+                    "Amount": ledger.to_minor(s.edit_expense_amount),
+                    "Category": s.edit_expense_category,
+                    "Date": pd.to_datetime(s.edit_expense_date),
+                    "Note": name,
+                    "PaidVia": s.edit_expense_paid,
+                    "ExtraNote": s.edit_expense_notes
+                })
+                clear_fields(edit_fields)
+
+            with st.form("edit_expense_form"):
+                st.text_input("Expense Name", value=row["Note"], key="edit_expense_name")
+                st.number_input(f"Amount ({row['Currency']})", min_value=0.0, value=ledger.to_major(row["Amount"]), key="edit_expense_amount")
+                st.selectbox("Category", ["Food","Rent","Entertainment","Transport","Other"], index=0, key="edit_expense_category")
+                st.date_input("Date", value=row["Date"], key="edit_expense_date")
+                st.text_input("Paid Via", value=row.get("PaidVia",""), key="edit_expense_paid")
+                st.text_area("Notes", value=row.get("ExtraNote",""), key="edit_expense_notes")
+                st.form_submit_button("Update Expense", on_click=update_expense)
+            form_notice("edit_expense_form")
+
+    records()
     st.markdown("---")
 
-    # --- Delete Account ---
-    st.error("⚠️ Permanently delete your account and all its data.")
-    if st.button("🗑️ Delete Account"):
-        st.session_state.accounts = [a for a in st.session_state.accounts if a["email"] != st.session_state.user["email"]]
-        save_accounts(st.session_state.accounts)
-        clear_login()
-        st.session_state.logged_in = False
-        st.success("Account deleted successfully!")
-        st.rerun()
-
-# ----------------- Main App -----------------
-with st.sidebar:
-    choice = option_menu(
-        "Smart Finance",
-        ["Dashboard", "Income", "Expenses", "Investment", "Settings", "Logout"],
-        icons=["speedometer", "wallet2", "cash-coin", "piggy-bank", "gear", "box-arrow-right"],
-        menu_icon="app-indicator",
-        default_index=0,
-    )
+    # --- Add Form ---
+    new_fields = ["new_expense_name", "new_expense_amount", "new_expense_category", "new_expense_date",
+                  "new_expense_currency", "new_expense_paid", "new_expense_notes", "allow_duplicate_expense"]
+
+    def save_expense():
+        s = st.session_state
+        name = s.new_expense_name.strip()
+        if not name or s.new_expense_amount <= 0:
+            notify_form("expense_form", "error", "Please enter a name and an amount above zero.")
+            return
+        category = categorizer.resolve(s.user["email"], "Expense", s.new_expense_category, name)
+        new_expense = {
+            "Type": "Expense",
+            "Amount": ledger.to_minor(s.new_expense_amount),
+            "Category": category,
+            "Date": pd.to_datetime(s.new_expense_date),
+            "Note": name,
+            "PaidVia": s.new_expense_paid,
+            "ExtraNote": s.new_expense_notes,
+            "Currency": s.new_expense_currency
+        }
+        add_entry("expense_form", "expense", new_expense, s.allow_duplicate_expense,
+                  f"Added expense: {name} - {fx.format_money(s.new_expense_amount, s.new_expense_currency)} ({category})",
+                  new_fields)
+
+    st.subheader("➕ Add Expense")
+    with st.form("expense_form"):
+        st.text_input("Expense Name", key="new_expense_name")
+        st.number_input("Amount", min_value=0.0, key="new_expense_amount")
+        st.selectbox("Category", [categorizer.AUTO] + ["Food","Rent","Entertainment","Transport","Other"], key="new_expense_category",
+                     help=f"{categorizer.AUTO} picks a category from the name when the entry is saved.")
+        st.date_input("Date", date.today(), key="new_expense_date")
+        st.selectbox("Currency", fx.currencies(), index=fx.currencies().index(CURRENCY), key="new_expense_currency")
+        st.text_input("Paid Via", key="new_expense_paid")
+        st.text_area("Notes", key="new_expense_notes")
+        st.checkbox("Save even if it duplicates an entry", key="allow_duplicate_expense")
+        st.form_submit_button("Save Expense", on_click=save_expense)
+    form_notice("expense_form")
+
+    recurring_section("Expense", ["Food","Rent","Entertainment","Transport","Other"])
 
-if choice == "Dashboard":
-    dashboard()
-elif choice == "Income":
-    income_page()
-elif choice == "Expenses":
-    expenses_page()
-elif choice == "Investment":
-    savings_page()
-elif choice == "Settings":
-    settings_page()
-elif choice == "Logout":
-    st.session_state.logged_in = False
-    st.session_state.user = None
-    clear_login()
-    st.success("You have been logged out.")
+def savings_page():
+    st.title("💹 Investments")
 
-                
-    # ---------- Expense Form ----------
-    st.markdown("---")
-    st.subheader("➕ Add Expense (bottom)")
+    df_invest = data[data["Type"] == "Investment"]
 
-    expense_name = st.text_input("Expense Name", key="expense_name")
-    expense_amount = st.number_input("Amount", min_value=0.0, format="%.2f", key="expense_amount")
-    expense_category = st.selectbox("Category", ["Food", "Rent", "Entertainment", "Transport", "Other"], key="expense_category")
-    expense_date = st.date_input("Date", date.today(), key="expense_date")
+    # --- Holdings: valuation date, cards, table and edit form rerun on their own ---
+    edit_fields = ["edit_invest_name", "edit_invest_units", "edit_invest_price", "edit_invest_category",
+                   "edit_invest_date", "edit_invest_notes"]
 
-    col1, col2 = st.columns(2)
-    with col1:
-        if st.button("Save Expense"):
-            new_expense = {
-                "Type": "Expense",
-                "Amount": float(expense_amount),
-                "Category": expense_category,
-                "Date": pd.to_datetime(expense_date).date(),
-                "Note": expense_name
-            }
-            st.session_state.data = pd.concat([st.session_state.data, pd.DataFrame([new_expense])], ignore_index=True)
-            try:
-                df_to_save = st.session_state.data.copy()
-                df_to_save["Date"] = pd.to_datetime(df_to_save["Date"], errors="coerce").dt.date
-                df_to_save.to_csv(DATA_FILE, index=False)
-                st.success(f"Added {expense_name} - ₹{expense_amount}")
-            except Exception as e:
-                st.error(f"Error saving file: {e}")
-            st.rerun()
+    @ledger_fragment
+    def records():
+        form_notice("invest_records")
+        # --- Mark to market from the local price store ---
+        prices.ingest()
+        value_date = st.date_input("📅 Value as of", date.today(), key="invest_value_date")
+        holdings = prices.value_holdings(df_invest, value_date, fx.from_base(1.0, CURRENCY, value_date))
 
-    with col2:
-        if st.button("Clear"):
-            for k in ("expense_name", "expense_amount", "expense_category", "expense_date"):
-                if k in st.session_state:
-                    del st.session_state[k]
-            st.rerun()
+        total_amount, total_investments = cube.totals(summary, "Investment")
+        current_value = holdings["CurrentValue"].sum() if not holdings.empty else 0
+        unrealized = holdings["UnrealizedPnL"].sum() if not holdings.empty else 0
 
-# ----------------- Other Pages -----------------
+        # --- Summary Cards ---
+        theme.metric_row([
+            ("📊", total_investments, "Total Investments"),
+            ("💰", money(total_amount), "Total Amount"),
+            ("📈", money(current_value), "Current Value"),
+            ("🟢" if unrealized >= 0 else "🔴", money(unrealized), "Unrealized P&L"),
+        ])
 
-def income_page():
-    st.title("💰 Income")
+        st.markdown("---")
 
-    df_income = st.session_state.data[st.session_state.data["Type"] == "Income"]
-
-    total_income = len(df_income)
-    total_amount = df_income["Amount"].sum()
-
-    # --- Same style as Dashboard summary boxes ---
-    st.markdown("""
-    <style>
-    .metric-card {
-        border:1px solid #e5e7eb;
-        border-radius:12px;
-        padding:14px;
-        text-align:center;
-        background:#fff;
-        box-shadow:0 2px 6px rgba(0,0,0,0.05);
-    }
-    .metric-value {
-        font-size:1.3rem;
-        font-weight:600;
-    }
-    .metric-label {
-        color:#6b7280;
-        font-size:0.9rem;
-        margin-top:4px;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-
-    c1, c2 = st.columns(2)
-    with c1:
-        st.markdown(
-            f"<div class='metric-card'>📊<div class='metric-value'>{total_income}</div><div class='metric-label'>Total Incomes</div></div>",
-            unsafe_allow_html=True,
-        )
-    with c2:
-        st.markdown(
-            f"<div class='metric-card'>💰<div class='metric-value'>₹{total_amount:,.2f}</div><div class='metric-label'>Total Amount</div></div>",
-            unsafe_allow_html=True,
+        # --- Filter by Month ---
+        selected_month = st.selectbox(
+            "📅 Filter by Month",
+            ["All"] + sorted(holdings["Date"].dt.strftime("%B").unique().tolist()) if not holdings.empty else ["All"]
         )
 
-    st.markdown("---")
-
-    # --- Filter by Month ---
-    st.subheader("Income Records")
-    selected_month = st.selectbox(
-        "Filter by Month",
-        ["All"] + sorted(df_income["Date"].dt.strftime("%B").unique().tolist())
-        if not df_income.empty else ["All"],
-    )
-
-    filtered_income = df_income.copy()
-    if selected_month != "All":
-        filtered_income = filtered_income[filtered_income["Date"].dt.strftime("%B") == selected_month]
-
-    # --- Show Table with Edit/Delete ---
-    if not filtered_income.empty:
-        st.markdown("### Income Records")
-        for idx, row in filtered_income.iterrows():
-            with st.container():
-                c1, c2, c3, c4, c5, c6 = st.columns([2,2,2,2,2,1])
-                with c1: st.write(row["Note"])  # Name
-                with c2: st.write(f"₹{row['Amount']:,.2f}")  # Amount
-                with c3: st.write(row["Date"].strftime("%b %d, %Y"))  # Date
-                with c4: st.write(row["Category"])  # Category
-                with c5: st.write(row.get("ExtraNote",""))  # Optional Notes
-                with c6:
-                    edit = st.button("✏️", key=f"edit_income_{idx}")
-                    delete = st.button("🗑️", key=f"del_income_{idx}")
-
-                if edit:
-                    st.session_state.edit_income_idx = idx
-
-                if delete:
-                    st.session_state.data.drop(idx, inplace=True)
-                    st.session_state.data.to_csv(DATA_FILE, index=False)
-                    st.success("Income deleted!")
+        filtered = holdings
+        if selected_month != "All":
+            filtered = filtered[filtered["Date"].dt.strftime("%B") == selected_month]
+
+        # --- Show Table with Edit/Delete ---
+        if not filtered.empty:
+            st.markdown("### Investment Records")
+            for idx, row in filtered.iterrows():
+                cols = st.columns([2,1,1,1,2,2,1,2,1])
+                cols[0].write(row["Note"])  # Name
+                cols[1].write(row.get("Units",""))  # Units
+                cols[2].write(f"{money(row.get('SinglePrice',0))}")  # Single Stock Price
+                cols[3].write(f"{money(row['Amount'])}")  # Total Amount
+                cols[4].write(f"{money(row['CurrentValue'])} ({row['UnrealizedPnL']:+,.2f})")  # Current Value (P&L)
+                cols[5].write(row["Date"].strftime("%b %d, %Y"))  # Bought Date
+                cols[6].write(row["Category"])  # Category
+                cols[7].write(row.get("ExtraNote",""))  # Notes
+                edit_btn = cols[8].button("✏️", key=f"edit_invest_{row_key[idx]}")
+                del_btn = cols[8].button("🗑️", key=f"del_invest_{row_key[idx]}")
+
+                if edit_btn:
+                    st.session_state.edit_invest_key = row_key[idx]
+                    clear_fields(edit_fields)
+                if del_btn:
+                    delete_entry("invest_records", "Investment", idx)
                     st.rerun()
-    else:
-        st.info("No income records found.")
-
+        else:
+            st.info("No investment records found.")
+
+        # --- Edit Form ---
+        idx = edit_target("edit_invest_key")
+        if idx is not None:
+            st.markdown("---")
+            st.subheader("✏️ Edit Investment")
+            row = st.session_state.data.loc[idx]
+
+            def update_investment():
+                s = st.session_state
+                name = s.edit_invest_name.strip()
+                if not name or s.edit_invest_units <= 0 or s.edit_invest_price <= 0:
+                    notify_form("edit_invest_form", "error", "Please enter a name, units and a price above zero.")
+                    return
+                single_price_minor = ledger.to_minor(s.edit_invest_price)
+                update_entry("invest_records", "Investment", "edit_invest_key", {
+                    "Type": "Investment",
+                    "Amount": int(round(s.edit_invest_units * single_price_minor)),
+                    "Category": s.edit_invest_category,
+                    "Date": pd.to_datetime(s.edit_invest_date),
+                    "Note": name,
+                    "Units": s.edit_invest_units,
+                    "SinglePrice": single_price_minor,
+                    "ExtraNote": s.edit_invest_notes
+                })
+                clear_fields(edit_fields)
+
+            with st.form("edit_invest_form"):
+                st.text_input("Investment Name", value=row["Note"], key="edit_invest_name")
+                st.number_input("Units", min_value=0.0, value=float(row.get("Units",0)), key="edit_invest_units")
+                price = row.get("SinglePrice")
+                st.number_input(f"Single Stock Price ({row['Currency']})", min_value=0.0, value=0.0 if pd.isna(price) else ledger.to_major(price), key="edit_invest_price")
+                st.selectbox("Category", ["Indian Stock","Crypto Currency","Mutual Funds","Other"], index=0, key="edit_invest_category")
+                st.date_input("Bought Date", value=row["Date"], key="edit_invest_date")
+                st.text_area("Notes", value=row.get("ExtraNote",""), key="edit_invest_notes")
+                st.form_submit_button("Update Investment", on_click=update_investment)
+            form_notice("edit_invest_form")
+
+    records()
     st.markdown("---")
 
-    # --- Add / Edit Form ---
-    if "edit_income_idx" in st.session_state:
-        st.subheader("✏️ Edit Income")
-        idx = st.session_state.edit_income_idx
-        row = st.session_state.data.loc[idx]
-
-        name = st.text_input("Income Name", value=row["Note"], key="edit_income_name")
-        amount = st.number_input("Amount", min_value=0.0, value=float(row["Amount"]), key="edit_income_amount")
-        category = st.selectbox("Category", ["Salary","Business","Other"], index=0, key="edit_income_category")
-        date_in = st.date_input("Date", value=row["Date"], key="edit_income_date")
-
-        if st.button("Update Income"):
-            st.session_state.data.loc[idx] = {
-                "Type": "Income",
-                "Amount": amount,
-                "Category": category,
-                "Date": pd.to_datetime(date_in),
-                "Note": name
-            }
-            st.session_state.data.to_csv(DATA_FILE, index=False)
-            st.success("Income updated successfully!")
-            del st.session_state.edit_income_idx
-            st.rerun()
-
-    else:
-        st.subheader("➕ Add Income")
-        name = st.text_input("Income Name", key="new_income_name")
-        amount = st.number_input("Amount", min_value=0.0, key="new_income_amount")
-        category = st.selectbox("Category", ["Salary","Business","Other"], key="new_income_category")
-        date_in = st.date_input("Date", date.today(), key="new_income_date")
-
-        if st.button("Save Income"):
-            new_income = {
-                "Type": "Income",
-                "Amount": amount,
-                "Category": category,
-                "Date": pd.to_datetime(date_in),
-                "Note": name
-            }
-            st.session_state.data = pd.concat([st.session_state.data, pd.DataFrame([new_income])], ignore_index=True)
-            st.session_state.data.to_csv(DATA_FILE, index=False)
-            st.success(f"Added income: {name} - ₹{amount:,.2f}")
-            st.rerun()
-#------------------------------------------------------------------------------------------------
-
-def expenses_page():
-    st.title("💸 Expenses")
-
-    df_expense = st.session_state.data[st.session_state.data["Type"] == "Expense"]
-
-    total_expenses = len(df_expense)
-    total_amount = df_expense["Amount"].sum()
-
-    # --- Summary cards like Dashboard ---
-    st.markdown("""
-    <style>
-    .metric-card {
-        border:1px solid #e5e7eb;
-        border-radius:12px;
-        padding:14px;
-        text-align:center;
-        background:#fff;
-        box-shadow:0 2px 6px rgba(0,0,0,0.05);
-    }
-    .metric-value {
-        font-size:1.3rem;
-        font-weight:600;
-    }
-    .metric-label {
-        color:#6b7280;
-        font-size:0.9rem;
-        margin-top:4px;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-
-    c1, c2 = st.columns(2)
-    with c1:
-        st.markdown(
-            f"<div class='metric-card'>📊<div class='metric-value'>{total_expenses}</div><div class='metric-label'>Total Expenses</div></div>",
-            unsafe_allow_html=True,
-        )
-    with c2:
-        st.markdown(
-            f"<div class='metric-card'>💰<div class='metric-value'>₹{total_amount:,.2f}</div><div class='metric-label'>Total Amount</div></div>",
-            unsafe_allow_html=True,
-        )
-
-    st.markdown("---")
+    # --- Add Form ---
+    new_fields = ["new_invest_name", "new_invest_units", "new_invest_price", "new_invest_category",
+                  "new_invest_date", "new_invest_currency", "new_invest_notes", "allow_duplicate_invest"]
+
+    def save_investment():
+        s = st.session_state
+        name = s.new_invest_name.strip()
+        if not name or s.new_invest_units <= 0 or s.new_invest_price <= 0:
+            notify_form("invest_form", "error", "Please enter a name, units and a price above zero.")
+            return
+        # Price in minor units times units, rounded once to a whole minor unit.
+        single_price_minor = ledger.to_minor(s.new_invest_price)
+        total_amount_minor = int(round(s.new_invest_units * single_price_minor))
+        category = categorizer.resolve(s.user["email"], "Investment", s.new_invest_category, name)
+        new_invest = {
+            "Type": "Investment",
+            "Amount": total_amount_minor,
+            "Category": category,
+            "Date": pd.to_datetime(s.new_invest_date),
+            "Note": name,
+            "Units": s.new_invest_units,
+            "SinglePrice": single_price_minor,
+            "ExtraNote": s.new_invest_notes,
+            "Currency": s.new_invest_currency
+        }
+        add_entry("invest_form", "investment", new_invest, s.allow_duplicate_invest,
+                  f"Added investment: {name} - {fx.format_money(ledger.to_major(total_amount_minor), s.new_invest_currency)} ({category})",
+                  new_fields)
+
+    st.subheader("➕ Add Investment")
+    with st.form("invest_form"):
+        st.text_input("Investment Name", key="new_invest_name")
+        st.number_input("Units", min_value=0.0, key="new_invest_units")
+        st.number_input("Single Stock Price", min_value=0.0, key="new_invest_price")
+        st.selectbox("Category", [categorizer.AUTO] + ["Indian Stock","Crypto Currency","Mutual Funds","Other"], key="new_invest_category",
+                     help=f"{categorizer.AUTO} picks a category from the name when the entry is saved.")
+        st.date_input("Bought Date", date.today(), key="new_invest_date")
+        st.selectbox("Currency", fx.currencies(), index=fx.currencies().index(CURRENCY), key="new_invest_currency")
+        st.text_area("Notes", key="new_invest_notes")
+        st.checkbox("Save even if it duplicates an entry", key="allow_duplicate_invest")
+        st.form_submit_button("Save Investment", on_click=save_investment)
+    form_notice("invest_form")
+
+    recurring_section("Investment", ["Indian Stock","Crypto Currency","Mutual Funds","Other"])
 
-    # --- Filters ---
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        filter_name = st.text_input("🔍 Filter by Name", key="filter_expense_name")
-    with col2:
-        filter_category = st.selectbox(
-            "Category",
-            ["All"] + sorted(df_expense["Category"].dropna().unique().tolist())
-            if not df_expense.empty else ["All"],
-            key="filter_expense_category"
-        )
-    with col3:
-        filter_month = st.selectbox(
-            "📅 Filter by Month",
-            ["All"] + sorted(df_expense["Date"].dt.strftime("%B").unique().tolist())
-            if not df_expense.empty else ["All"],
-            key="filter_expense_month"
-        )
+def goals_page():
+    st.title("🎯 Goals")
 
-    filtered = df_expense.copy()
-    if filter_name:
-        filtered = filtered[filtered["Note"].str.contains(filter_name, case=False, na=False)]
-    if filter_category != "All":
-        filtered = filtered[filtered["Category"] == filter_category]
-    if filter_month != "All":
-        filtered = filtered[filtered["Date"].dt.strftime("%B") == filter_month]
-
-    # --- Show full table with edit/delete buttons ---
-    if not filtered.empty:
-        st.markdown("### Expense Records")
-        for idx, row in filtered.iterrows():
-            cols = st.columns([2, 2, 2, 2, 2, 1])
-            cols[0].write(row["Note"])
-            cols[1].write(f"₹{row['Amount']:,.2f}")
-            cols[2].write(row["Date"].strftime("%b %d, %Y"))
-            cols[3].write(row["Category"])
-            cols[4].write(row.get("PaidVia",""))
-            edit_btn = cols[5].button("✏️", key=f"edit_expense_{idx}")
-            del_btn = cols[5].button("🗑️", key=f"del_expense_{idx}")
-
-            if edit_btn:
-                st.session_state.edit_expense_idx = idx
-            if del_btn:
-                st.session_state.data.drop(idx, inplace=True)
-                st.session_state.data.to_csv(DATA_FILE, index=False)
-                st.success("Expense deleted!")
-                st.rerun()
+    email = st.session_state.user["email"]
+    store = goals.sync(st.session_state.data)
+    user_goals = goals.user_goals(store, email)
+
+    # --- Goal Progress ---
+    if user_goals:
+        for goal, value in user_goals:
+            value = fx.from_base(value, CURRENCY)
+            target = fx.from_base(goal["target"], CURRENCY)
+            ratio = min(max(value / target, 0.0), 1.0) if target else 1.0
+            label = goals.GOAL_KINDS[goal["kind"]]
+            if goal.get("category") and goal["category"] != "All":
+                label += f" · {goal['category']}"
+
+            c1, c2 = st.columns([6, 1])
+            with c1:
+                st.markdown(f"**{goal['name']}** — {label}")
+                st.progress(ratio, text=f"{money(value)} of {money(target)}")
+                if goal["kind"] == "cap" and value > target:
+                    st.warning(f"Over this month's cap by {money(value - target)}")
+            with c2:
+                if st.button("🗑️", key=f"del_goal_{goal['id']}"):
+                    goals.delete_goal(email, goal["id"])
+                    st.rerun()
     else:
-        st.info("No expense records found.")
+        st.info("No goals yet. Add your first financial goal below.")
 
     st.markdown("---")
 
-    # --- Add / Edit Expense Form ---
-    if "edit_expense_idx" in st.session_state:
-        st.subheader("✏️ Edit Expense")
-        idx = st.session_state.edit_expense_idx
-        row = st.session_state.data.loc[idx]
-
-        name = st.text_input("Expense Name", value=row["Note"], key="edit_expense_name")
-        amount = st.number_input("Amount", min_value=0.0, value=float(row["Amount"]), key="edit_expense_amount")
-        category = st.selectbox("Category", ["Food","Rent","Entertainment","Transport","Other"], index=0, key="edit_expense_category")
-        date_in = st.date_input("Date", value=row["Date"], key="edit_expense_date")
-        paid_via = st.text_input("Paid Via", value=row.get("PaidVia",""), key="edit_expense_paid")
-        notes = st.text_area("Notes", value=row.get("ExtraNote",""), key="edit_expense_notes")
-
-        if st.button("Update Expense"):
-            st.session_state.data.loc[idx] = {
-                "Type": "Expense",
-                "Amount": amount,
-                "Category": category,
-                "Date": pd.to_datetime(date_in),
-                "Note": name,
-                "PaidVia": paid_via,
-                "ExtraNote": notes
-            }
-            st.session_state.data.to_csv(DATA_FILE, index=False)
-            st.success("Expense updated successfully!")
-            del st.session_state.edit_expense_idx
-            st.rerun()
-
-    else:
-        st.subheader("➕ Add Expense")
-        name = st.text_input("Expense Name", key="new_expense_name")
-        amount = st.number_input("Amount", min_value=0.0, key="new_expense_amount")
-        category = st.selectbox("Category", ["Food","Rent","Entertainment","Transport","Other"], key="new_expense_category")
-        date_in = st.date_input("Date", date.today(), key="new_expense_date")
-        paid_via = st.text_input("Paid Via", key="new_expense_paid")
-        notes = st.text_area("Notes", key="new_expense_notes")
-
-        if st.button("Save Expense"):
-            new_expense = {
-                "Type": "Expense",
-                "Amount": amount,
-                "Category": category,
-                "Date": pd.to_datetime(date_in),
-                "Note": name,
-                "PaidVia": paid_via,
-                "ExtraNote": notes
-            }
-            st.session_state.data = pd.concat([st.session_state.data, pd.DataFrame([new_expense])], ignore_index=True)
-            st.session_state.data.to_csv(DATA_FILE, index=False)
-            st.success(f"Added expense: {name} - ₹{amount:,.2f}")
-            st.rerun()
-
-def savings_page():
-    st.title("💹 Investments")
-
-    df_invest = st.session_state.data[st.session_state.data["Type"] == "Investment"]
-
-    total_investments = len(df_invest)
-    total_amount = df_invest["Amount"].sum() if not df_invest.empty else 0
-
-    # --- Summary Cards ---
-    st.markdown("""
-    <style>
-    .metric-card {
-        border:1px solid #e5e7eb;
-        border-radius:12px;
-        padding:14px;
-        text-align:center;
-        background:#fff;
-        box-shadow:0 2px 6px rgba(0,0,0,0.05);
-    }
-    .metric-value {
-        font-size:1.3rem;
-        font-weight:600;
-    }
-    .metric-label {
-        color:#6b7280;
-        font-size:0.9rem;
-        margin-top:4px;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-
-    c1, c2 = st.columns(2)
-    with c1:
-        st.markdown(
-            f"<div class='metric-card'>📊<div class='metric-value'>{total_investments}</div><div class='metric-label'>Total Investments</div></div>",
-            unsafe_allow_html=True,
+    # --- Add Goal Form ---
+    st.subheader("➕ Add Goal")
+    with st.form("goal_form", clear_on_submit=True):
+        name = st.text_input("Goal Name")
+        kind = st.selectbox("Goal Type", list(goals.GOAL_KINDS), format_func=goals.GOAL_KINDS.get)
+        target = st.number_input("Target Amount", min_value=0.0)
+        category = st.selectbox(
+            "Category (spending caps and investment targets)",
+            ["All", "Food", "Rent", "Entertainment", "Transport", "Other",
+             "Indian Stock", "Crypto Currency", "Mutual Funds"],
         )
-    with c2:
-        st.markdown(
-            f"<div class='metric-card'>💰<div class='metric-value'>₹{total_amount:,.2f}</div><div class='metric-label'>Total Amount</div></div>",
-            unsafe_allow_html=True,
-        )
-
-    st.markdown("---")
-
-    # --- Filter by Month ---
-    selected_month = st.selectbox(
-        "📅 Filter by Month",
-        ["All"] + sorted(df_invest["Date"].dt.strftime("%B").unique().tolist()) if not df_invest.empty else ["All"]
-    )
-
-    filtered = df_invest.copy()
-    if selected_month != "All":
-        filtered = filtered[filtered["Date"].dt.strftime("%B") == selected_month]
-
-    # --- Show Table with Edit/Delete ---
-    if not filtered.empty:
-        st.markdown("### Investment Records")
-        for idx, row in filtered.iterrows():
-            cols = st.columns([2,1,1,1,2,1,2,1])
-            cols[0].write(row["Note"])  # Name
-            cols[1].write(row.get("Units",""))  # Units
-            cols[2].write(f"₹{row.get('SinglePrice',0):,.2f}")  # Single Stock Price
-            cols[3].write(f"₹{row['Amount']:,.2f}")  # Total Amount
-            cols[4].write(row["Date"].strftime("%b %d, %Y"))  # Bought Date
-            cols[5].write(row["Category"])  # Category
-            cols[6].write(row.get("ExtraNote",""))  # Notes
-            edit_btn = cols[7].button("✏️", key=f"edit_invest_{idx}")
-            del_btn = cols[7].button("🗑️", key=f"del_invest_{idx}")
-
-            if edit_btn:
-                st.session_state.edit_invest_idx = idx
-            if del_btn:
-                st.session_state.data.drop(idx, inplace=True)
-                st.session_state.data.to_csv(DATA_FILE, index=False)
-                st.success("Investment deleted!")
+        submitted = st.form_submit_button("Save Goal")
+        if submitted:
+            if not name or target <= 0:
+                st.error("Please enter a name and a target above zero.")
+            elif kind == "cap" and category == "All":
+                st.error("Pick the expense category to cap.")
+            else:
+                target_base = target / fx.from_base(1.0, CURRENCY)
+                goals.add_goal(email, kind, name, target_base, category if kind != "savings" else None)
+                st.success(f"Goal added: {name}")
                 st.rerun()
-    else:
-        st.info("No investment records found.")
-
-    st.markdown("---")
-
-    # --- Add / Edit Investment Form ---
-    if "edit_invest_idx" in st.session_state:
-        st.subheader("✏️ Edit Investment")
-        idx = st.session_state.edit_invest_idx
-        row = st.session_state.data.loc[idx]
-
-        name = st.text_input("Investment Name", value=row["Note"], key="edit_invest_name")
-        units = st.number_input("Units", min_value=0.0, value=float(row.get("Units",0)), key="edit_invest_units")
-        single_price = st.number_input("Single Stock Price", min_value=0.0, value=float(row.get("SinglePrice",0)), key="edit_invest_price")
-        total_amount_input = units * single_price
-        category = st.selectbox("Category", ["Indian Stock","Crypto Currency","Mutual Funds","Other"], index=0, key="edit_invest_category")
-        date_in = st.date_input("Bought Date", value=row["Date"], key="edit_invest_date")
-        notes = st.text_area("Notes", value=row.get("ExtraNote",""), key="edit_invest_notes")
-
-        if st.button("Update Investment"):
-            st.session_state.data.loc[idx] = {
-                "Type": "Investment",
-                "Amount": total_amount_input,
-                "Category": category,
-                "Date": pd.to_datetime(date_in),
-                "Note": name,
-                "Units": units,
-                "SinglePrice": single_price,
-                "ExtraNote": notes
-            }
-            st.session_state.data.to_csv(DATA_FILE, index=False)
-            st.success("Investment updated successfully!")
-            del st.session_state.edit_invest_idx
-            st.rerun()
-    else:
-        st.subheader("➕ Add Investment")
-        name = st.text_input("Investment Name", key="new_invest_name")
-        units = st.number_input("Units", min_value=0.0, key="new_invest_units")
-        single_price = st.number_input("Single Stock Price", min_value=0.0, key="new_invest_price")
-        total_amount_input = units * single_price
-        category = st.selectbox("Category", ["Indian Stock","Crypto Currency","Mutual Funds","Other"], key="new_invest_category")
-        date_in = st.date_input("Bought Date", date.today(), key="new_invest_date")
-        notes = st.text_area("Notes", key="new_invest_notes")
-
-        if st.button("Save Investment"):
-            new_invest = {
-                "Type": "Investment",
-                "Amount": total_amount_input,
-                "Category": category,
-                "Date": pd.to_datetime(date_in),
-                "Note": name,
-                "Units": units,
-                "SinglePrice": single_price,
-                "ExtraNote": notes
-            }
-            st.session_state.data = pd.concat([st.session_state.data, pd.DataFrame([new_invest])], ignore_index=True)
-            st.session_state.data.to_csv(DATA_FILE, index=False)
-            st.success(f"Added investment: {name} - ₹{total_amount_input:,.2f}")
-            st.rerun()
-def goals_page():
-    st.title("🎯 Goals")
-    st.info("This is your goals page. You can add financial goals here.")
 
 
 def settings_page():
@@ -1605,8 +1058,6 @@ def settings_page():
     if edit_mode:
         with st.form("profile_form", clear_on_submit=False):
             uploaded_photo = st.file_uploader("Upload Profile Photo", type=["jpg", "png", "jpeg"])
-            if uploaded_photo:
-                profile["Photo"] = uploaded_photo.getvalue()
 
             fname = st.text_input("First Name", value=profile["First Name"])
             lname = st.text_input("Last Name", value=profile["Last Name"])
@@ -1614,87 +1065,62 @@ def settings_page():
             email = st.text_input("Email", value=profile["Email"])
             submitted = st.form_submit_button("💾 Save Changes")
             if submitted:
-                st.session_state.profile.update({
-                    "First Name": fname,
-                    "Last Name": lname,
-                    "Email": email,
-                })
-                st.success("✅ Profile updated successfully!")
-                st.rerun()
+                # The session keeps only the photo's content hash; the image
+                # itself lives in the shared photo store.
+                try:
+                    photo = photos.put(uploaded_photo.getvalue()) if uploaded_photo else profile["Photo"]
+                except ValueError as e:
+                    st.error(f"Photo not saved: {e}")
+                else:
+                    st.session_state.profile.update({
+                        "First Name": fname,
+                        "Last Name": lname,
+                        "Email": email,
+                        "Photo": photo,
+                    })
+                    st.success("✅ Profile updated successfully!")
+                    st.rerun()
     else:
-        st.markdown(
-            """
-            <style>
-            .details-card {
-                border: 1px solid #e5e7eb;
-                border-radius: 12px;
-                padding: 16px;
-                background: #fff;
-                box-shadow: 0 2px 6px rgba(0,0,0,0.05);
-            }
-            .details-grid {
-                display: grid;
-                grid-template-columns: 1fr 2fr;
-                row-gap: 10px;
-                column-gap: 20px;
-            }
-            .details-label { font-weight: 600; color: #374151; }
-            .details-value { color: #111827; }
-            </style>
-            """,
-            unsafe_allow_html=True,
-        )
-
-        st.markdown("<div class='details-card'>", unsafe_allow_html=True)
-
         # Profile photo
-        if profile.get("Photo"):
-            st.image(profile["Photo"], width=100, caption="Profile Photo")
+        thumb = photos.thumbnail(profile.get("Photo"))
+        if thumb:
+            st.image(thumb, width=100, caption="Profile Photo")
 
         st.markdown(
             f"""
-            <div class="details-grid">
+            <div class="details-card"><div class="details-grid">
                 <div class="details-label">First Name</div><div class="details-value">{profile['First Name']}</div>
                 <div class="details-label">Last Name</div><div class="details-value">{profile['Last Name']}</div>
                 <div class="details-label">Username</div><div class="details-value">{profile['Username']}</div>
                 <div class="details-label">Email</div><div class="details-value">{profile['Email']}</div>
-            </div>
+            </div></div>
             """,
             unsafe_allow_html=True,
         )
-        st.markdown("</div>", unsafe_allow_html=True)
 
     st.markdown("---")
 
     # --- Theme Switch ---
-    dark_mode = st.toggle("🌙 Theme", key="dark_mode")
+    # Applies on every page; the stylesheet is sent by theme.inject().
+    st.toggle("🌙 Theme", value=theme.is_dark(), key="dark_mode", on_change=theme.remember_dark)
+    st.markdown("---")
 
-    if dark_mode:
-        st.markdown(
-            """
-            <style>
-            body, .stApp {
-                background-color: #111827;
-                color: #f9fafb;
-            }
-            .metric-card, .details-card {
-                background: #1f2937 !important;
-                color: #f9fafb !important;
-            }
-            .details-label {
-                color: #d1d5db !important;
-            }
-            .details-value {
-                color: #f9fafb !important;
-            }
-            </style>
-            """,
-            unsafe_allow_html=True
-        )
+    # --- Display Currency ---
+    options = fx.currencies()
+    picked = st.selectbox("💱 Display Currency", options, index=options.index(CURRENCY), key="display_currency")
+    if picked != CURRENCY:
+        st.session_state.user["currency"] = picked
+        for acc in st.session_state.accounts:
+            if acc["email"] == st.session_state.user["email"]:
+                acc["currency"] = picked
+        save_accounts(st.session_state.accounts)
+        st.rerun()
     st.markdown("---")
 
     # --- Plans ---
     st.subheader("📦 Subscription Plan")
+    used, cap = quota.used(st.session_state.user["email"]), quota.limit(PLAN)
+    st.progress(min(used / cap, 1.0), text=f"{used} of {cap} entries used on the {PLAN} plan")
 
     col1, col2 = st.columns(2)
     with col1:
@@ -1734,6 +1160,29 @@ def settings_page():
 
     st.markdown("---")
 
+    # --- Export ---
+    st.download_button(
+        "⬇️ Export data as CSV",
+        ledger.export_csv(ledger.user_rows(st.session_state.data, st.session_state.user["email"])),
+        file_name="smart_finance_export.csv",
+        mime="text/csv",
+    )
+
+    # --- What the previous run sent to this browser ---
+    stats = theme.last_run()
+    if stats:
+        st.caption(f"Last page update: {stats['deltas']} elements in {stats['messages']} messages, {stats['bytes'] / 1024:.1f} KB.")
+
+    # --- Memory held by this session ---
+    with st.expander("🧠 Session memory"):
+        if st.checkbox("Measure this session", key="measure_memory"):
+            usage, total = memory.session_report(st.session_state)
+            st.caption(f"{memory.format_bytes(total)} in {len(usage)} session values; "
+                       f"{photos.cache_info()['thumbnails']} photo thumbnail(s) cached for all sessions.")
+            st.dataframe(usage.assign(Size=usage["Bytes"].map(memory.format_bytes)).drop(columns="Bytes"),
+                         hide_index=True, use_container_width=True)
+    st.markdown("---")
+
     # --- Delete Account ---
     st.error("⚠️ Permanently delete your account and all its data.")
     if st.button("🗑️ Delete Account"):
@@ -1745,13 +1194,17 @@ def settings_page():
         st.rerun()
 
 # ----------------- Main App -----------------
+# A page can be opened directly with ?page=<name>.
+PAGES = ["Dashboard", "Income", "Expenses", "Investment", "Goals", "Settings", "Logout"]
+start_page = st.query_params.get("page")
+
 with st.sidebar:
     choice = option_menu(
         "Smart Finance",
-        ["Dashboard", "Income", "Expenses", "Investment", "Settings", "Logout"],
-        icons=["speedometer", "wallet2", "cash-coin", "piggy-bank", "gear", "box-arrow-right"],
+        PAGES,
+        icons=["speedometer", "wallet2", "cash-coin", "piggy-bank", "bullseye", "gear", "box-arrow-right"],
         menu_icon="app-indicator",
-        default_index=0,
+        default_index=PAGES.index(start_page) if start_page in PAGES else 0,
         
     )
 
@@ -1763,6 +1216,8 @@ elif choice == "Expenses":
     expenses_page()
 elif choice == "Investment":
     savings_page()
+elif choice == "Goals":
+    goals_page()
 elif choice == "Settings":
     settings_page()
 elif choice == "Logout":
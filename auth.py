@@ -0,0 +1,127 @@
+# auth.py
+import os, hmac, time, base64, hashlib, threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+# ---------- Hashing ----------
+# Passwords are stored as "scrypt$<n>$<r>$<p>$<salt>$<hash>", salt and hash
+# in base64. scrypt is deliberately slow and memory-hard; hashlib releases
+# the GIL while it runs, so hashes are computed on a small worker pool and
+# other sessions keep rendering during a login or signup. The pool bounds
+# how many hashes (and their memory) run at once, and a login that would
+# have to queue behind too many others is turned away instead.
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2**14, 8, 1
+SALT_BYTES = 16
+WORKERS = 2
+MAX_QUEUED = 32
+
+_pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="auth")
+_slots = threading.BoundedSemaphore(MAX_QUEUED)
+
+class Busy(Exception):
+    pass
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"too many attempts, retry in {retry_after} s")
+        self.retry_after = retry_after
+
+def _b64(data):
+    return base64.b64encode(data).decode()
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r)
+
+def _hash(password):
+    salt = os.urandom(SALT_BYTES)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+
+_DUMMY = _hash("")   # checked against when there is no such account
+
+def _matches(password, stored):
+    stored = str(stored or "")
+    if not stored.startswith("scrypt$"):
+        # Accounts created before hashing keep the password as typed.
+        return bool(stored) and hmac.compare_digest(password.encode(), stored.encode())
+    try:
+        _, n, r, p, salt, digest = stored.split("$")
+        expected = base64.b64decode(digest)
+        actual = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+def _run(fn, *args):
+    if not _slots.acquire(blocking=False):
+        raise Busy("too many logins in progress")
+    try:
+        return _pool.submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+def hash_password(password):
+    return _run(_hash, password)
+
+# True when the stored value should be replaced by a fresh hash: it is still
+# plain text, or it was hashed with weaker parameters than today's.
+def needs_upgrade(stored):
+    stored = str(stored or "")
+    return not stored.startswith("scrypt$") or stored.split("$")[1:4] != [str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P)]
+
+
+# ---------- Rate limiting ----------
+# Failed logins are counted per account in memory. After MAX_FAILURES within
+# WINDOW_SECONDS the account refuses further attempts, without hashing,
+# until the window has passed; a successful login clears the count.
+MAX_FAILURES = 5
+WINDOW_SECONDS = 300
+
+_lock = threading.Lock()
+_failures = {}   # email -> (count, first failure time)
+_FAILURES_SIZE = 10_000
+
+def _key(email):
+    return str(email or "").strip().lower()
+
+def _check_limit(email):
+    with _lock:
+        count, since = _failures.get(_key(email), (0, 0.0))
+        wait = since + WINDOW_SECONDS - time.time()
+        if count >= MAX_FAILURES and wait > 0:
+            raise RateLimited(int(wait) + 1)
+
+def _record(email, ok):
+    key = _key(email)
+    with _lock:
+        if ok:
+            _failures.pop(key, None)
+            return
+        now = time.time()
+        count, since = _failures.get(key, (0, 0.0))
+        if now - since > WINDOW_SECONDS:
+            count, since = 0, now
+        _failures[key] = (count + 1, since)
+        if len(_failures) > _FAILURES_SIZE:
+            for k in [k for k, (_, t) in _failures.items() if now - t > WINDOW_SECONDS]:
+                del _failures[k]
+
+def _check(password, stored):
+    if not _matches(password, stored):
+        return False, None
+    return True, _hash(password) if needs_upgrade(stored) else None
+
+# Checks a login attempt against the stored password, None when there is no
+# such account; that still costs one hash, so the answer takes as long.
+# Returns (ok, new stored value or None); a new value is given when the
+# stored one needs an upgrade and should be saved in its place. Raises
+# RateLimited or Busy instead of checking.
+def verify(email, password, stored):
+    _check_limit(email)
+    if stored is None:
+        _run(_matches, password, _DUMMY)
+        _record(email, False)
+        return False, None
+    ok, rehashed = _run(_check, password, stored)
+    _record(email, ok)
+    return ok, rehashed
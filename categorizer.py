@@ -0,0 +1,198 @@
+# categorizer.py
+import os, json, re, threading
+import numpy as np
+import pandas as pd
+import ledger
+
+
+# ---------- Files for persistence ----------
+MODELS_DIR = os.path.join(ledger.BASE_DIR, "models")
+INDEX_FILE = os.path.join(MODELS_DIR, "index.json")
+
+AUTO = "🪄 Auto"
+FALLBACK = "Other"
+TOKEN = r"[a-z0-9]+"
+
+# Each user's model is a multinomial naive Bayes over the words of the
+# record's Note, one class per "<Type>|<Category>":
+#   docs[class]            number of records in the class
+#   words[class][token]    token occurrences in the class
+# Counts are integers so a deleted record is subtracted exactly.
+_lock = threading.Lock()
+_models = {}   # user -> (file version, model) loaded from disk
+_compiled = {} # (Type, (owner, file version)...) -> matrices used for prediction
+
+
+def _model_file(user):
+    safe = re.sub(r"[^a-zA-Z0-9]+", "_", user) or "_shared"
+    return os.path.join(MODELS_DIR, f"{safe}.json")
+
+def _empty_model():
+    return {"docs": {}, "words": {}}
+
+def load_model(user):
+    path = _model_file(user)
+    version = ledger.ledger_version(path)
+    cached = _models.get(user)
+    if cached and cached[0] == version:
+        return cached[1]
+    model = _empty_model()
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                model = json.load(f)
+        except:
+            model = _empty_model()
+    _models[user] = (version, model)
+    return model
+
+def _save_model(user, model):
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    path = _model_file(user)
+    tmp = path + f".{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(model, f)
+    os.replace(tmp, path)
+    _models[user] = (ledger.ledger_version(path), model)
+
+def _load_index():
+    if os.path.exists(INDEX_FILE):
+        try:
+            with open(INDEX_FILE, "r") as f:
+                return json.load(f)
+        except:
+            return {"ledger_version": None}
+    return {"ledger_version": None}
+
+def _save_index(index):
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    tmp = INDEX_FILE + f".{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp, INDEX_FILE)
+
+
+# ---------- Training ----------
+def _tokens(notes):
+    return notes.fillna("").astype(str).str.lower().str.findall(TOKEN)
+
+def _fold(models, rows, sign):
+    rows = rows[rows["Category"].notna() & rows["Type"].notna()]
+    if rows.empty:
+        return
+    frame = pd.DataFrame({
+        "User": rows["User"].fillna("").values,
+        "Class": (rows["Type"].astype(str) + "|" + rows["Category"].astype(str)).values,
+        "Token": _tokens(rows["Note"]).values,
+    })
+    for (user, cls), n in frame.groupby(["User", "Class"]).size().items():
+        model = models.setdefault(user, _empty_model())
+        model["docs"][cls] = model["docs"].get(cls, 0) + sign * int(n)
+    words = frame.explode("Token").dropna(subset=["Token"])
+    for (user, cls, token), n in words.groupby(["User", "Class", "Token"]).size().items():
+        bucket = models[user]["words"].setdefault(cls, {})
+        bucket[token] = bucket.get(token, 0) + sign * int(n)
+        if bucket[token] <= 0:
+            bucket.pop(token)
+    for model in models.values():
+        for cls in [c for c, n in model["docs"].items() if n <= 0]:
+            model["docs"].pop(cls)
+            model["words"].pop(cls, None)
+
+# Retrains every user's model from the ledger; only needed when the models
+# are not at the ledger's current version.
+def sync(df, force=False):
+    version = ledger.ledger_version()
+    with _lock:
+        if not force and _load_index().get("ledger_version") == version:
+            return
+        models = {}
+        _fold(models, df, 1)
+        if os.path.isdir(MODELS_DIR):
+            for name in os.listdir(MODELS_DIR):
+                if name.endswith(".json") and name != "index.json":
+                    os.remove(os.path.join(MODELS_DIR, name))
+        _models.clear()
+        for user, model in models.items():
+            _save_model(user, model)
+        _save_index({"ledger_version": version})
+
+@ledger.on_change
+def _on_ledger_change(removed, added, old_version, new_version):
+    with _lock:
+        if _load_index().get("ledger_version") != old_version:
+            return  # already stale, the next sync() retrains
+        users = set(removed["User"].fillna("")) | set(added["User"].fillna(""))
+        models = {u: load_model(u) for u in users}
+        _fold(models, removed, -1)
+        _fold(models, added, 1)
+        for user, model in models.items():
+            _save_model(user, model)
+        _save_index({"ledger_version": new_version})
+
+
+# ---------- Prediction ----------
+# Log-priors and per-token log-likelihoods (Laplace smoothed) for the classes
+# of one Type, built once per model version. Rows shared by every account
+# (no User) train the shared model, which is folded into each user's.
+def _compile(user, typ):
+    owners = [user, ""] if user else [""]
+    models = [load_model(u) for u in owners]
+    key = (typ,) + tuple((u, _models[u][0]) for u in owners)
+    if key in _compiled:
+        return _compiled[key]
+    docs, words = {}, {}
+    for model in models:
+        for cls, n in model["docs"].items():
+            if cls.split("|", 1)[0] == typ:
+                docs[cls] = docs.get(cls, 0) + n
+                bucket = words.setdefault(cls, {})
+                for token, k in model["words"].get(cls, {}).items():
+                    bucket[token] = bucket.get(token, 0) + k
+    if not docs:
+        return None
+    classes = sorted(docs)
+    vocab = pd.Index(sorted({t for c in classes for t in words[c]}))
+    counts = np.zeros((len(vocab), len(classes)))
+    for j, cls in enumerate(classes):
+        if words[cls]:
+            counts[vocab.get_indexer(list(words[cls])), j] = list(words[cls].values())
+    prior = np.log(np.array([docs[c] for c in classes], dtype=float) / sum(docs.values()))
+    loglik = np.log((counts + 1) / (counts.sum(axis=0) + len(vocab) + 1))
+    if len(_compiled) > 32:
+        _compiled.clear()
+    _compiled[key] = (classes, vocab, prior, loglik)
+    return _compiled[key]
+
+# Labels any number of notes at once: the notes are split into tokens with
+# vectorized string ops, every token is looked up in one get_indexer call,
+# and the per-class scores are summed with one bincount per class.
+def predict(user, typ, notes):
+    notes = pd.Series(notes, dtype=object).reset_index(drop=True)
+    compiled = _compile(user, typ)
+    if compiled is None or notes.empty:
+        return pd.Series(FALLBACK, index=notes.index)
+    classes, vocab, prior, loglik = compiled
+
+    tokens = _tokens(notes).explode()
+    cols = vocab.get_indexer(tokens.fillna("").values)
+    known = cols >= 0
+    rows = tokens.index.values[known]
+    cols = cols[known]
+
+    scores = np.tile(prior, (len(notes), 1))
+    for j in range(len(classes)):
+        scores[:, j] += np.bincount(rows, weights=loglik[cols, j], minlength=len(notes))
+    labels = np.array([c.split("|", 1)[1] for c in classes], dtype=object)
+    return pd.Series(labels[scores.argmax(axis=1)], index=notes.index)
+
+def suggest(user, typ, note):
+    if not note:
+        return None
+    return predict(user, typ, [note]).iloc[0]
+
+# Resolves the AUTO choice of a category picker.
+def resolve(user, typ, category, note):
+    if category != AUTO:
+        return category
+    return suggest(user, typ, note) or FALLBACK
@@ -0,0 +1,234 @@
+# cli.py
+import sys, json, argparse
+
+
+# ---------- Settings ----------
+CHUNK_ROWS = 50_000
+TYPES = ["Income", "Expense", "Investment"]
+
+# Only the finance core is imported, and only once a command runs: no
+# Streamlit or Plotly, and `--help` does not even load pandas. The derived
+# stores are imported before any write so their ledger listeners see it.
+def _core():
+    import categorizer, cube, dedupe, goals, ledger, migrate, quota
+    migrate.ensure()
+    return ledger
+
+
+# The ledger with the stores that writes consult (quota counters, duplicate
+# index) brought up to its version, as the app does on every run.
+def _load_for_write(ledger):
+    import dedupe, quota
+    df = ledger.load_ledger()
+    quota.sync(df)
+    dedupe.sync(df)
+    return df
+
+def _fail(message):
+    print(f"error: {message}", file=sys.stderr)
+    return 1
+
+def _plan(user):
+    import quota
+    return quota.plan_of(user) or quota.DEFAULT_PLAN
+
+
+# ---------- Commands ----------
+def cmd_add(args):
+    ledger = _core()
+    import pandas as pd
+    import quota
+    record = {
+        "Type": args.type,
+        "Amount": ledger.to_minor(args.amount),
+        "Category": args.category,
+        "Date": pd.Timestamp(args.date),
+        "Note": args.note,
+        "Currency": args.currency.upper(),
+    }
+    df = _load_for_write(ledger)
+    with ledger.locked():
+        try:
+            quota.admit(args.user, _plan(args.user), 1)
+        except quota.QuotaExceeded as e:
+            return _fail(e)
+        ledger.add_records(df, [record], user=args.user)
+    return 0
+
+# Streams CSV rows (decimal amounts, ledger column names) from a file or
+# stdin in chunks. Each chunk is repaired like a migration; rows that cannot
+# be repaired are reported on stderr and skipped. The import is all or
+# nothing: once the whole input is read, every owner's rows must fit that
+# owner's quota, and they are then appended in one ledger write. Rows
+# without a User belong to --user.
+def cmd_import(args):
+    ledger = _core()
+    import pandas as pd
+    import dedupe, migrate, quota
+
+    def quarantine(source, reason, record):
+        print(json.dumps({"reason": reason, "record": record}, default=str), file=sys.stderr)
+
+    source = sys.stdin if args.file == "-" else args.file
+    chunks = [migrate._repair_rows(chunk, "import", quarantine, user=args.user)
+              for chunk in pd.read_csv(source, dtype=str, keep_default_na=False, chunksize=args.chunk_rows)]
+    rows = pd.concat(chunks, ignore_index=True) if chunks else ledger.empty_ledger()
+    rows = rows.assign(Date=pd.to_datetime(rows["Date"]))
+    skipped = 0
+    df = _load_for_write(ledger)
+    with ledger.locked():
+        if args.skip_duplicates and len(rows):
+            fresh = [kind != dedupe.EXACT for kind in dedupe.check(rows.to_dict("records"), args.user)]
+            skipped = len(rows) - sum(fresh)
+            rows = rows[fresh]
+        try:
+            for owner, n in rows["User"].value_counts().items():
+                quota.admit(owner, _plan(owner), int(n))
+        except quota.QuotaExceeded as e:
+            print(json.dumps({"added": 0, "skipped": skipped}))
+            return _fail(e)
+        if len(rows):
+            ledger.add_records(df, rows.to_dict("records"), user=args.user)
+    print(json.dumps({"added": len(rows), "skipped": skipped}))
+    return 0
+
+def _selected(ledger, args):
+    df = ledger.load_ledger()
+    if args.user:
+        df = ledger.user_rows(df, args.user)
+    if args.type:
+        df = df[df["Type"] == args.type]
+    if args.category:
+        df = df[df["Category"] == args.category]
+    if args.month:
+        df = df[df["Date"].dt.strftime("%Y-%m") == args.month]
+    return df
+
+# Writes CSV to stdout chunk by chunk, money as exact decimals.
+def cmd_export(args):
+    ledger = _core()
+    df = _selected(ledger, args)
+    out = sys.stdout
+    for start in range(0, max(len(df), 1), args.chunk_rows):
+        text = ledger.export_csv(df.iloc[start:start + args.chunk_rows])
+        out.write(text if start == 0 else text.split("\n", 1)[1])
+    return 0
+
+def cmd_list(args):
+    ledger = _core()
+    df = _selected(ledger, args)
+    if args.limit:
+        df = df.iloc[-args.limit:]
+    out = sys.stdout
+    if args.format == "csv":
+        out.write(ledger.export_csv(df))
+        return 0
+    for idx, row in zip(df.index, df.to_dict("records")):
+        for c in ledger.MONEY_COLUMNS:
+            row[c] = ledger.format_minor(row[c]) or None
+        row["Date"] = row["Date"].strftime("%Y-%m-%d")
+        row["Units"] = None if row["Units"] != row["Units"] else row["Units"]
+        out.write(json.dumps({"idx": int(idx), **row}, default=str) + "\n")
+    return 0
+
+# Rebuilds every derived store (cube, goal totals, quotas, duplicate index,
+# categorizer models) from the ledger, whatever version they are at.
+def cmd_recompute(args):
+    ledger = _core()
+    import categorizer, cube, dedupe, goals, quota
+    df = ledger.load_ledger()
+    for store in (cube, goals, quota, dedupe, categorizer):
+        store.sync(df, force=True)
+    print(json.dumps({"rows": len(df), "version": ledger.ledger_version()}))
+    return 0
+
+# Row count, rows per Type and date bounds of the whole ledger, answered from
+# its metadata sidecar without reading the rows.
+def cmd_stats(args):
+    ledger = _core()
+    print(json.dumps(ledger.stats()))
+    return 0
+
+# The Dashboard cards for one user.
+def cmd_totals(args):
+    ledger = _core()
+    import cube, fx
+    cube.sync(ledger.load_ledger())
+    view = cube.view(args.user, args.currency.upper())
+    totals = {typ: cube.totals(view, typ) for typ in TYPES}
+    balance = totals["Income"][0] - totals["Expense"][0] - totals["Investment"][0]
+    if args.json:
+        print(json.dumps({
+            "currency": args.currency.upper(),
+            **{typ: {"sum": round(s, 2), "count": n} for typ, (s, n) in totals.items()},
+            "Balance": round(balance, 2),
+        }))
+    else:
+        for typ, (s, n) in totals.items():
+            print(f"{typ:<11} {fx.format_money(s, args.currency.upper()):>18}  ({n} entries)")
+        print(f"{'Balance':<11} {fx.format_money(balance, args.currency.upper()):>18}")
+    return 0
+
+
+# ---------- Entry point ----------
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Smart Finance ledger from the command line.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def filters(p, user_required=False):
+        p.add_argument("--user", required=user_required)
+        p.add_argument("--type", choices=TYPES)
+        p.add_argument("--category")
+        p.add_argument("--month", help="YYYY-MM")
+        p.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+
+    p = sub.add_parser("add", help="add one record")
+    p.add_argument("--user", required=True)
+    p.add_argument("--type", choices=TYPES, required=True)
+    p.add_argument("--amount", type=float, required=True)
+    p.add_argument("--category", required=True)
+    p.add_argument("--date", required=True)
+    p.add_argument("--note", default="")
+    p.add_argument("--currency", default="INR")
+    p.set_defaults(run=cmd_add)
+
+    p = sub.add_parser("import", help="import CSV rows from a file or stdin")
+    p.add_argument("file", nargs="?", default="-")
+    p.add_argument("--user", required=True, help="owner of rows without a User")
+    p.add_argument("--skip-duplicates", action="store_true")
+    p.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    p.set_defaults(run=cmd_import)
+
+    p = sub.add_parser("export", help="write records as CSV to stdout")
+    filters(p)
+    p.set_defaults(run=cmd_export)
+
+    p = sub.add_parser("list", help="write records as JSON lines (or CSV) to stdout")
+    filters(p)
+    p.add_argument("--limit", type=int, default=0, help="only the last N records")
+    p.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    p.set_defaults(run=cmd_list)
+
+    p = sub.add_parser("recompute", help="rebuild all aggregates from the ledger")
+    p.set_defaults(run=cmd_recompute)
+
+    p = sub.add_parser("stats", help="row count, rows per type and date bounds of the ledger")
+    p.set_defaults(run=cmd_stats)
+
+    p = sub.add_parser("totals", help="Dashboard totals for a user")
+    p.add_argument("--user", required=True)
+    p.add_argument("--currency", default="INR")
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(run=cmd_totals)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.run(args)
+    except BrokenPipeError:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# cube.py
+import os, json, threading
+import numpy as np
+import pandas as pd
+import fx, ledger
+
+
+# ---------- Files for persistence ----------
+CUBE_FILE = os.path.join(ledger.BASE_DIR, "cube.json")
+
+# One cell per (User, Month, Type, Category) holding the Sum in base-currency
+# minor units and the row Count. Dashboards and page summaries read these cells, whose
+# number grows with months and categories, never with ledger rows.
+DIMENSIONS = ["User", "Month", "Type", "Category"]
+
+_lock = threading.Lock()
+_state = {"file_version": None, "ledger_version": None, "fx_version": None, "cells": {}}
+
+
+def _empty():
+    return {"ledger_version": None, "fx_version": None, "cells": {}}
+
+def _load():
+    version = ledger.ledger_version(CUBE_FILE)
+    if _state["file_version"] == version:
+        return _state
+    loaded = _empty()
+    if os.path.exists(CUBE_FILE):
+        try:
+            with open(CUBE_FILE, "r") as f:
+                raw = json.load(f)
+            loaded = {
+                "ledger_version": raw["ledger_version"],
+                "fx_version": raw["fx_version"],
+                "cells": {tuple(c[:4]): [c[4], c[5]] for c in raw["cells"]},
+            }
+        except:
+            loaded = _empty()
+    _state.update(loaded, file_version=version)
+    return _state
+
+def _save():
+    tmp = CUBE_FILE + f".{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({
+            "ledger_version": _state["ledger_version"],
+            "fx_version": _state["fx_version"],
+            "cells": [list(k) + v for k, v in _state["cells"].items()],
+        }, f)
+    os.replace(tmp, CUBE_FILE)
+    _state["file_version"] = ledger.ledger_version(CUBE_FILE)
+
+
+# ---------- Maintenance ----------
+def _fold(cells, rows, sign):
+    if rows.empty:
+        return
+    rows = pd.DataFrame({
+        "User": rows["User"].fillna("").values,
+        "Month": pd.to_datetime(rows["Date"], errors="coerce").dt.strftime("%Y-%m").fillna("").values,
+        "Type": rows["Type"].fillna("").values,
+        "Category": rows["Category"].fillna("").values,
+        "Sum": fx.to_base(rows).values,
+    })
+    grouped = rows.groupby(DIMENSIONS)["Sum"].agg(["sum", "count"])
+    for key, (total, count) in zip(grouped.index, grouped.values):
+        cell = cells.setdefault(key, [0, 0])
+        cell[0] += sign * int(total)
+        cell[1] += sign * int(count)
+        if cell[1] <= 0:
+            cells.pop(key)
+
+# Rebuilds only when the cube is not at the ledger's current version (first
+# run, or the file changed outside the app) or the FX table changed.
+def sync(df, force=False):
+    version = ledger.ledger_version()
+    fx_version = fx.load_rates()["version"]
+    with _lock:
+        state = _load()
+        if not force and state["ledger_version"] == version and state["fx_version"] == fx_version:
+            return
+        state["cells"] = {}
+        _fold(state["cells"], df, 1)
+        state["ledger_version"], state["fx_version"] = version, fx_version
+        _save()
+
+@ledger.on_change
+def _on_ledger_change(removed, added, old_version, new_version):
+    with _lock:
+        state = _load()
+        if state["ledger_version"] != old_version:
+            return  # already stale, the next sync() rebuilds
+        _fold(state["cells"], removed, -1)
+        _fold(state["cells"], added, 1)
+        state["ledger_version"] = new_version
+        _save()
+
+
+# ---------- Reads ----------
+# The user's cells (plus rows shared by every account) as a small frame with
+# Sum as a decimal value in `currency`, converted per month at the month-end
+# rate. Cells are added as integers before the single conversion.
+def view(user, currency=fx.BASE_CURRENCY):
+    with _lock:
+        cells = [k + tuple(v) for k, v in _load()["cells"].items() if k[0] in (user, "")]
+    out = pd.DataFrame(cells, columns=DIMENSIONS + ["Sum", "Count"]).astype({"Sum": np.int64, "Count": np.int64})
+    out = out.groupby(["Month", "Type", "Category"], as_index=False)[["Sum", "Count"]].sum()
+    out["Sum"] = out["Sum"] / ledger.MINOR_UNITS
+    if currency != fx.BASE_CURRENCY and not out.empty:
+        month_end = pd.to_datetime(out["Month"], format="%Y-%m", errors="coerce") + pd.offsets.MonthEnd(0)
+        out["Sum"] = out["Sum"] / fx.rates_at(np.repeat(currency, len(out)), month_end)
+    return out
+
+def totals(view_frame, typ):
+    cells = view_frame[view_frame["Type"] == typ]
+    return float(cells["Sum"].sum()), int(cells["Count"].sum())
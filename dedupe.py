@@ -0,0 +1,270 @@
+# dedupe.py
+import os, json, threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import ledger
+
+
+# ---------- Files for persistence ----------
+DEDUPE_FILE = os.path.join(ledger.BASE_DIR, "dedupe.json")   # snapshot of the index
+DEDUPE_LOG = os.path.join(ledger.BASE_DIR, "dedupe.log")     # changes since the snapshot
+
+# Two records are exact duplicates when their normalized (User, Type,
+# Amount, Currency, Date, Note, Category) content hashes match. They are
+# near duplicates when the same user has a record of the same Type,
+# Currency and Category within NEAR_DAYS days whose amount is within
+# NEAR_AMOUNT of it (at least MIN_AMOUNT minor units) and whose note is
+# similar: the same once punctuation is dropped, one containing the other,
+# or either one empty. That catches a bank re-import ("UBER *TRIP" against
+# "Uber trip") without flagging two different purchases of the same price.
+NEAR_DAYS = 3
+NEAR_AMOUNT = 0.01
+MIN_AMOUNT = ledger.MINOR_UNITS
+NEAR_WINDOW = 8
+EXACT, NEAR = "exact", "near"
+FORMAT = 2   # layout of the near index; an index in another layout is rebuilt
+
+_lock = threading.Lock()
+_state = {"file_version": None, "log_offset": 0, "format": FORMAT, "ledger_version": None, "exact": {}, "near": {}}
+_cache = OrderedDict()   # ledger version -> find() result
+_CACHE_SIZE = 4
+
+
+# ---------- Index files ----------
+# The index is a JSON snapshot plus an append-only log with one line per
+# ledger write: the versions it went from and to, and the index entries it
+# changed. A write appends a line the size of the rows it touched instead of
+# rewriting the snapshot; once the log outgrows the snapshot (at least
+# COMPACT_BYTES) it is folded into a new snapshot, so that cost is spread
+# over many writes. Each process keeps the index in memory and reads only
+# the log lines it has not seen. Files are written under ledger.locked(),
+# as the ledger is; a log line applies only on top of the version it starts
+# from, so lines from before a snapshot are skipped.
+COMPACT_BYTES = 1 << 20
+
+def _empty():
+    return {"format": FORMAT, "ledger_version": None, "exact": {}, "near": {}}
+
+def _load():
+    version = ledger.ledger_version(DEDUPE_FILE)
+    size = os.path.getsize(DEDUPE_LOG) if os.path.exists(DEDUPE_LOG) else 0
+    if _state["file_version"] != version or size < _state["log_offset"]:
+        loaded = _empty()
+        if os.path.exists(DEDUPE_FILE):
+            try:
+                with open(DEDUPE_FILE, "r") as f:
+                    loaded = json.load(f)
+            except:
+                loaded = _empty()
+            if loaded.get("format") != FORMAT:
+                loaded = _empty()
+        _state.update(loaded, file_version=version, log_offset=0)
+    if size > _state["log_offset"]:
+        with open(DEDUPE_LOG, "rb") as f:
+            f.seek(_state["log_offset"])
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break   # a line still being written
+                _state["log_offset"] += len(line)
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("old") == _state["ledger_version"]:
+                    _apply(_state, entry["changes"])
+                    _state["ledger_version"] = entry["new"]
+    return _state
+
+def _save():
+    tmp = DEDUPE_FILE + f".{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({k: _state[k] for k in ("format", "ledger_version", "exact", "near")}, f)
+    os.replace(tmp, DEDUPE_FILE)
+    open(DEDUPE_LOG, "w").close()
+    _state.update(file_version=ledger.ledger_version(DEDUPE_FILE), log_offset=0)
+
+def _append(old_version, new_version, changes):
+    line = json.dumps({"old": old_version, "new": new_version, "changes": changes}) + "\n"
+    with open(DEDUPE_LOG, "a") as f:
+        f.write(line)
+    _state["log_offset"] += len(line.encode())
+    if _state["log_offset"] > max(COMPACT_BYTES, os.path.getsize(DEDUPE_FILE) if os.path.exists(DEDUPE_FILE) else 0):
+        _save()
+
+
+# ---------- Keys ----------
+def _text(col):
+    return col.fillna("").astype(str).str.strip().str.lower().str.replace(r"\s+", " ", regex=True)
+
+# Normalized view of `rows`: trimmed lower-case text, integer minor-unit
+# amounts and dates to the day, so formatting noise does not hide a
+# duplicate.
+def normalize(rows, user=None):
+    users = rows["User"] if "User" in rows else pd.Series(None, index=rows.index, dtype=object)
+    if user is not None:
+        users = users.fillna(user).replace("", user)
+    currency = rows["Currency"] if "Currency" in rows else pd.Series(None, index=rows.index, dtype=object)
+    dates = pd.to_datetime(rows["Date"], errors="coerce")
+    return pd.DataFrame({
+        "User": users.fillna("").astype(str).values,
+        "Type": _text(rows["Type"]).values,
+        "Amount": pd.to_numeric(rows["Amount"], errors="coerce").fillna(0).astype("int64").values,
+        "Currency": currency.fillna(ledger.DEFAULT_CURRENCY).astype(str).str.upper().values,
+        "Day": (dates.values.astype("datetime64[D]").astype("int64")),
+        "Note": _text(rows["Note"]).values,
+        "Category": _text(rows["Category"]).values,
+    }, index=rows.index)
+
+def content_hashes(norm):
+    return pd.util.hash_pandas_object(norm, index=False).map("{:016x}".format)
+
+# Notes as compared by the near rule: normalized text without punctuation.
+def _loose(notes):
+    return notes.str.replace(r"[^0-9a-z]+", " ", regex=True).str.strip()
+
+def _similar(a, b):
+    return a == b or not a or not b or a in b or b in a
+
+def _bucket(user, typ, currency, category, day):
+    return f"{user}|{typ}|{currency}|{category}|{day}"
+
+
+# ---------- Hash index ----------
+# The index entries `rows` add (sign 1) or remove (sign -1): ["exact", hash,
+# n] per content hash and ["near", bucket, amount|note, n] per near key.
+def _changes(rows, sign):
+    if rows.empty:
+        return []
+    norm = normalize(rows)
+    out = [["exact", h, sign * int(n)] for h, n in content_hashes(norm).value_counts().items()]
+    norm["Note"] = _loose(norm["Note"])
+    grouped = norm.groupby(["User", "Type", "Currency", "Category", "Day", "Amount", "Note"]).size()
+    for (user, typ, currency, category, day, amount, note), n in grouped.items():
+        out.append(["near", _bucket(user, typ, currency, category, day), f"{amount}|{note}", sign * int(n)])
+    return out
+
+def _apply(state, changes):
+    for change in changes:
+        if change[0] == "exact":
+            _, h, n = change
+            state["exact"][h] = state["exact"].get(h, 0) + n
+            if state["exact"][h] <= 0:
+                state["exact"].pop(h)
+            continue
+        _, key, entry, n = change
+        entries = state["near"].setdefault(key, {})
+        entries[entry] = entries.get(entry, 0) + n
+        if entries[entry] <= 0:
+            entries.pop(entry)
+        if not entries:
+            state["near"].pop(key)
+
+# Rebuilds only when the index is not at the ledger's current version.
+def sync(df, force=False):
+    version = ledger.ledger_version()
+    with _lock:
+        state = _load()
+        if not force and state["ledger_version"] == version:
+            return
+    with ledger.locked(), _lock:
+        state = _load()
+        if not force and state["ledger_version"] == version:
+            return
+        state["exact"], state["near"] = {}, {}
+        _apply(state, _changes(df, 1))
+        state["ledger_version"] = version
+        _save()
+
+@ledger.on_change
+def _on_ledger_change(removed, added, old_version, new_version):
+    with _lock:
+        state = _load()
+        if state["ledger_version"] != old_version:
+            return  # already stale, the next sync() rebuilds
+        changes = _changes(removed, -1) + _changes(added, 1)
+        _apply(state, changes)
+        state["ledger_version"] = new_version
+        _append(old_version, new_version, changes)
+
+
+# ---------- Checks ----------
+# Classifies records about to be added for `user` against the index: one
+# hash lookup for an exact match, then a fixed number of day buckets for a
+# near match. Returns EXACT, NEAR or None per record.
+def check(records, user=""):
+    rows = pd.DataFrame(records, columns=ledger.LEDGER_COLUMNS)
+    if rows.empty:
+        return []
+    norm = normalize(rows, user)
+    hashes = content_hashes(norm)
+    norm["Note"] = _loose(norm["Note"])
+    with _lock:
+        state = _load()
+        out = []
+        for h, r in zip(hashes, norm.itertuples()):
+            if h in state["exact"]:
+                out.append(EXACT)
+                continue
+            tolerance = max(abs(r.Amount) * NEAR_AMOUNT, MIN_AMOUNT)
+            near = any(
+                abs(int(amount) - r.Amount) <= tolerance and _similar(note, r.Note)
+                for day in range(r.Day - NEAR_DAYS, r.Day + NEAR_DAYS + 1)
+                for amount, note in (e.split("|", 1) for e in state["near"].get(
+                    _bucket(r.User, r.Type, r.Currency, r.Category, day), {}))
+            )
+            out.append(NEAR if near else None)
+    return out
+
+# Finds every duplicate already in `df` in one vectorized pass. Each later
+# copy is reported against the earliest row it matches: exact copies by
+# content hash; near copies by sorting the rows by user, Type, Currency,
+# Category, amount and day, and comparing each row with the NEAR_WINDOW rows
+# on either side of it. A near copy has an amount within a percent of its
+# original, so the two sit next to each other in that order unless a run of
+# rows with almost the same amount lies between them. The cost is linear in
+# the ledger instead of quadratic in each user's busiest days. Returns a
+# frame indexed like the duplicate rows with Kind (EXACT / NEAR) and Of
+# (original index).
+def find(df):
+    out = pd.DataFrame(columns=["Kind", "Of"])
+    if df.empty:
+        return out
+    norm = normalize(df)
+    norm["Row"] = np.arange(len(norm))
+    hashes = content_hashes(norm.drop(columns="Row"))
+    first = norm["Row"].groupby(hashes.values).transform("min")
+    exact = pd.DataFrame({"Kind": EXACT, "Of": df.index[first.values]}, index=df.index)
+    exact = exact[first.values != norm["Row"].values]
+
+    keys = ["User", "Type", "Currency", "Category"]
+    order = norm.sort_values(keys + ["Amount", "Day"], kind="stable")
+    group = order.groupby(keys, sort=False).ngroup().to_numpy()
+    amount, day, row = (order[c].to_numpy() for c in ["Amount", "Day", "Row"])
+    notes = _loose(order["Note"]).to_numpy()
+    tolerance = np.maximum(np.abs(amount) * NEAR_AMOUNT, MIN_AMOUNT)
+    best = np.full(len(order), len(order))   # earliest matching Row per Row
+    for k in range(1, min(NEAR_WINDOW, len(order) - 1) + 1):
+        a, b = np.arange(len(order) - k), np.arange(k, len(order))
+        later = np.where(row[a] > row[b], a, b)
+        hit = (group[a] == group[b]) & (np.abs(day[a] - day[b]) <= NEAR_DAYS) \
+            & (np.abs(amount[a] - amount[b]) <= tolerance[later])
+        a, b = a[hit], b[hit]
+        similar = np.fromiter((_similar(x, y) for x, y in zip(notes[a], notes[b])), bool, len(a))
+        a, b = a[similar], b[similar]
+        np.minimum.at(best, np.maximum(row[a], row[b]), np.minimum(row[a], row[b]))
+    dup = np.flatnonzero(best < len(order))
+    near = pd.DataFrame({"Kind": NEAR, "Of": df.index[best[dup]]}, index=df.index[dup])
+    near = near[~near.index.isin(exact.index)]
+    return pd.concat([exact, near]).sort_index()
+
+# Batch results are computed once per ledger version.
+def detect(df, version):
+    if version in _cache:
+        _cache.move_to_end(version)
+        return _cache[version]
+    result = find(df)
+    _cache[version] = result
+    while len(_cache) > _CACHE_SIZE:
+        _cache.popitem(last=False)
+    return result
@@ -0,0 +1,90 @@
+# forecast.py
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+
+# ---------- Model settings ----------
+# Damped Holt (level + trend) smoothing, blended with a seasonal-naive
+# forecast once a series has two full years of history.
+ALPHA, BETA, PHI = 0.5, 0.2, 0.9
+SEASON = 12
+FLOW_TYPES = ["Income", "Expense"]
+
+_series = OrderedDict()  # (user, currency, horizon, last month) -> {series key: (history hash, forecast)}
+_results = OrderedDict() # (ledger version, user, currency, horizon, last month) -> result frame
+_CACHE_SIZE = 32
+
+
+# ---------- Model ----------
+# Fits every series (one row of `matrix`) in one pass: the loop runs over
+# months, and each step updates all series at once.
+def _fit(matrix, horizon):
+    n, months = matrix.shape
+    level, trend = matrix[:, 0].astype(float), np.zeros(n)
+    for t in range(1, months):
+        prev = level
+        level = ALPHA * matrix[:, t] + (1 - ALPHA) * (level + PHI * trend)
+        trend = BETA * (level - prev) + (1 - BETA) * PHI * trend
+    damped = np.cumsum(PHI ** np.arange(1, horizon + 1))
+    out = level[:, None] + trend[:, None] * damped[None, :]
+    if months >= 2 * SEASON:
+        season = np.arange(horizon) % SEASON
+        out = (out + matrix[:, months - SEASON + season]) / 2
+    return out.clip(min=0)
+
+
+# ---------- Forecasts ----------
+# Projects the next `horizon` months for every (Type, Category) series of
+# the user's cube view (see cube.view), starting with the current month and
+# fitted on complete months only. The result for a ledger version is reused
+# as is; after a mutation only series whose history hash changed are
+# refitted, all in one batch.
+def project(view, user, currency, horizon, version, today=None):
+    current = pd.Period(today or pd.Timestamp.today(), freq="M")
+    last = current - 1
+    key = (version, user, currency, horizon, str(last))
+    if key in _results:
+        _results.move_to_end(key)
+        return _results[key]
+
+    hist = view[view["Type"].isin(FLOW_TYPES) & (view["Month"] != "")]
+    future = [str(current + h) for h in range(horizon)]
+    if hist.empty:
+        return pd.DataFrame(columns=["Type", "Category", "Month", "Forecast"])
+
+    first = pd.Period(hist["Month"].min(), freq="M")
+    months = [str(p) for p in pd.period_range(min(first, last), last, freq="M")]
+    matrix = hist.pivot_table(index=["Type", "Category"], columns="Month", values="Sum", aggfunc="sum")
+    matrix = matrix.reindex(columns=months).fillna(0.0)
+
+    hashes = pd.util.hash_pandas_object(matrix, index=True)
+    series_key = (user, currency, horizon, str(last))
+    cached = _series.setdefault(series_key, {})
+    _series.move_to_end(series_key)
+    while len(_series) > _CACHE_SIZE:
+        _series.popitem(last=False)
+    stale = [k for k, h in hashes.items() if k not in cached or cached[k][0] != h]
+    if stale:
+        fitted = _fit(matrix.loc[stale].values, horizon)
+        for k, row in zip(stale, fitted):
+            cached[k] = (hashes[k], row)
+    for k in list(cached):
+        if k not in hashes.index:
+            cached.pop(k)
+
+    values = np.vstack([cached[k][1] for k in matrix.index])
+    result = pd.DataFrame(values, index=matrix.index, columns=future).stack().reset_index()
+    result.columns = ["Type", "Category", "Month", "Forecast"]
+
+    _results[key] = result
+    while len(_results) > _CACHE_SIZE:
+        _results.popitem(last=False)
+    return result
+
+# Per-month Income, Expense and Net flow, for history and forecast alike.
+def flows(frame, value):
+    by_type = frame.pivot_table(index="Month", columns="Type", values=value, aggfunc="sum")
+    by_type = by_type.reindex(columns=FLOW_TYPES).fillna(0.0)
+    by_type["Net"] = by_type["Income"] - by_type["Expense"]
+    return by_type
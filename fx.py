@@ -0,0 +1,130 @@
+# fx.py
+import os
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import ledger
+
+
+# ---------- Files for persistence ----------
+# fx_rates.csv holds dated rates as Date, Currency, Rate where Rate is the
+# number of base-currency units (INR) one unit of Currency buys on that date.
+FX_FILE = os.path.join(ledger.BASE_DIR, "fx_rates.csv")
+BASE_CURRENCY = ledger.DEFAULT_CURRENCY
+
+SYMBOLS = {"INR": "₹", "USD": "$", "EUR": "€", "GBP": "£", "JPY": "¥", "AUD": "A$", "CAD": "C$", "SGD": "S$"}
+
+_table = {"version": None, "currencies": [], "code": None, "day": None, "rate": None}
+_converted = OrderedDict()   # (ledger version, currency, fx version) -> converted frame
+_CACHE_SIZE = 8
+
+
+# ---------- Rate table ----------
+def load_rates():
+    version = ledger.ledger_version(FX_FILE)
+    if _table["version"] == version:
+        return _table
+    try:
+        df = pd.read_csv(FX_FILE)
+        df.columns = [str(c).strip().lower() for c in df.columns]
+        df = pd.DataFrame({
+            "currency": df["currency"].astype(str).str.strip().str.upper(),
+            "day": pd.to_datetime(df["date"], errors="coerce"),
+            "rate": pd.to_numeric(df["rate"], errors="coerce"),
+        }).dropna()
+        df = df[(df["rate"] > 0) & (df["currency"] != BASE_CURRENCY)]
+    except Exception:
+        df = pd.DataFrame({"currency": [], "day": pd.to_datetime([]), "rate": []})
+
+    codes, currencies = pd.factorize(df["currency"], sort=True)
+    days = df["day"].values.astype("datetime64[D]").astype(np.int64)
+    order = np.lexsort((days, codes))
+    _table.update(
+        version=version,
+        currencies=list(currencies),
+        code=codes[order].astype(np.int64),
+        day=days[order],
+        rate=df["rate"].values[order].astype(np.float64),
+    )
+    _converted.clear()
+    return _table
+
+def currencies():
+    return [BASE_CURRENCY] + load_rates()["currencies"]
+
+
+# ---------- Conversion ----------
+# One as-of join for any number of (currency, date) pairs: the table is
+# sorted by (currency code, day), so a packed int64 key and a single
+# searchsorted find the last rate on or before each date. Dates before a
+# currency's first rate use that first rate; the base currency and
+# currencies missing from the table convert at 1.
+def rates_at(currency, dates):
+    table = load_rates()
+    currency = pd.Series(currency).astype(str).str.upper().values
+    rates = np.ones(len(currency))
+    if not table["currencies"] or not len(currency):
+        return rates
+    lookup = pd.Series(np.arange(len(table["currencies"])), index=table["currencies"])
+    code = pd.Series(currency).map(lookup).fillna(-1).astype(np.int64).values
+    days = pd.to_datetime(pd.Series(dates)).fillna(pd.Timestamp.today()).values.astype("datetime64[D]").astype(np.int64)
+
+    packed = (table["code"] << 32) | table["day"]
+    known = code >= 0
+    pos = np.searchsorted(packed, (code << 32) | days, side="right") - 1
+    before_first = np.zeros(len(code), dtype=bool)
+    before_first[known] = (pos[known] < 0) | (table["code"][np.maximum(pos[known], 0)] != code[known])
+    # No rate on or before the date: take the currency's first rate instead.
+    first = np.searchsorted(table["code"], code, side="left")
+    pos = np.where(before_first, first, pos)
+    rates[known] = table["rate"][pos[known]]
+    return rates
+
+# Ledger Amount (minor units of each row's Currency) as int64 minor units of
+# the base currency. Base-currency rows pass through unchanged, so their sums
+# stay exact.
+def to_base(df):
+    amount = pd.to_numeric(df["Amount"], errors="coerce").fillna(0).astype(np.int64)
+    rates = rates_at(df["Currency"].fillna(BASE_CURRENCY), df["Date"])
+    if (rates == 1).all():
+        return amount
+    return pd.Series(np.rint(amount.values * rates).astype(np.int64), index=df.index)
+
+# Per-row factor taking minor units of each row's Currency to decimal units
+# of `currency`.
+def _display_factor(df, currency):
+    if df.empty:
+        return np.ones(0) / ledger.MINOR_UNITS
+    rates = rates_at(df["Currency"].fillna(BASE_CURRENCY), df["Date"])
+    return rates / rates_at(np.repeat(currency, len(df)), df["Date"]) / ledger.MINOR_UNITS
+
+def convert_amounts(df, currency):
+    return pd.to_numeric(df["Amount"], errors="coerce") * _display_factor(df, currency)
+
+# Display boundary: returns the ledger with Amount and SinglePrice as decimal
+# values in `currency`, computed once per ledger version and display
+# currency; switching back and forth between currencies reuses the cached
+# frames instead of converting again.
+def convert_ledger(df, version, currency):
+    key = (version, currency, load_rates()["version"])
+    if key in _converted:
+        _converted.move_to_end(key)
+        return _converted[key]
+    # Only the money columns are new; the rest share the ledger's memory.
+    factor = _display_factor(df, currency)
+    out = df.assign(**{c: pd.to_numeric(df[c], errors="coerce").astype(float) * factor for c in ledger.MONEY_COLUMNS})
+    _converted[key] = out
+    while len(_converted) > _CACHE_SIZE:
+        _converted.popitem(last=False)
+    return out
+
+def from_base(value, currency, on=None):
+    return value / rates_at([currency], [on or pd.Timestamp.today()])[0]
+
+
+# ---------- Display ----------
+def symbol(currency):
+    return SYMBOLS.get(currency, f"{currency} ")
+
+def format_money(value, currency):
+    return f"{symbol(currency)}{value:,.2f}"
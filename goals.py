@@ -0,0 +1,134 @@
+# goals.py
+import os, json, uuid, threading
+from datetime import date
+import pandas as pd
+import fx, ledger
+
+
+# ---------- Files for persistence ----------
+GOALS_FILE = os.path.join(ledger.BASE_DIR, "goals.json")
+
+GOAL_KINDS = {
+    "savings": "Savings target",
+    "cap": "Category spending cap",
+    "investment": "Investment target",
+}
+
+# The store keeps goal definitions next to running totals per user, all in
+# the base currency: totals as integer minor units, targets as decimal
+# values:
+#   T|<Type>                          all-time total per Type
+#   C|<Type>|<Category>               all-time total per Type and Category
+#   M|<Type>|<Category>|<YYYY-MM>     monthly total per Type and Category
+# Every goal reads one or two of these keys, so its progress costs O(1).
+_lock = threading.Lock()
+
+
+def _empty_store():
+    return {"ledger_version": None, "goals": {}, "totals": {}}
+
+def load_store():
+    if os.path.exists(GOALS_FILE):
+        try:
+            with open(GOALS_FILE, "r") as f:
+                return json.load(f)
+        except:
+            return _empty_store()
+    return _empty_store()
+
+def save_store(store):
+    tmp = GOALS_FILE + f".{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(store, f)
+    os.replace(tmp, GOALS_FILE)
+
+
+# ---------- Running totals ----------
+def _fold(totals, rows, sign):
+    if rows.empty:
+        return
+    rows = pd.DataFrame({
+        "User": rows["User"].fillna(""),
+        "Type": rows["Type"].fillna(""),
+        "Category": rows["Category"].fillna(""),
+        "Month": pd.to_datetime(rows["Date"], errors="coerce").dt.strftime("%Y-%m").fillna(""),
+        "Amount": fx.to_base(rows).values,
+    })
+    grouped = rows.groupby(["User", "Type", "Category", "Month"])["Amount"].sum()
+    for (user, typ, cat, month), amount in grouped.items():
+        bucket = totals.setdefault(user, {})
+        for key in (f"T|{typ}", f"C|{typ}|{cat}", f"M|{typ}|{cat}|{month}"):
+            value = bucket.get(key, 0) + sign * int(amount)
+            if value == 0:
+                bucket.pop(key, None)
+            else:
+                bucket[key] = value
+        if not bucket:
+            totals.pop(user)
+
+# Full rebuild, only needed when the ledger changed outside the app (or on
+# first use); in-app mutations are folded in by _on_ledger_change.
+def sync(df, force=False):
+    version = ledger.ledger_version()
+    with _lock:
+        store = load_store()
+        if not force and store.get("ledger_version") == version:
+            return store
+        store["totals"] = {}
+        _fold(store["totals"], df, 1)
+        store["ledger_version"] = version
+        save_store(store)
+        return store
+
+@ledger.on_change
+def _on_ledger_change(removed, added, old_version, new_version):
+    with _lock:
+        store = load_store()
+        if store.get("ledger_version") != old_version:
+            return  # already stale, the next sync() rebuilds
+        _fold(store["totals"], removed, -1)
+        _fold(store["totals"], added, 1)
+        store["ledger_version"] = new_version
+        save_store(store)
+
+
+# ---------- Goals ----------
+def add_goal(email, kind, name, target, category=None):
+    goal = {
+        "id": uuid.uuid4().hex,
+        "kind": kind,
+        "name": name,
+        "target": float(target),
+        "category": category,
+        "created": date.today().strftime("%Y-%m-%d"),
+    }
+    with _lock:
+        store = load_store()
+        store["goals"].setdefault(email, []).append(goal)
+        save_store(store)
+    return goal
+
+def delete_goal(email, goal_id):
+    with _lock:
+        store = load_store()
+        store["goals"][email] = [g for g in store["goals"].get(email, []) if g["id"] != goal_id]
+        save_store(store)
+
+# Rows without a User (written before accounts were tracked) count for everyone.
+def progress(store, email, goal, today=None):
+    mine = store["totals"].get(email, {})
+    shared = store["totals"].get("", {}) if email else {}
+    total = lambda key: (mine.get(key, 0) + shared.get(key, 0)) / ledger.MINOR_UNITS
+
+    cat = goal.get("category")
+    if goal["kind"] == "savings":
+        return total("T|Income") - total("T|Expense")
+    if goal["kind"] == "investment":
+        return total("T|Investment") if cat in (None, "", "All") else total(f"C|Investment|{cat}")
+    if goal["kind"] == "cap":
+        month = (today or date.today()).strftime("%Y-%m")
+        return total(f"M|Expense|{cat}|{month}")
+    return 0.0
+
+def user_goals(store, email, today=None):
+    return [(g, progress(store, email, g, today)) for g in store["goals"].get(email, [])]
@@ -0,0 +1,446 @@
+# ledger.py
+import os, json, zlib, tempfile, threading
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from pandas.errors import EmptyDataError
+try:
+    import fcntl
+except ImportError:   # Windows: only writers in this process are serialized
+    fcntl = None
+
+
+# ---------- Files for persistence ----------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_FILE = os.path.join(BASE_DIR, "expenses.csv")
+META_SUFFIX = ".meta.json"   # expenses.csv -> expenses.meta.json
+
+LEDGER_COLUMNS = ["Type", "Amount", "Category", "Date", "Note", "Units", "SinglePrice", "PaidVia", "ExtraNote", "User", "Currency"]
+NUMERIC_COLUMNS = ["Amount", "Units", "SinglePrice"]
+TEXT_COLUMNS = ["Type", "Category", "Note", "PaidVia", "ExtraNote", "User", "Currency"]
+DEFAULT_CURRENCY = "INR"
+
+# Money is held as int64 minor units (paise, cents) of the row's Currency,
+# so sums are exact integer adds; Units stays fractional. Conversion to
+# decimal values happens only for display and export.
+MINOR_UNITS = 100
+MONEY_COLUMNS = ["Amount", "SinglePrice"]
+
+# The file is kept in this exact layout by migrate.py, so a load is a plain
+# typed read: text cells read as "" rather than NaN, numbers and dates parse
+# directly. SCHEMA_VERSION numbers the layout; migrate.py lists the versions.
+SCHEMA_VERSION = 2
+DTYPES = {**{c: object for c in TEXT_COLUMNS}, "Amount": "int64", "SinglePrice": "Int64", "Units": float}
+NA_VALUES = {c: [""] for c in NUMERIC_COLUMNS + ["Date"]}
+
+
+# ---------- Money ----------
+# Amounts are rounded to the cent half up on their decimal text, so "1.005"
+# is 1.01 as written rather than 1.00 from the float just below it. Arrays
+# are rounded the same way, value by value; what is not a number is NA.
+CENT = Decimal(1) / MINOR_UNITS
+
+def _round_minor(value):
+    try:
+        cents = Decimal(str(value).strip()).quantize(CENT, ROUND_HALF_UP)
+    except InvalidOperation:
+        raise ValueError(f"not an amount: {value!r}")
+    if not cents.is_finite():
+        raise ValueError(f"not an amount: {value!r}")
+    return int(cents * MINOR_UNITS)
+
+def _minor_or_na(value):
+    if value is None or pd.isna(value):
+        return pd.NA
+    try:
+        return _round_minor(value)
+    except ValueError:
+        return pd.NA
+
+def to_minor(value):
+    if np.ndim(value):
+        return pd.Series([_minor_or_na(v) for v in pd.Series(value).tolist()], dtype="Int64")
+    return _round_minor(value)
+
+def to_major(value):
+    if np.ndim(value):
+        return pd.to_numeric(pd.Series(value), errors="coerce").astype(float) / MINOR_UNITS
+    return float(value) / MINOR_UNITS
+
+# Exact decimal text for minor units, built from the integers themselves.
+# Arrays come back as a list of strings, one per value.
+def format_minor(value):
+    if np.ndim(value):
+        return [format_minor(v) for v in pd.Series(value).astype("Int64").tolist()]
+    if value is None or pd.isna(value):
+        return ""
+    sign = "-" if value < 0 else ""
+    whole, cents = divmod(abs(int(value)), MINOR_UNITS)
+    return f"{sign}{whole}.{cents:02d}"
+
+
+# ---------- Change listeners ----------
+# Derived state (goal progress, aggregates, ...) registers a listener here and
+# is handed only the rows a mutation removed and added, plus the ledger
+# version before and after the write, so it never has to rescan the whole
+# ledger. A listener whose state is not at the old version should treat
+# itself as stale instead of applying the delta.
+_listeners = []
+
+def on_change(fn):
+    _listeners.append(fn)
+    return fn
+
+def _notify(removed, added, old_version, new_version):
+    for fn in _listeners:
+        fn(removed, added, old_version, new_version)
+
+
+# ---------- Load / Save ----------
+def empty_ledger():
+    df = pd.DataFrame(columns=LEDGER_COLUMNS).astype(DTYPES)
+    df["Date"] = pd.to_datetime(df["Date"])
+    return df
+
+def ledger_version(path=DATA_FILE):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return "missing"
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+def load_ledger(path=DATA_FILE):
+    if not os.path.exists(path):
+        return empty_ledger()
+    try:
+        return pd.read_csv(path, dtype=DTYPES, keep_default_na=False, na_values=NA_VALUES, parse_dates=["Date"])
+    except EmptyDataError:
+        return empty_ledger()
+
+# Writes `data` to a temp file of its own next to `path`, then moves it into
+# place, so concurrent writers never share a temp name.
+def _replace(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+# The file and its sidecar are written under the write lock, so a reader
+# never pairs one save's data with another save's sidecar for long.
+def save_ledger(df, path=DATA_FILE):
+    data = df.to_csv(index=False).encode()
+    with locked():
+        _replace(path, data)
+        write_meta(path, describe(df), data)
+        version = ledger_version(path)
+        if path == DATA_FILE:
+            _publish(df, version)
+    return version
+
+# The ledger as CSV text with money in decimal units of each row's Currency.
+def export_csv(df):
+    out = df[LEDGER_COLUMNS].copy()
+    for c in MONEY_COLUMNS:
+        out[c] = format_minor(out[c])
+    return out.to_csv(index=False)
+
+# Rows written before accounts were tracked carry no User and stay visible to
+# every account.
+def user_rows(df, email):
+    return df[(df["User"] == email) | (df["User"] == "")]
+
+
+# ---------- Metadata ----------
+# Next to each ledger file is a small sidecar with its schema, row count,
+# rows per Type, date bounds, size and checksum, written with every save.
+# While the file's version matches the sidecar, the file is known to be in
+# the exact layout without reading it, and its stats come from the sidecar.
+# A file whose version changed is checksummed (read, not parsed); only if
+# that fails too does it need migrate.py's repair pass.
+def meta_path(path=DATA_FILE):
+    return os.path.splitext(path)[0] + META_SUFFIX
+
+def read_meta(path=DATA_FILE):
+    try:
+        with open(meta_path(path), "r") as f:
+            return json.load(f)
+    except:
+        return None
+
+def _checksum(data=None, path=None):
+    if data is not None:
+        return f"{zlib.crc32(data):08x}"
+    crc = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            crc = zlib.crc32(block, crc)
+    return f"{crc:08x}"
+
+# Row count, rows per Type and date bounds of a frame; pass the result back
+# in as `stats` to add another chunk of the same file.
+def describe(df, stats=None):
+    stats = stats or {"rows": 0, "types": {}, "date_min": None, "date_max": None}
+    if df.empty:
+        return stats
+    stats["rows"] += len(df)
+    for typ, n in df["Type"].value_counts().items():
+        stats["types"][typ] = stats["types"].get(typ, 0) + int(n)
+    dates = pd.to_datetime(df["Date"], errors="coerce").dropna()
+    if len(dates):
+        low, high = dates.min().strftime("%Y-%m-%d"), dates.max().strftime("%Y-%m-%d")
+        stats["date_min"] = min(stats["date_min"] or low, low)
+        stats["date_max"] = max(stats["date_max"] or high, high)
+    return stats
+
+# Records `stats` for the file as it is on disk now. `data` is the file's
+# content when the caller has it; otherwise the file is read for the checksum.
+def write_meta(path, stats, data=None):
+    with locked():
+        meta = {
+            "schema": SCHEMA_VERSION,
+            "columns": LEDGER_COLUMNS,
+            **stats,
+            "bytes": len(data) if data is not None else os.path.getsize(path),
+            "checksum": _checksum(data, path),
+            "version": ledger_version(path),
+        }
+        _replace(meta_path(path), json.dumps(meta).encode())
+    return meta
+
+# True when the sidecar vouches for the file: a stat and a small read while
+# the file is unchanged since the last save, one checksum pass if it was
+# touched or copied, False if its content is not what was saved.
+def verified(path=DATA_FILE):
+    meta = read_meta(path)
+    if not meta or meta.get("schema") != SCHEMA_VERSION or meta.get("columns") != LEDGER_COLUMNS:
+        return False
+    version = ledger_version(path)
+    if meta.get("version") == version:
+        return True
+    if version == "missing" or meta.get("bytes") != os.path.getsize(path) or meta.get("checksum") != _checksum(path=path):
+        return False
+    write_meta(path, {k: meta[k] for k in ("rows", "types", "date_min", "date_max")})
+    return True
+
+# Row count, rows per Type and date bounds: from the sidecar alone when it
+# vouches for the file, from a full read otherwise.
+def stats(path=DATA_FILE):
+    if verified(path):
+        meta = read_meta(path)
+        return {k: meta[k] for k in ("rows", "types", "date_min", "date_max")}
+    return describe(load_ledger(path))
+
+
+# ---------- Shared read cache ----------
+# Every session in the process reads the ledger through one cache keyed by
+# file version, so a version is parsed once however many sessions or tabs
+# show it, and views derived from it (a user's rows in a display currency)
+# are built once per version too. Cached frames are shared: nothing may
+# modify them in place, and the mutations below start from a shallow copy
+# that pandas copies on write. A write publishes the frame it saved as the
+# new version and drops every older entry, so other sessions see the change
+# on their next run without parsing the file. Entries are evicted least
+# recently used first once they hold more than CACHE_BYTES.
+CACHE_BYTES = 256 * 1024 * 1024
+
+_cache_lock = threading.RLock()
+_shared = OrderedDict()   # (version, view...) -> (frame, bytes)
+_shared_bytes = 0
+
+def _cache_get(key):
+    with _cache_lock:
+        if key in _shared:
+            _shared.move_to_end(key)
+            return _shared[key][0]
+    return None
+
+# A frame's size, from its strings measured on about SAMPLE_ROWS evenly
+# spaced rows: measuring every string costs as much as a parse at 200k rows.
+SAMPLE_ROWS = 1000
+
+def _frame_bytes(df):
+    sample = df.iloc[::max(1, len(df) // SAMPLE_ROWS)]
+    per_row = sample.memory_usage(index=False, deep=True).sum() / max(len(sample), 1)
+    return int(per_row * len(df)) + df.index.memory_usage()
+
+def _cache_put(key, df):
+    global _shared_bytes
+    size = _frame_bytes(df)
+    with _cache_lock:
+        if key in _shared:
+            _shared_bytes -= _shared.pop(key)[1]
+        _shared[key] = (df, size)
+        _shared_bytes += size
+        while _shared_bytes > CACHE_BYTES and len(_shared) > 1:
+            _shared_bytes -= _shared.popitem(last=False)[1][1]
+
+def _publish(df, version):
+    global _shared_bytes
+    with _cache_lock:
+        for key in [k for k in _shared if k[0] != version]:
+            _shared_bytes -= _shared.pop(key)[1]
+        _cache_put((version,), df if df.index.equals(pd.RangeIndex(len(df))) else df.reset_index(drop=True))
+
+# The current ledger and its version, parsed at most once per version.
+def shared_ledger():
+    with _cache_lock:
+        version = ledger_version()
+        df = _cache_get((version,))
+        if df is None:
+            df = load_ledger()
+            if ledger_version() == version:
+                _cache_put((version,), df)
+        return df, version
+
+# A frame derived from one ledger version, built by `build` on first use.
+def shared_view(version, key, build):
+    df = _cache_get((version,) + tuple(key))
+    if df is None:
+        df = build()
+        _cache_put((version,) + tuple(key), df)
+    return df
+
+def cache_info():
+    with _cache_lock:
+        return {"entries": len(_shared), "bytes": _shared_bytes, "budget": CACHE_BYTES}
+
+
+# ---------- Write lock ----------
+# A write holds one lock for its whole read-modify-write: a re-entrant lock
+# for the session and request threads of this process, plus an advisory
+# lock on LOCK_FILE for the CLI and other server processes. Inside it the
+# change is applied to the ledger as it is on disk now, never to the frame
+# the caller loaded earlier, so rows written by others in between survive.
+# Checks that must still hold when the write lands (quotas) run inside the
+# same lock.
+LOCK_FILE = os.path.join(BASE_DIR, "expenses.lock")
+
+_write_lock = threading.RLock()
+_held = threading.local()
+
+class Conflict(Exception):
+    pass
+
+@contextmanager
+def locked():
+    with _write_lock:
+        depth = getattr(_held, "depth", 0)
+        handle = None
+        if depth == 0 and fcntl is not None:
+            handle = open(LOCK_FILE, "a")
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        _held.depth = depth + 1
+        try:
+            yield
+        finally:
+            _held.depth = depth
+            if handle is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+                handle.close()
+
+def _same(a, b):
+    return all((pd.isna(a[c]) and pd.isna(b[c])) or a[c] == b[c] for c in LEDGER_COLUMNS)
+
+# The label in `df` of a row with the same content as `row`, trying `idx`
+# first; None when `df` holds no such row any more.
+def find_row(df, row, idx=None):
+    if idx is not None and idx in df.index and _same(df.loc[idx], row):
+        return idx
+    hits = pd.Series(True, index=df.index)
+    for c in LEDGER_COLUMNS:
+        value = row[c]
+        hits &= df[c].isna() if pd.isna(value) else (df[c] == value).fillna(False).astype(bool)
+    return hits.index[hits][0] if hits.any() else None
+
+# A key per row that stays the same when other rows are added, changed or
+# deleted: the row's content hash, numbered among identical rows. Widgets
+# acting on one row are keyed by it, so a click still means that row after
+# the ledger moved on under the session.
+def row_keys(df):
+    hashes = pd.util.hash_pandas_object(df[LEDGER_COLUMNS], index=False)
+    ordinal = hashes.groupby(hashes.values).cumcount()
+    return pd.DataFrame({"Key": hashes.map("{:016x}".format) + "-" + ordinal.astype(str)}, index=df.index)
+
+def _locate(df, current, idx):
+    found = find_row(current, df.loc[idx], idx)
+    if found is None:
+        raise Conflict("this entry was changed or deleted elsewhere; reload the page and try again.")
+    return found
+
+def _commit(df, removed, added):
+    old_version = ledger_version()
+    new_version = save_ledger(df)
+    _notify(removed, added, old_version, new_version)
+    return df
+
+
+# ---------- Mutations ----------
+# Each mutation takes the frame the caller's row labels come from (`df`) and
+# applies the change to the current ledger under the write lock. An idx is
+# carried over to the current ledger by the row's content; if another writer
+# changed or deleted that row, Conflict is raised and nothing is written.
+# The new current ledger is returned, labelled 0..n-1 like a fresh load.
+# Edits are made on a deep copy: the current frame is shared by every
+# session, and without copy-on-write (pandas < 3) a shallow copy's .loc
+# writes would land in it.
+def _new_rows(records, user):
+    added = pd.DataFrame(records, columns=LEDGER_COLUMNS)
+    added[TEXT_COLUMNS] = added[TEXT_COLUMNS].astype(object)
+    added["User"] = added["User"].fillna(user)
+    added["Currency"] = added["Currency"].fillna(DEFAULT_CURRENCY)
+    added[TEXT_COLUMNS] = added[TEXT_COLUMNS].fillna("")
+    return added.astype({"Amount": "int64", "SinglePrice": "Int64", "Units": float})
+
+def _append(df, added):
+    return pd.concat([df, added], ignore_index=True) if not df.empty else added.reset_index(drop=True)
+
+def add_records(df, records, user=""):
+    added = _new_rows(records, user)
+    with locked():
+        out = _append(shared_ledger()[0], added)
+        return _commit(out, empty_ledger(), out.iloc[len(out) - len(added):])
+
+def update_record(df, idx, record):
+    with locked():
+        current = shared_ledger()[0]
+        idx = _locate(df, current, idx)
+        out = current.copy()
+        removed = out.loc[[idx]].copy()
+        for col, value in record.items():
+            out.loc[idx, col] = value
+        return _commit(out, removed, out.loc[[idx]])
+
+def delete_record(df, idx):
+    with locked():
+        current = shared_ledger()[0]
+        idx = _locate(df, current, idx)
+        removed = current.loc[[idx]].copy()
+        return _commit(current.drop(idx).reset_index(drop=True), removed, empty_ledger())
+
+# Any mix of adds, updates ({idx: {column: value}}) and deletes in one write
+# and one listener call, for callers that batch many mutations.
+def apply_changes(df, add=(), update=None, delete=(), user=""):
+    with locked():
+        current = shared_ledger()[0]
+        update = {_locate(df, current, idx): rec for idx, rec in (update or {}).items() if idx not in set(delete)}
+        delete = [_locate(df, current, idx) for idx in delete]
+        touched = list(dict.fromkeys(list(update) + delete))
+        out = current.copy()
+        removed = out.loc[touched].copy()
+        for idx, record in update.items():
+            for col, value in record.items():
+                out.loc[idx, col] = value
+        changed = out.loc[list(update)]
+        out = out.drop(delete).reset_index(drop=True)
+        added = _new_rows(list(add), user)
+        if len(added):
+            out = _append(out, added)
+            added = out.iloc[len(out) - len(added):]
+        return _commit(out, removed, pd.concat([changed, added]) if len(changed) else added)
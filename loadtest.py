@@ -0,0 +1,258 @@
+# loadtest.py
+import os, sys, json, time, shutil, tempfile, argparse, multiprocessing
+import numpy as np
+import pandas as pd
+
+
+# ---------- Settings ----------
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+PASSWORD = "load-test"
+CATEGORIES = {
+    "Income": ["Salary", "Business", "Other"],
+    "Expense": ["Food", "Rent", "Entertainment", "Transport", "Other"],
+    "Investment": ["Indian Stock", "Crypto Currency", "Mutual Funds", "Other"],
+}
+TIMEOUT = 120
+
+# Runs the real app.py headlessly with Streamlit's AppTest, one AppTest per
+# simulated browser, against a throwaway copy of the app with a synthetic
+# ledger. The app's modules keep their data next to their source, so the
+# sandbox gets its own copy of the code and the workers import the app's
+# modules from there, never from the working tree.
+#
+# AppTest sets up a process-wide Streamlit runtime for every run, so two
+# AppTests cannot run at once in one process. Each simulated user gets its
+# own worker process instead: they share the ledger file, as separate server
+# processes would, but not the in-process caches.
+
+
+# ---------- Sandbox ----------
+def _email(i):
+    return f"load{i:04d}@example.com"
+
+def _synthetic_rows(rows, owners, rng):
+    types = rng.choice(list(CATEGORIES), size=rows, p=[0.2, 0.7, 0.1])
+    category = [CATEGORIES[t][k % len(CATEGORIES[t])] for t, k in zip(types, rng.integers(0, 5, size=rows))]
+    units = np.where(types == "Investment", rng.integers(1, 50, size=rows), np.nan)
+    price = np.where(types == "Investment", rng.integers(100, 500000, size=rows) / 100, np.nan)
+    amount = np.where(types == "Investment", np.round(units * price, 2), rng.integers(100, 2000000, size=rows) / 100)
+    return pd.DataFrame({
+        "Type": types,
+        "Amount": amount,
+        "Category": category,
+        "Date": (pd.Timestamp.today().normalize() - pd.to_timedelta(rng.integers(0, 730, size=rows), unit="D")).strftime("%Y-%m-%d"),
+        "Note": [f"item {k}" for k in rng.integers(0, 5000, size=rows)],
+        "Units": units,
+        "SinglePrice": price,
+        "PaidVia": "",
+        "ExtraNote": "",
+        "User": rng.choice(owners, size=rows),
+        "Currency": "INR",
+    })
+
+# Copies the app's code into `path` and writes accounts for `users`
+# simulated users plus background accounts owning the rest of a `rows`-row
+# ledger. Simulated users own `user_rows` rows each. Amounts are decimal, as
+# in a pre-migration file; the app's migration converts them on first start.
+def build_sandbox(path, users, rows, user_rows, seed=0):
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(APP_DIR):
+        if name.endswith(".py"):
+            shutil.copy2(os.path.join(APP_DIR, name), path)
+    if os.path.isdir(os.path.join(APP_DIR, "Images")):
+        shutil.copytree(os.path.join(APP_DIR, "Images"), os.path.join(path, "Images"), dirs_exist_ok=True)
+
+    rng = np.random.default_rng(seed)
+    emails = [_email(i) for i in range(users)]
+    mine = min(rows, users * user_rows)
+    background = [f"background{i:04d}@example.com" for i in range(max(1, (rows - mine) // 1000))]
+    frames = [_synthetic_rows(mine, emails, rng)] if mine and emails else []
+    if rows > mine:
+        frames.append(_synthetic_rows(rows - mine, background, rng))
+    ledger = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    ledger.to_csv(os.path.join(path, "expenses.csv"), index=False)
+
+    accounts = [{"first_name": "Load", "last_name": str(i), "email": email, "password": PASSWORD,
+                 "date_joined": "2025-01-01", "plan": "Premium"} for i, email in enumerate(emails + background)]
+    with open(os.path.join(path, "accounts.json"), "w") as f:
+        json.dump(accounts, f)
+    return emails
+
+
+# ---------- Simulated user ----------
+class FlowError(Exception):
+    pass
+
+# One browser session: every rerun it triggers is timed under `action`.
+def _step(at, samples, action, operate=None):
+    start = time.perf_counter()
+    (operate(at) if operate else at).run(timeout=TIMEOUT)
+    samples.append((action, (time.perf_counter() - start) * 1000))
+    if at.exception:
+        raise FlowError(f"{action}: {at.exception[0].message}")
+    return at
+
+def _button(at, label=None, key=None):
+    for b in at.button:
+        if (key is not None and b.key == key) or (label is not None and b.label == label):
+            return b
+    raise FlowError(f"no button {label or key!r}")
+
+# The key suffix of the row buttons for the user's record `note`.
+def _row_key(at, typ, note):
+    import ledger
+    df = at.session_state["data"]
+    hits = df.index[(df["Type"] == typ) & (df["Note"] == note)]
+    if not len(hits):
+        raise FlowError(f"{typ} {note!r} not found")
+    return ledger.row_keys(df)["Key"][hits[-1]]
+
+def _open(at, page, samples):
+    at.query_params["page"] = page
+    return _step(at, samples, f"open {page}")
+
+# Add, edit and delete one record on a page, the way a person would: fill
+# the add form, submit, open the edit form from the table, change the
+# amount, submit, then delete it from the table.
+def _crud(at, samples, page, typ, prefix, edit_amount_key, fill, tag):
+    note = f"load test {tag}"
+    _open(at, page, samples)
+    fill(at, note)
+    _step(at, samples, f"add {typ}", lambda a: _button(a, f"Save {page if page != 'Expenses' else 'Expense'}").click())
+    key = _row_key(at, typ, note)
+    _step(at, samples, f"edit {typ}", lambda a: _button(a, key=f"edit_{prefix}_{key}").click())
+    at.number_input(key=edit_amount_key).set_value(42.0)
+    _step(at, samples, f"update {typ}", lambda a: _button(a, f"Update {page if page != 'Expenses' else 'Expense'}").click())
+    key = _row_key(at, typ, note)
+    _step(at, samples, f"delete {typ}", lambda a: _button(a, key=f"del_{prefix}_{key}").click())
+
+def _fill_income(at, note):
+    at.text_input(key="new_income_name").input(note)
+    at.number_input(key="new_income_amount").set_value(1500.0)
+    at.selectbox(key="new_income_category").set_value("Salary")
+    at.checkbox(key="allow_duplicate_income").check()
+
+def _fill_expense(at, note):
+    at.text_input(key="new_expense_name").input(note)
+    at.number_input(key="new_expense_amount").set_value(250.0)
+    at.selectbox(key="new_expense_category").set_value("Food")
+    at.checkbox(key="allow_duplicate_expense").check()
+
+def _fill_investment(at, note):
+    at.text_input(key="new_invest_name").input(note)
+    at.number_input(key="new_invest_units").set_value(2.0)
+    at.number_input(key="new_invest_price").set_value(99.5)
+    at.selectbox(key="new_invest_category").set_value("Other")
+    at.checkbox(key="allow_duplicate_invest").check()
+
+CRUD_PAGES = [
+    ("Expenses", "Expense", "expense", "edit_expense_amount", _fill_expense),
+    ("Income", "Income", "income", "edit_income_amount", _fill_income),
+    ("Investment", "Investment", "invest", "edit_invest_units", _fill_investment),
+]
+
+def _enter(sandbox):
+    sys.path.insert(0, sandbox)
+    os.chdir(sandbox)
+
+# One worker process: `iterations` full flows as one user. Returns the timed
+# reruns, the errors and when the user started and finished.
+def run_user(sandbox, email, iterations):
+    from streamlit.testing.v1 import AppTest
+    samples, errors = [], []
+    started = time.time()
+    for n in range(iterations):
+        try:
+            # A fresh browser with no session token starts at the login page.
+            at = AppTest.from_file(os.path.join(sandbox, "app.py"), default_timeout=TIMEOUT)
+            _step(at, samples, "open login")
+            at.text_input(key="login_email").input(email)
+            at.text_input(key="login_pass").input(PASSWORD)
+            _step(at, samples, "login", lambda a: _button(a, "Login").click())
+
+            _open(at, "Dashboard", samples)
+            _open(at, "Expenses", samples)
+            for text in ["item 1", "item", ""]:
+                at.text_input(key="filter_expense_name").input(text)
+                _step(at, samples, "filter typing")
+
+            # A record another session's write dropped fails only its page.
+            tag = f"{email} {n}"
+            for page in CRUD_PAGES:
+                try:
+                    _crud(at, samples, *page, tag)
+                except FlowError as e:
+                    errors.append(f"{email}: {e}")
+            _open(at, "Dashboard", samples)
+        except Exception as e:
+            errors.append(f"{email}: {type(e).__name__}: {e}")
+    return samples, errors, started, time.time()
+
+
+# ---------- Report ----------
+def _percentiles(ms):
+    ms = np.asarray(ms)
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"runs": int(len(ms)), "p50_ms": round(p50, 1), "p95_ms": round(p95, 1),
+            "p99_ms": round(p99, 1), "max_ms": round(ms.max(), 1)}
+
+def report(samples, seconds):
+    if not samples:
+        return {"runs": 0}
+    frame = pd.DataFrame(samples, columns=["Action", "Ms"])
+    return {
+        "reruns": len(frame),
+        "seconds": round(seconds, 2),
+        "reruns_per_second": round(len(frame) / seconds, 2) if seconds else None,
+        "latency": _percentiles(frame["Ms"]),
+        "by_action": {action: _percentiles(ms) for action, ms in frame.groupby("Action", sort=False)["Ms"]},
+    }
+
+
+# ---------- Entry point ----------
+# Builds the sandbox, starts `users` simulated users at once (each running
+# `iterations` full flows) and returns the report. Every user adds, edits
+# and deletes only its own records, so the ledger should end the run with
+# the rows it started with; a difference points at lost or repeated writes.
+def run(users=5, rows=10_000, user_rows=200, iterations=1, sandbox=None, seed=0):
+    sandbox = sandbox or tempfile.mkdtemp(prefix="smart-finance-load-")
+    emails = build_sandbox(sandbox, users, rows, user_rows, seed)
+    _enter(sandbox)
+    import ledger, migrate
+    migrate.ensure()
+    before = len(ledger.load_ledger())
+
+    # Throughput counts from the first user's start to the last user's end,
+    # leaving out worker start-up.
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(len(emails), initializer=_enter, initargs=(sandbox,)) as pool:
+        results = pool.starmap(run_user, [(sandbox, email, iterations) for email in emails])
+    samples = [s for r in results for s in r[0]]
+    errors = [e for r in results for e in r[1]]
+    seconds = max(r[3] for r in results) - min(r[2] for r in results) if results else 0
+
+    after = len(ledger.load_ledger())
+    return {
+        "users": users,
+        "iterations": iterations,
+        "ledger_rows": {"before": before, "after": after},
+        "sandbox": sandbox,
+        **report(samples, seconds),
+        "errors": {"count": len(errors), "samples": errors[:20]},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive the app with concurrent simulated users and report rerun latency.")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=10_000, help="synthetic ledger size")
+    parser.add_argument("--user-rows", type=int, default=200, help="rows owned by each simulated user")
+    parser.add_argument("--iterations", type=int, default=1, help="full flows per user")
+    parser.add_argument("--sandbox", help="directory for the app copy (default: a new temp dir)")
+    parser.add_argument("--keep", action="store_true", help="keep the sandbox afterwards")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    result = run(args.users, args.rows, args.user_rows, args.iterations, args.sandbox, args.seed)
+    if not args.keep:
+        shutil.rmtree(result["sandbox"], ignore_errors=True)
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,41 @@
+# memory.py
+import sys
+import pandas as pd
+
+
+# ---------- Sizes ----------
+# Approximate bytes held by a value: frames and series by their deep memory
+# usage, containers by their items. An object reachable twice (e.g. the same
+# frame under two keys) is counted once.
+def size_of(value, seen=None):
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(size_of(k, seen) + size_of(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(size_of(v, seen) for v in value)
+    return size
+
+# One row per session state key, largest first, and the total.
+def session_report(state):
+    seen = set()
+    rows = [
+        {"Key": str(key), "Type": type(state[key]).__name__, "Bytes": size_of(state[key], seen)}
+        for key in list(state.keys())
+    ]
+    rows.sort(key=lambda r: r["Bytes"], reverse=True)
+    return pd.DataFrame(rows, columns=["Key", "Type", "Bytes"]), sum(r["Bytes"] for r in rows)
+
+def format_bytes(n):
+    for unit in ["B", "KB", "MB"]:
+        if n < 1024:
+            return f"{n:,.0f} {unit}" if unit == "B" else f"{n:,.1f} {unit}"
+        n /= 1024
+    return f"{n:,.1f} GB"
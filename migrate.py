@@ -0,0 +1,348 @@
+# migrate.py
+import os, json, re, shutil, threading
+from datetime import datetime
+import pandas as pd
+import dedupe, ledger
+
+
+# ---------- Files for persistence ----------
+SCHEMA_FILE = os.path.join(ledger.BASE_DIR, "schema.json")
+ACCOUNTS_FILE = os.path.join(ledger.BASE_DIR, "accounts.json")
+QUARANTINE_DIR = os.path.join(ledger.BASE_DIR, "quarantine")
+LEGACY_DIR = os.path.join(ledger.BASE_DIR, "legacy")
+
+# Files written by earlier versions of the app. Once their contents are in
+# the ledger and accounts.json they are moved into LEGACY_DIR.
+LEGACY_USERS = os.path.join(ledger.BASE_DIR, "users.json")
+LOGIN_FILE = os.path.join(ledger.BASE_DIR, "login.json")
+LEGACY_DATA = os.path.join(ledger.BASE_DIR, "user_data.json")
+LEGACY_DATA_DIR = os.path.join(ledger.BASE_DIR, "user_data")
+LEGACY_FILES = [LEGACY_USERS, LOGIN_FILE, LEGACY_DATA, LEGACY_DATA_DIR]
+
+# Version 1: expenses.csv has exactly ledger.LEDGER_COLUMNS, every row has
+# a known Type, a non-negative Amount, a valid Date, a Category and a
+# Currency; accounts.json holds one account per email.
+# Version 2: Amount and SinglePrice are integer minor units. The units are
+# read from the ledger itself (see _holds_minor), never from the schema
+# stamp, which is not committed with the data.
+SCHEMA_VERSION = ledger.SCHEMA_VERSION
+MINOR_SINCE = 2
+TYPES = ["Income", "Expense", "Investment"]
+CHUNK_ROWS = 50_000
+
+_lock = threading.Lock()
+
+
+# ---------- Version check ----------
+def _load_schema():
+    if os.path.exists(SCHEMA_FILE):
+        try:
+            with open(SCHEMA_FILE, "r") as f:
+                return json.load(f)
+        except:
+            return {}
+    return {}
+
+def _header(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return f.readline().strip()
+
+def _layout_current():
+    header = _header(ledger.DATA_FILE)
+    return (
+        _load_schema().get("version") == SCHEMA_VERSION
+        and header in (None, ",".join(ledger.LEDGER_COLUMNS))
+        and not any(os.path.exists(p) for p in LEGACY_FILES)
+    )
+
+# Check run on every start: the schema stamp, the ledger's header line, its
+# metadata sidecar and the absence of legacy files. No data rows are parsed;
+# the ledger is only read (for its checksum) when it changed since the app
+# last saved it.
+def is_current():
+    return _layout_current() and (not os.path.exists(ledger.DATA_FILE) or ledger.verified())
+
+# A ledger whose checksum failed (edited outside the app, written by an
+# older version, or caught between another process's save and its sidecar)
+# is first checked with the plain typed read. If every row still meets the
+# schema only the sidecar is rewritten; otherwise the repair pass runs.
+def _check_ledger():
+    version = ledger.ledger_version()
+    try:
+        df = ledger.load_ledger()
+    except (ValueError, TypeError):
+        return False
+    valid = (
+        pd.api.types.is_datetime64_any_dtype(df["Date"]) and df["Date"].notna().all()
+        and df["Type"].isin(TYPES).all() and (df["Amount"] >= 0).all()
+        and (df["Category"] != "").all() and (df["Currency"] != "").all()
+    )
+    if valid and ledger.ledger_version() == version:
+        ledger.write_meta(ledger.DATA_FILE, ledger.describe(df))
+    return valid
+
+def ensure():
+    if is_current():
+        return None
+    with _lock, ledger.locked():
+        if is_current():
+            return None
+        if _layout_current() and _check_ledger():
+            return None
+        return migrate()
+
+
+# ---------- Tolerant readers ----------
+# Legacy JSON was written by hand-rolled code and can be cut short or hold a
+# key with no value. Empty values become null and unclosed brackets are
+# closed; a file that still does not parse is quarantined whole.
+def _repair_json(text):
+    text = re.sub(r'(:\s*)(?=[,}\]]|\s*$)', r"\1null", text.rstrip())
+    stack, in_string, escape = [], False, False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    return text.rstrip(",") + "".join(reversed(stack))
+
+def _read_json(path, quarantine):
+    with open(path, "r") as f:
+        text = f.read()
+    if not text.strip():
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        return json.loads(_repair_json(text))
+    except ValueError as e:
+        quarantine(path, f"unreadable JSON: {e}", text)
+        return None
+
+# True when the money columns of the ledger at `path` are already minor
+# units: its sidecar says so and still matches the file, or the header is
+# the full current layout and no Amount or SinglePrice holds a decimal
+# point. Decimal-unit ledgers were written from float columns, so each of
+# their amounts has one; a ledger with the current layout and whole
+# numbers only is never scaled again.
+def _holds_minor(path):
+    meta = ledger.read_meta(path) or {}
+    if meta.get("schema", 0) >= MINOR_SINCE and ledger.verified(path):
+        return True
+    if _header(path) != ",".join(ledger.LEDGER_COLUMNS):
+        return False
+    try:
+        reader = pd.read_csv(path, usecols=ledger.MONEY_COLUMNS, dtype=str, keep_default_na=False,
+                             engine="python", on_bad_lines="skip", chunksize=CHUNK_ROWS)
+        for chunk in reader:
+            if (~chunk.apply(lambda c: c.str.fullmatch(r"\s*-?\d*\s*"))).any().any():
+                return False
+    except (pd.errors.EmptyDataError, ValueError):
+        return False
+    return True
+
+# Streams the ledger in chunks; lines with the wrong number of fields are
+# handed to `quarantine` instead of failing the read.
+def _ledger_chunks(path, quarantine):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    bad = lambda line: quarantine(path, "malformed CSV line", ",".join(line))
+    try:
+        reader = pd.read_csv(path, dtype=str, keep_default_na=False, engine="python",
+                             on_bad_lines=bad, chunksize=CHUNK_ROWS)
+        for chunk in reader:
+            yield chunk
+    except pd.errors.EmptyDataError:
+        return
+
+
+# ---------- Record repair ----------
+# Brings any frame of ledger-like rows to the current schema. Rows that
+# cannot be repaired (unknown Type, missing or negative Amount, no valid
+# Date) go to quarantine; the rest get defaults for missing fields. Money
+# read as decimal units is converted to minor units unless `minor` says the
+# source already holds them.
+def _repair_rows(rows, source, quarantine, user=None, minor=False):
+    rows = rows.rename(columns={"Name": "Note"}).astype(object)
+    for c in ledger.LEDGER_COLUMNS:
+        if c not in rows.columns:
+            rows[c] = ""
+    rows = rows[ledger.LEDGER_COLUMNS].where(rows[ledger.LEDGER_COLUMNS].notna(), "")
+    text = rows[ledger.TEXT_COLUMNS].astype(str).apply(lambda c: c.str.strip())
+
+    typ = text["Type"].str.capitalize().replace({"Savings": "Investment", "Incomes": "Income", "Expenses": "Expense"})
+    amount = pd.to_numeric(rows["Amount"], errors="coerce")
+    when = pd.to_datetime(rows["Date"], errors="coerce", format="mixed")
+    reason = pd.Series("", index=rows.index)
+    reason = reason.mask(~typ.isin(TYPES), "unknown Type")
+    reason = reason.mask((reason == "") & (amount.isna() | (amount < 0)), "missing or negative Amount")
+    reason = reason.mask((reason == "") & when.isna(), "missing or invalid Date")
+    for idx in reason.index[reason != ""]:
+        quarantine(source, reason[idx], rows.loc[idx].astype(str).to_dict())
+
+    keep = reason == ""
+    out = text[keep].copy()
+    out["Type"] = typ[keep]
+    out["Date"] = when[keep].dt.strftime("%Y-%m-%d")
+    out["Units"] = pd.to_numeric(rows.loc[keep, "Units"], errors="coerce")
+    for c in ledger.MONEY_COLUMNS:
+        value = amount[keep] if c == "Amount" else pd.to_numeric(rows.loc[keep, c], errors="coerce")
+        out[c] = value.round().astype("Int64") if minor else ledger.to_minor(value).values
+    out["Amount"] = out["Amount"].astype("int64")
+    out["Category"] = out["Category"].mask(out["Category"] == "", "Other")
+    out["Currency"] = out["Currency"].str.upper().mask(out["Currency"] == "", ledger.DEFAULT_CURRENCY)
+    if user is not None:
+        out["User"] = out["User"].mask(out["User"] == "", user)
+    return out[ledger.LEDGER_COLUMNS]
+
+# to_dict() dumps under user_data/<email>.json keyed by section.
+FRAME_SECTIONS = {"incomes": "Income", "expenses": "Expense", "investments": "Investment", "savings": "Investment"}
+
+def _frame_dump_rows(dump):
+    frames = []
+    for section, typ in FRAME_SECTIONS.items():
+        if isinstance(dump.get(section), dict):
+            frame = pd.DataFrame(dump[section])
+            if not frame.empty:
+                frames.append(frame.assign(Type=typ))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+# ---------- Accounts ----------
+def _email_key(email):
+    return str(email or "").strip().lower()
+
+def _merge_accounts(sources, quarantine):
+    merged = {}
+    for source, accounts in sources:
+        if isinstance(accounts, dict):
+            accounts = list(accounts.values()) if "email" not in accounts else [accounts]
+        for acc in accounts or []:
+            if not isinstance(acc, dict) or not _email_key(acc.get("email")) or not acc.get("password"):
+                quarantine(source, "account without email or password", acc)
+                continue
+            key = _email_key(acc["email"])
+            if key in merged:
+                # The first account per email wins; later copies only fill gaps.
+                for field, value in acc.items():
+                    merged[key].setdefault(field, value)
+            else:
+                merged[key] = dict(acc, email=acc["email"].strip())
+    return list(merged.values())
+
+
+# ---------- Migration ----------
+# Reads every known data file, repairs or quarantines each record, and writes
+# one ledger (expenses.csv) and one accounts.json. Side sources only add
+# rows whose content hash is not in the ledger already. Legacy files are
+# moved to LEGACY_DIR and the schema stamp written last, so an interrupted
+# run simply runs again.
+def migrate():
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    quarantined = []
+
+    def quarantine(source, reason, record):
+        quarantined.append({"source": os.path.relpath(source, ledger.BASE_DIR), "reason": reason, "record": record})
+
+    # Accounts
+    sources = []
+    for path in [ACCOUNTS_FILE, LEGACY_USERS, LOGIN_FILE]:
+        if os.path.exists(path):
+            sources.append((path, _read_json(path, quarantine)))
+    legacy = _read_json(LEGACY_DATA, quarantine) if os.path.exists(LEGACY_DATA) else None
+    if isinstance(legacy, dict):
+        sources.append((LEGACY_DATA, legacy.get("accounts")))
+    accounts = _merge_accounts(sources, quarantine)
+    emails = {re.sub(r"[^a-z0-9.]+", "_", _email_key(a["email"])): a["email"] for a in accounts}
+
+    # Ledger, streamed chunk by chunk into a new file
+    tmp = ledger.DATA_FILE + f".{os.getpid()}.tmp"
+    seen = set()
+    stats = ledger.describe(ledger.empty_ledger())
+    with open(tmp, "w", newline="") as f:
+        f.write(",".join(ledger.LEDGER_COLUMNS) + "\n")
+        def write(rows):
+            rows.to_csv(f, header=False, index=False)
+            ledger.describe(rows, stats)
+
+        minor = os.path.exists(ledger.DATA_FILE) and _holds_minor(ledger.DATA_FILE)
+        for chunk in _ledger_chunks(ledger.DATA_FILE, quarantine):
+            rows = _repair_rows(chunk, ledger.DATA_FILE, quarantine, minor=minor)
+            seen.update(dedupe.content_hashes(dedupe.normalize(rows)))
+            write(rows)
+
+        side = []
+        if isinstance(legacy, dict):
+            for email, records in (legacy.get("financial_data") or {}).items():
+                if isinstance(records, list) and records:
+                    side.append((LEGACY_DATA, pd.DataFrame([r for r in records if isinstance(r, dict)]), email))
+        if os.path.isdir(LEGACY_DATA_DIR):
+            for name in sorted(os.listdir(LEGACY_DATA_DIR)):
+                path = os.path.join(LEGACY_DATA_DIR, name)
+                dump = _read_json(path, quarantine) if name.endswith(".json") else None
+                if not isinstance(dump, dict):
+                    continue
+                rows = _frame_dump_rows(dump)
+                owner = emails.get(name[:-len(".json")].lower())
+                if owner is None:
+                    if not rows.empty:
+                        quarantine(path, "no account matches this file", rows.astype(str).to_dict("records"))
+                    continue
+                side.append((path, rows, owner))
+        for source, rows, owner in side:
+            if rows.empty:
+                continue
+            rows = _repair_rows(rows, source, quarantine, user=owner)
+            hashes = dedupe.content_hashes(dedupe.normalize(rows))
+            fresh = ~hashes.isin(seen).values
+            seen.update(hashes)
+            write(rows[fresh])
+    os.replace(tmp, ledger.DATA_FILE)
+    ledger.write_meta(ledger.DATA_FILE, stats)
+
+    tmp = ACCOUNTS_FILE + f".{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(accounts, f)
+    os.replace(tmp, ACCOUNTS_FILE)
+
+    if quarantined:
+        os.makedirs(QUARANTINE_DIR, exist_ok=True)
+        with open(os.path.join(QUARANTINE_DIR, f"{stamp}.jsonl"), "a") as f:
+            for entry in quarantined:
+                f.write(json.dumps(entry, default=str) + "\n")
+    moved = []
+    for path in LEGACY_FILES:
+        if os.path.exists(path):
+            target = os.path.join(LEGACY_DIR, stamp, os.path.basename(path))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(path, target)
+            moved.append(os.path.basename(path))
+
+    report = {
+        "version": SCHEMA_VERSION,
+        "migrated_at": datetime.now().isoformat(timespec="seconds"),
+        "ledger_rows": stats["rows"],
+        "accounts": len(accounts),
+        "quarantined": len(quarantined),
+        "legacy_moved": moved,
+    }
+    tmp = SCHEMA_FILE + f".{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(report, f)
+    os.replace(tmp, SCHEMA_FILE)
+    return report
@@ -0,0 +1,102 @@
+# photos.py
+import os, io, hashlib, threading
+from collections import OrderedDict
+from PIL import Image, UnidentifiedImageError
+
+
+# ---------- Files for persistence ----------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PHOTO_DIR = os.path.join(BASE_DIR, "photos")            # originals, named by content hash
+THUMB_DIR = os.path.join(PHOTO_DIR, "thumbs")           # <hash>_<size>.png
+
+# Sessions keep only a photo's hash. Uploads are stored once per distinct
+# content, however many profiles use them, and pages show thumbnails that
+# are generated once and then served from a small in-process LRU shared by
+# every session.
+MAX_BYTES = 5 * 1024 * 1024
+THUMB_SIZE = 200
+FORMATS = {"JPEG": "jpg", "PNG": "png"}
+
+_lock = threading.Lock()
+_thumbs = OrderedDict()   # (hash, size) -> PNG bytes
+_CACHE_BYTES = 8 * 1024 * 1024
+_cached_bytes = 0
+
+
+def _original(digest):
+    for ext in FORMATS.values():
+        path = os.path.join(PHOTO_DIR, digest[:2], f"{digest}.{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+# Stores an uploaded image and returns its content hash. Anything that is
+# not a JPEG or PNG under MAX_BYTES is refused with ValueError.
+def put(data):
+    if len(data) > MAX_BYTES:
+        raise ValueError(f"the photo is larger than {MAX_BYTES // (1024 * 1024)} MB.")
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            fmt = img.format
+            img.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        raise ValueError("the file is not a readable image.")
+    if fmt not in FORMATS:
+        raise ValueError("only JPEG and PNG photos are supported.")
+    digest = hashlib.sha256(data).hexdigest()
+    if _original(digest) is None:
+        folder = os.path.join(PHOTO_DIR, digest[:2])
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{digest}.{FORMATS[fmt]}")
+        tmp = path + f".{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    return digest
+
+def _make_thumbnail(digest, size):
+    path = os.path.join(THUMB_DIR, f"{digest}_{size}.png")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    original = _original(digest)
+    if original is None:
+        return None
+    with Image.open(original) as img:
+        img = img.convert("RGBA")
+        img.thumbnail((size, size))
+        out = io.BytesIO()
+        img.save(out, format="PNG", optimize=True)
+    data = out.getvalue()
+    os.makedirs(THUMB_DIR, exist_ok=True)
+    tmp = path + f".{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return data
+
+# PNG thumbnail bytes fitting size x size, or None if the photo is gone.
+def thumbnail(digest, size=THUMB_SIZE):
+    global _cached_bytes
+    if not digest:
+        return None
+    key = (digest, size)
+    with _lock:
+        if key in _thumbs:
+            _thumbs.move_to_end(key)
+            return _thumbs[key]
+    data = _make_thumbnail(digest, size)
+    if data is None:
+        return None
+    with _lock:
+        if key not in _thumbs:
+            _thumbs[key] = data
+            _cached_bytes += len(data)
+            while _cached_bytes > _CACHE_BYTES and len(_thumbs) > 1:
+                _, dropped = _thumbs.popitem(last=False)
+                _cached_bytes -= len(dropped)
+    return data
+
+def cache_info():
+    with _lock:
+        return {"thumbnails": len(_thumbs), "bytes": _cached_bytes}
@@ -0,0 +1,160 @@
+# prices.py
+import os, json, threading
+import numpy as np
+import pandas as pd
+
+
+# ---------- Files for persistence ----------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PRICE_INBOX = os.path.join(BASE_DIR, "prices")        # daily price CSVs are dropped here
+PRICE_STORE = os.path.join(BASE_DIR, "price_store")   # columnar store, one .npy per column
+MANIFEST_FILE = os.path.join(PRICE_STORE, "manifest.json")
+KEYS_FILE = os.path.join(PRICE_STORE, "keys.json")
+
+PRICED_CATEGORIES = ["Indian Stock", "Crypto Currency", "Mutual Funds"]
+COLUMNS = ["code", "day", "price"]
+
+_lock = threading.Lock()   # one ingest at a time: they share temp names and the manifest
+
+
+# ---------- Keys ----------
+# A holding is identified by its Category and its name (the ledger "Note"),
+# matched case-insensitively so "TCS" and " tcs " share one price series.
+def holding_keys(category, name):
+    return category.astype(str) + "|" + name.astype(str).str.strip().str.lower()
+
+
+def _to_days(dates):
+    return pd.to_datetime(dates, errors="coerce").values.astype("datetime64[D]").astype(np.int64)
+
+
+# ---------- Store ----------
+def _load_json(path, default):
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except:
+            return default
+    return default
+
+
+def _write_json(path, obj):
+    tmp = path + f".{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+
+def load_store(mmap=True):
+    keys = _load_json(KEYS_FILE, [])
+    if not keys:
+        return keys, {c: np.empty(0, dtype=np.int64 if c != "price" else np.float64) for c in COLUMNS}
+    mode = "r" if mmap else None
+    cols = {c: np.load(os.path.join(PRICE_STORE, f"{c}.npy"), mmap_mode=mode) for c in COLUMNS}
+    return keys, cols
+
+
+def _save_store(keys, cols):
+    os.makedirs(PRICE_STORE, exist_ok=True)
+    for c in COLUMNS:
+        tmp = os.path.join(PRICE_STORE, f"{c}.{os.getpid()}.tmp.npy")
+        np.save(tmp, cols[c])
+        os.replace(tmp, os.path.join(PRICE_STORE, f"{c}.npy"))
+    _write_json(KEYS_FILE, keys)
+
+
+def _read_price_file(path):
+    try:
+        df = pd.read_csv(path)
+    except Exception:
+        return None
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    if not {"date", "category", "symbol", "price"}.issubset(df.columns):
+        return None
+    df = df[df["category"].isin(PRICED_CATEGORIES)]
+    out = pd.DataFrame({
+        "key": holding_keys(df["category"], df["symbol"]),
+        "day": _to_days(df["date"]),
+        "price": pd.to_numeric(df["price"], errors="coerce"),
+    })
+    return out[(out["day"] != np.iinfo(np.int64).min) & out["price"].notna()]
+
+
+# Ingests every CSV in the inbox that is new or changed since the last run.
+# Each file has Date, Category, Symbol, Price columns; later files win when
+# the same (holding, day) appears twice. Returns the number of files ingested.
+def ingest(inbox=PRICE_INBOX):
+    with _lock:
+        if not os.path.isdir(inbox):
+            return 0
+        manifest = _load_json(MANIFEST_FILE, {})
+        fresh, seen = [], {}
+        for entry in sorted(os.scandir(inbox), key=lambda e: e.name):
+            if not entry.is_file() or not entry.name.lower().endswith(".csv"):
+                continue
+            stat = entry.stat()
+            seen[entry.name] = [stat.st_size, stat.st_mtime_ns]
+            if manifest.get(entry.name) != seen[entry.name]:
+                frame = _read_price_file(entry.path)
+                if frame is not None:
+                    fresh.append(frame)
+        if not fresh:
+            if any(manifest.get(k) != v for k, v in seen.items()):
+                os.makedirs(PRICE_STORE, exist_ok=True)
+                _write_json(MANIFEST_FILE, {**manifest, **seen})
+            return 0
+
+        keys, cols = load_store(mmap=False)
+        old = pd.DataFrame({
+            "key": np.asarray(keys, dtype=object)[cols["code"]] if len(keys) else [],
+            "day": cols["day"],
+            "price": cols["price"],
+        })
+        merged = pd.concat([old] + fresh, ignore_index=True)
+        merged = merged.drop_duplicates(subset=["key", "day"], keep="last")
+
+        codes, uniques = pd.factorize(merged["key"], sort=True)
+        order = np.lexsort((merged["day"].values, codes))
+        _save_store(list(uniques), {
+            "code": codes[order].astype(np.int64),
+            "day": merged["day"].values[order].astype(np.int64),
+            "price": merged["price"].values[order].astype(np.float64),
+        })
+        _write_json(MANIFEST_FILE, {**manifest, **seen})
+        return len(fresh)
+
+
+# ---------- Valuation ----------
+# Marks every holding to market in one as-of join: the store is sorted by
+# (code, day), so packing both into a single int64 lets one searchsorted find
+# the last price on or before each holding's valuation date. Prices are
+# quoted in the base currency; price_scale converts them to the currency
+# the holdings' Amount is expressed in.
+def value_holdings(holdings, as_of=None, price_scale=1.0):
+    out = holdings.copy()
+    keys, cols = load_store()
+    units = pd.to_numeric(out["Units"], errors="coerce") if "Units" in out else pd.Series(np.nan, index=out.index)
+    cost = pd.to_numeric(out["Amount"], errors="coerce").fillna(0.0)
+
+    price = np.full(len(out), np.nan)
+    price_day = np.full(len(out), np.datetime64("NaT"), dtype="datetime64[D]")
+    if len(keys) and len(out):
+        lookup = pd.Series(np.arange(len(keys)), index=keys)
+        code = holding_keys(out["Category"], out["Note"]).map(lookup).fillna(-1).astype(np.int64).values
+        day = np.full(len(out), _to_days([as_of or pd.Timestamp.today()])[0], dtype=np.int64)
+
+        packed = (cols["code"] << 32) | cols["day"]
+        pos = np.searchsorted(packed, (code << 32) | day, side="right") - 1
+        hit = (code >= 0) & (pos >= 0)
+        hit[hit] = cols["code"][pos[hit]] == code[hit]
+        price[hit] = cols["price"][pos[hit]] * price_scale
+        price_day[hit] = cols["day"][pos[hit]].astype("datetime64[D]")
+
+    out["CurrentPrice"] = price
+    out["PriceDate"] = pd.to_datetime(price_day)
+    # Holdings without a price (or without units) are carried at cost.
+    current = units.values * price
+    out["CurrentValue"] = np.where(np.isnan(current), cost.values, current)
+    out["UnrealizedPnL"] = out["CurrentValue"] - cost.values
+    return out
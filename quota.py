@@ -0,0 +1,107 @@
+# quota.py
+import os, json, threading
+import ledger, migrate
+
+
+# ---------- Files for persistence ----------
+QUOTA_FILE = os.path.join(ledger.BASE_DIR, "quota.json")
+
+PLAN_LIMITS = {"Basic": 100, "Premium": 2000}
+DEFAULT_PLAN = "Basic"
+
+_lock = threading.Lock()
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+def load_counts():
+    if os.path.exists(QUOTA_FILE):
+        try:
+            with open(QUOTA_FILE, "r") as f:
+                return json.load(f)
+        except:
+            return {"ledger_version": None, "counts": {}}
+    return {"ledger_version": None, "counts": {}}
+
+def save_counts(state):
+    tmp = QUOTA_FILE + f".{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, QUOTA_FILE)
+
+
+# ---------- Counters ----------
+# Entry counts per user are kept current by the ledger listener below, so a
+# quota check is a dictionary lookup no matter how large the ledger is.
+def _bump(counts, rows, sign):
+    if rows.empty:
+        return
+    for user, n in rows["User"].fillna("").value_counts().items():
+        counts[user] = counts.get(user, 0) + sign * int(n)
+        if counts[user] <= 0:
+            counts.pop(user)
+
+def sync(df, force=False):
+    version = ledger.ledger_version()
+    with _lock:
+        state = load_counts()
+        if not force and state.get("ledger_version") == version:
+            return state
+        state = {"ledger_version": version, "counts": {}}
+        _bump(state["counts"], df, 1)
+        save_counts(state)
+        return state
+
+@ledger.on_change
+def _on_ledger_change(removed, added, old_version, new_version):
+    with _lock:
+        state = load_counts()
+        if state.get("ledger_version") != old_version:
+            return  # already stale, the next sync() recounts
+        _bump(state["counts"], removed, -1)
+        _bump(state["counts"], added, 1)
+        state["ledger_version"] = new_version
+        save_counts(state)
+
+
+# ---------- Enforcement ----------
+# The plan stored on the account, or None when there is no such account.
+def plan_of(user):
+    try:
+        with open(migrate.ACCOUNTS_FILE, "r") as f:
+            accounts = json.load(f)
+    except:
+        return None
+    acc = next((a for a in accounts if a.get("email") == user), None)
+    return None if acc is None else acc.get("plan", DEFAULT_PLAN)
+
+def limit(plan):
+    return PLAN_LIMITS.get(plan, PLAN_LIMITS[DEFAULT_PLAN])
+
+# Counts lagging the ledger (a writer outside this app, or a listener that
+# found them stale) are recounted from the current ledger first.
+def used(user):
+    state = load_counts()
+    if state.get("ledger_version") != ledger.ledger_version():
+        state = sync(ledger.shared_ledger()[0])
+    return state["counts"].get(user, 0)
+
+# Checks whether `n` more entries fit in the user's plan. A batch is taken
+# whole or not at all: by default an oversized batch raises QuotaExceeded;
+# with truncate=True the number of entries that still fit is returned and
+# the caller keeps only that many. Nothing is written here, the counter
+# moves when the ledger write lands, so callers hold ledger.locked() from
+# the check through the write; otherwise two writers can both be admitted
+# to the last free entry.
+def admit(user, plan, n, truncate=False):
+    room = max(limit(plan) - used(user), 0)
+    if n <= room:
+        return n
+    if truncate:
+        return room
+    raise QuotaExceeded(
+        f"The {plan} plan allows {limit(plan)} entries per account; "
+        f"{room} left, {n} requested."
+    )
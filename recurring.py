@@ -0,0 +1,135 @@
+# recurring.py
+import os, json, uuid, threading
+import pandas as pd
+import ledger, quota
+
+
+# ---------- Files for persistence ----------
+RULES_FILE = os.path.join(ledger.BASE_DIR, "recurring.json")
+
+CADENCES = {
+    "daily": pd.DateOffset(days=1),
+    "weekly": pd.DateOffset(weeks=1),
+    "monthly": pd.DateOffset(months=1),
+    "yearly": pd.DateOffset(years=1),
+}
+
+_lock = threading.Lock()
+
+
+def load_rules():
+    if os.path.exists(RULES_FILE):
+        try:
+            with open(RULES_FILE, "r") as f:
+                return json.load(f)
+        except:
+            return []
+    return []
+
+def save_rules(rules):
+    tmp = RULES_FILE + f".{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(rules, f)
+    os.replace(tmp, RULES_FILE)
+
+
+# ---------- Rules ----------
+def add_rule(user, typ, amount, category, note, cadence, start, end=None, currency=ledger.DEFAULT_CURRENCY):
+    rule = {
+        "id": uuid.uuid4().hex,
+        "User": user,
+        "Type": typ,
+        "Amount": float(amount),
+        "Currency": currency,
+        "Category": category,
+        "Note": note,
+        "cadence": cadence,
+        "start": pd.Timestamp(start).strftime("%Y-%m-%d"),
+        "end": pd.Timestamp(end).strftime("%Y-%m-%d") if end else None,
+        # Last date already written to the ledger; nothing after it exists yet.
+        "materialized_through": None,
+    }
+    with _lock:
+        rules = load_rules()
+        rules.append(rule)
+        save_rules(rules)
+    return rule
+
+def delete_rule(rule_id):
+    with _lock:
+        save_rules([r for r in load_rules() if r["id"] != rule_id])
+
+def user_rules(user, typ=None):
+    return [r for r in load_rules() if r["User"] == user and (typ is None or r["Type"] == typ)]
+
+
+# ---------- Occurrences ----------
+# Occurrences are anchored on the rule's start date, so a rule starting on the
+# 31st lands on the last day of shorter months rather than drifting.
+def occurrences(rule, after, through):
+    start = pd.Timestamp(rule["start"])
+    last = pd.Timestamp(through)
+    if rule.get("end"):
+        last = min(last, pd.Timestamp(rule["end"]))
+    if last < start:
+        return pd.DatetimeIndex([])
+    offset = CADENCES[rule["cadence"]]
+    if rule["cadence"] in ("daily", "weekly"):
+        dates = pd.date_range(start, last, freq=offset)
+    else:
+        # Month/year offsets are applied to the start date, not chained, to
+        # keep the day-of-month anchor.
+        step = 12 if rule["cadence"] == "yearly" else 1
+        count = (last.year - start.year) * 12 + last.month - start.month
+        months = range(0, count + 1, step)
+        dates = pd.DatetimeIndex([start + pd.DateOffset(months=m) for m in months])
+        dates = dates[dates <= last]
+    if after is not None:
+        dates = dates[dates > pd.Timestamp(after)]
+    return dates
+
+def next_occurrence(rule, today):
+    upcoming = occurrences(rule, pd.Timestamp(today) - pd.Timedelta(days=1),
+                           pd.Timestamp(today) + pd.DateOffset(years=1, days=1))
+    return upcoming[0] if len(upcoming) else None
+
+
+# ---------- Materialization ----------
+# Writes every occurrence due up to `through` that is not in the ledger yet,
+# for all of the user's rules, as one batched ledger write. Future
+# occurrences are never expanded; calling this again with the same date is a
+# no-op that costs one read of the rules file. With a plan, the batch must
+# fit the plan's quota whole (quota.QuotaExceeded otherwise) so no rule is
+# left half-materialized.
+def materialize(df, user, through, plan=None):
+    through = pd.Timestamp(through).normalize()
+    with ledger.locked(), _lock:
+        rules = load_rules()
+        records, touched = [], []
+        for rule in rules:
+            if rule["User"] != user:
+                continue
+            done = rule.get("materialized_through")
+            if done and pd.Timestamp(done) >= through:
+                continue
+            for day in occurrences(rule, done, through):
+                records.append({
+                    "Type": rule["Type"],
+                    "Amount": ledger.to_minor(rule["Amount"]),
+                    "Currency": rule.get("Currency", ledger.DEFAULT_CURRENCY),
+                    "Category": rule["Category"],
+                    "Date": day,
+                    "Note": rule["Note"],
+                    "ExtraNote": "recurring",
+                })
+            touched.append(rule)
+        if not touched:
+            return df
+        if records:
+            if plan:
+                quota.admit(user, plan, len(records))
+            df = ledger.add_records(df, records, user=user)
+        for rule in touched:
+            rule["materialized_through"] = through.strftime("%Y-%m-%d")
+        save_rules(rules)
+    return df
@@ -0,0 +1,166 @@
+# sessions.py
+import os, json, time, hashlib, secrets, threading
+from collections import OrderedDict
+import ledger
+
+
+# ---------- Files for persistence ----------
+SESSION_DIR = os.path.join(ledger.BASE_DIR, "sessions")   # <hash[:2]>/<hash>.json per login
+
+# A login is remembered per browser by a random token, not per server. The
+# token maps to the account's email and an expiry. Tokens in use are
+# answered from an in-process LRU without touching the disk; each token is
+# also kept in its own small file, so a login or logout never rewrites a
+# shared file and a restart does not log anybody out. Files are named by the
+# token's hash, so the directory holds nothing a browser could present.
+#
+# The token travels in the page URL (?sid=) because a Streamlit script
+# cannot set an HttpOnly cookie. That is a deliberate trade-off: URLs end up
+# in browser history, bookmarks, shared links and screenshots, so the token
+# is kept short-lived instead. It expires IDLE_SECONDS after it was last
+# used (every run of a logged-in page slides the expiry, at most one write
+# per TOUCH_SECONDS) and MAX_AGE_SECONDS after the login whatever happens.
+# A browser restoring its login exchanges the token for a new one, and the
+# page URL is updated; a copied link therefore works at most once and stops
+# working as soon as its owner comes back. A second tab opened from the same
+# URL has to log in again.
+IDLE_SECONDS = 12 * 3600
+MAX_AGE_SECONDS = 7 * 24 * 3600
+TOUCH_SECONDS = 600
+SWEEP_SECONDS = 3600
+
+_lock = threading.Lock()
+_cache = OrderedDict()   # token -> {"email": ..., "created": ..., "expires": ...}
+_CACHE_SIZE = 10_000
+_last_sweep = 0.0
+
+
+def _path(token):
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    return os.path.join(SESSION_DIR, digest[:2], f"{digest}.json")
+
+def _remember(token, record):
+    with _lock:
+        _cache[token] = record
+        _cache.move_to_end(token)
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+
+def _store(token, record):
+    path = _path(token)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + f".{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(record, f)
+    os.replace(tmp, path)
+    _remember(token, record)
+
+def _expires(record, now):
+    return min(now + IDLE_SECONDS, record["created"] + MAX_AGE_SECONDS)
+
+# Starts a session for `email` and returns its token. `created` carries the
+# login time over when a token is rotated.
+def create(email, created=None):
+    now = time.time()
+    token = secrets.token_urlsafe(32)
+    record = {"email": email, "created": now if created is None else created}
+    record["expires"] = _expires(record, now)
+    _store(token, record)
+    sweep()
+    return token
+
+# The record of a live token, or None. Only a token this process has not
+# seen since it started is read from disk. Records from before logins had a
+# creation time count as expired.
+def _live(token):
+    if not token:
+        return None
+    with _lock:
+        record = _cache.get(token)
+        if record is not None:
+            _cache.move_to_end(token)
+    if record is None:
+        try:
+            with open(_path(token), "r") as f:
+                record = json.load(f)
+        except:
+            return None
+        _remember(token, record)
+    if "created" not in record or record["expires"] <= time.time():
+        revoke(token)
+        return None
+    return record
+
+# The email a live token belongs to, or None.
+def lookup(token):
+    record = _live(token)
+    return record["email"] if record else None
+
+# Exchanges a live token for a new one, for a browser restoring its login.
+# Returns (email, new token), or (None, None) when the token is not live.
+# The old token is revoked first, so of two browsers presenting the same
+# token only one is let in.
+def rotate(token):
+    record = _live(token)
+    if record is None or not revoke(token):
+        return None, None
+    return record["email"], create(record["email"], record["created"])
+
+# Slides the idle expiry of a token in use, writing its file at most once
+# per TOUCH_SECONDS. A token another process has rotated or revoked since is
+# dropped here, not written back.
+def touch(token):
+    record = _live(token)
+    if record is None:
+        return
+    now = time.time()
+    if _expires(record, now) - record["expires"] >= TOUCH_SECONDS:
+        if not os.path.exists(_path(token)):
+            revoke(token)
+            return
+        _store(token, dict(record, expires=_expires(record, now)))
+
+# Ends a session. True when this call removed it, False when it was already
+# gone.
+def revoke(token):
+    if not token:
+        return False
+    with _lock:
+        _cache.pop(token, None)
+    try:
+        os.remove(_path(token))
+        return True
+    except FileNotFoundError:
+        return False
+
+
+# ---------- Expiry ----------
+# Deletes expired and unreadable session files. Runs at most once per
+# SWEEP_SECONDS from create(), or whenever called with force=True.
+def sweep(force=False):
+    global _last_sweep
+    now = time.time()
+    with _lock:
+        if not force and now - _last_sweep < SWEEP_SECONDS:
+            return 0
+        _last_sweep = now
+        for token in [t for t, r in _cache.items() if r["expires"] <= now]:
+            _cache.pop(token)
+    removed = 0
+    for folder, _, names in os.walk(SESSION_DIR):
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(folder, name)
+            try:
+                with open(path, "r") as f:
+                    expired = json.load(f)["expires"] <= now
+            except:
+                expired = True
+            if expired:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+    return removed
@@ -0,0 +1,162 @@
+# statements.py
+import os, json, re, time, html, argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+import fx, ledger, migrate
+
+
+# ---------- Settings ----------
+PERIODS = {"monthly": "%Y-%m", "yearly": "%Y"}
+OUT_DIR = os.path.join(ledger.BASE_DIR, "statements")
+TYPES = ["Income", "Expense", "Investment"]
+
+# The ledger every worker reads. It is loaded once in the parent before the
+# pool starts; forked workers share its pages copy-on-write, spawned workers
+# load it once in _init_worker.
+_ledger = None
+
+
+def _safe(user):
+    return re.sub(r"[^a-zA-Z0-9]+", "_", user) or "_shared"
+
+def load_users():
+    try:
+        with open(migrate.ACCOUNTS_FILE, "r") as f:
+            return [a["email"] for a in json.load(f) if a.get("email")]
+    except:
+        return []
+
+# The ledger plus what every statement needs, computed once for all users:
+# the base-currency value of each row and its month and year.
+def prepare(df):
+    df = df.copy()
+    df["Base"] = fx.to_base(df)
+    for period, fmt in PERIODS.items():
+        df[period] = df["Date"].dt.strftime(fmt)
+    return df
+
+def _init_worker(path):
+    global _ledger
+    if _ledger is None:
+        _ledger = prepare(ledger.load_ledger(path))
+
+
+# ---------- One user ----------
+# Emails, categories and other user-entered text are escaped before they go
+# into the page.
+def _table(frame, index_name):
+    head = "".join(f"<th>{html.escape(str(c))}</th>" for c in [index_name] + list(frame.columns))
+    body = "".join(
+        "<tr><th>" + html.escape(str(label)) + "</th>"
+        + "".join(f"<td>{ledger.format_minor(v)}</td>" for v in row) + "</tr>"
+        for label, row in zip(frame.index, frame.values.tolist())
+    )
+    return f"<table><tr>{head}</tr>{body}</table>"
+
+def _html(user, period, summary, by_category):
+    user = html.escape(user)
+    parts = [
+        "<html><head><meta charset='utf-8'>",
+        f"<title>{period.title()} statement - {user}</title>",
+        "<style>body{font-family:sans-serif}table{border-collapse:collapse}"
+        "td,th{border:1px solid #e5e7eb;padding:4px 10px;text-align:right}</style>",
+        "</head><body>",
+        f"<h2>{period.title()} statement for {user}</h2>",
+        f"<p>Amounts in {fx.BASE_CURRENCY}.</p>",
+        _table(summary, "Period"),
+    ]
+    for typ, table in by_category.items():
+        parts.append(f"<h3>{typ} by category</h3>")
+        parts.append(_table(table, "Period"))
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+# Writes <out>/<user>/<period>.csv (every transaction with its period) and
+# <out>/<user>/<period>.html (per-period totals and category breakdown).
+def write_statement(rows, user, period, out_dir):
+    folder = os.path.join(out_dir, _safe(user))
+    os.makedirs(folder, exist_ok=True)
+    rows = rows.sort_values("Date", kind="stable")
+
+    csv = rows[[period] + ledger.LEDGER_COLUMNS].rename(columns={period: "Period"})
+    for c in ledger.MONEY_COLUMNS:
+        csv[c] = ledger.format_minor(csv[c])
+    csv.to_csv(os.path.join(folder, f"{period}.csv"), index=False)
+
+    totals = rows.groupby([period, "Type", "Category"])["Base"].sum()
+    summary = totals.groupby(level=[0, 1]).sum().unstack("Type", fill_value=0).reindex(columns=TYPES, fill_value=0)
+    summary["Net"] = summary["Income"] - summary["Expense"] - summary["Investment"]
+    # One table per Type, each with only that Type's categories as columns.
+    by_category = {typ: table.droplevel("Type").unstack("Category", fill_value=0)
+                   for typ, table in totals.groupby(level="Type")}
+    with open(os.path.join(folder, f"{period}.html"), "w") as f:
+        f.write(_html(user, period, summary, by_category))
+
+
+# ---------- Workers ----------
+# One task per partition of users. The partition's rows are cut out of the
+# shared ledger in one isin() and grouped once; rows without a User belong
+# to every statement.
+def _run_partition(users, periods, out_dir):
+    df = _ledger
+    shared = df[df["User"] == ""]
+    groups = dict(tuple(df[df["User"].isin(users)].groupby("User")))
+    written, failures = 0, {}
+    for user in users:
+        try:
+            rows = pd.concat([groups.get(user, df.iloc[:0]), shared])
+            for period in periods:
+                write_statement(rows, user, period, out_dir)
+                written += 1
+        except Exception as e:
+            failures[user] = f"{type(e).__name__}: {e}"
+    return written, failures
+
+def partition(users, n):
+    return [users[i::n] for i in range(n) if users[i::n]]
+
+# Generates statements for `users` (default: every account) across a pool of
+# `workers` processes and returns a report with throughput and failures.
+def generate(out_dir=OUT_DIR, periods=tuple(PERIODS), users=None, workers=None, df=None):
+    global _ledger
+    start = time.perf_counter()
+    users = sorted(set(users if users is not None else load_users()))
+    workers = max(1, min(workers or os.cpu_count() or 1, len(users) or 1))
+    _ledger = prepare(df if df is not None else ledger.load_ledger())
+    os.makedirs(out_dir, exist_ok=True)
+
+    method = "fork" if "fork" in mp.get_all_start_methods() else "spawn"
+    written, failures = 0, {}
+    with ProcessPoolExecutor(workers, mp_context=mp.get_context(method),
+                             initializer=_init_worker, initargs=(ledger.DATA_FILE,)) as pool:
+        futures = {pool.submit(_run_partition, part, list(periods), out_dir): part
+                   for part in partition(users, workers)}
+        for future in as_completed(futures):
+            try:
+                n, failed = future.result()
+            except Exception as e:
+                n, failed = 0, {u: f"{type(e).__name__}: {e}" for u in futures[future]}
+            written += n
+            failures.update(failed)
+
+    seconds = time.perf_counter() - start
+    return {
+        "users": len(users),
+        "workers": workers,
+        "statements": written,
+        "failures": failures,
+        "seconds": round(seconds, 3),
+        "users_per_second": round(len(users) / seconds, 1) if seconds else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write monthly and yearly statements for every account.")
+    parser.add_argument("--out", default=OUT_DIR)
+    parser.add_argument("--period", choices=list(PERIODS) + ["all"], default="all")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    migrate.ensure()
+    periods = list(PERIODS) if args.period == "all" else [args.period]
+    print(json.dumps(generate(args.out, periods, workers=args.workers), indent=2))
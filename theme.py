@@ -0,0 +1,121 @@
+# theme.py
+import threading
+from collections import OrderedDict
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+
+# ---------- Styles ----------
+# Every page shares one stylesheet. It is sent as a single element at the
+# top of each run instead of a copy per page, and the dark variant applies
+# to every page, not only while Settings is open.
+STYLES = """<style>
+.metric-row{display:flex;gap:1rem;flex-wrap:wrap;}
+.metric-row .metric-card{flex:1 1 0;min-width:140px;}
+.metric-card{border:1px solid #e5e7eb;border-radius:12px;padding:14px;text-align:center;background:#fff;box-shadow:0 2px 6px rgba(0,0,0,0.05);}
+.metric-value{font-size:1.3rem;font-weight:600;}
+.metric-label{color:#6b7280;font-size:0.9rem;margin-top:4px;}
+.details-card{border:1px solid #e5e7eb;border-radius:12px;padding:16px;background:#fff;box-shadow:0 2px 6px rgba(0,0,0,0.05);}
+.details-grid{display:grid;grid-template-columns:1fr 2fr;row-gap:10px;column-gap:20px;}
+.details-label{font-weight:600;color:#374151;}
+.details-value{color:#111827;}
+</style>"""
+
+DARK_STYLES = """<style>
+body,.stApp{background-color:#111827;color:#f9fafb;}
+.metric-card,.details-card{background:#1f2937 !important;color:#f9fafb !important;}
+.details-label{color:#d1d5db !important;}
+.details-value{color:#f9fafb !important;}
+</style>"""
+
+# The Settings toggle is a widget, and Streamlit drops a widget's state on
+# runs where it is not shown, so the choice is kept under its own key.
+DARK_KEY = "theme_dark"
+
+def is_dark():
+    return bool(st.session_state.get(DARK_KEY, False))
+
+def remember_dark():
+    st.session_state[DARK_KEY] = bool(st.session_state.get("dark_mode", False))
+
+def inject():
+    meter()
+    st.markdown(STYLES + DARK_STYLES if is_dark() else STYLES, unsafe_allow_html=True)
+
+
+# ---------- Components ----------
+# A row of metric cards as one element: (icon, value, label) per card.
+def metric_row(cards):
+    body = "".join(
+        f"<div class='metric-card'>{icon}<div class='metric-value'>{value}</div>"
+        f"<div class='metric-label'>{label}</div></div>"
+        for icon, value, label in cards
+    )
+    st.markdown(f"<div class='metric-row'>{body}</div>", unsafe_allow_html=True)
+
+
+# ---------- Render payload ----------
+# Counts what each run sends to the browser: forward messages, how many of
+# them are element deltas, and their serialized size. The session's send
+# function is wrapped once; each run closes the previous run's numbers, so
+# they also cover any partial reruns in between. The wrapper relies on a
+# private attribute of Streamlit's run context; if that is missing or
+# cannot be replaced, runs are simply not metered. Both tables are bounded,
+# since nothing tells this module when a session ends.
+_lock = threading.Lock()
+_current = OrderedDict()    # session id -> counters of the run in progress
+_sessions = OrderedDict()   # session id -> last finished run
+_SESSIONS_SIZE = 1000
+_totals = {"runs": 0, "messages": 0, "deltas": 0, "bytes": 0}
+
+def _new_run():
+    return {"messages": 0, "deltas": 0, "bytes": 0}
+
+def meter():
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    session_id = ctx.session_id
+    with _lock:
+        finished = _current.pop(session_id, None)
+        if finished is not None and finished["messages"]:
+            _sessions[session_id] = finished
+            _sessions.move_to_end(session_id)
+            while len(_sessions) > _SESSIONS_SIZE:
+                _sessions.popitem(last=False)
+            _totals["runs"] += 1
+            for k in finished:
+                _totals[k] += finished[k]
+        _current[session_id] = _new_run()
+        while len(_current) > _SESSIONS_SIZE:
+            _current.popitem(last=False)
+    send = getattr(ctx, "_enqueue", None)
+    if not callable(send) or getattr(send, "_metered", False):
+        return
+
+    def metered(msg):
+        try:
+            current = _current.get(session_id)
+            if current is not None:
+                current["messages"] += 1
+                current["deltas"] += msg.HasField("delta")
+                current["bytes"] += msg.ByteSize()
+        except Exception:
+            pass
+        send(msg)
+
+    metered._metered = True
+    try:
+        ctx._enqueue = metered
+    except (AttributeError, TypeError):
+        pass
+
+# The last finished run of this session, and all finished runs in total.
+def last_run():
+    ctx = get_script_run_ctx()
+    with _lock:
+        return dict(_sessions.get(ctx.session_id, {})) if ctx else {}
+
+def totals():
+    with _lock:
+        return dict(_totals)
@@ -0,0 +1,52 @@
+# timeline.py
+import numpy as np
+import pandas as pd
+import ledger
+
+
+# ---------- Date index ----------
+# A user's rows sorted by Type and then Date, with a running total of Amount
+# down the whole frame. Each Type is one contiguous block in date order, so
+# a date range is two binary searches per Type: totals come from the running
+# total at the block edges and the rows themselves are a positional slice,
+# whatever the size of the ledger. Built once per ledger version and shared
+# like any other view, so it must not be modified in place.
+#
+# The view's amounts are in the display currency as floats. The running
+# total adds them as integer minor units, each row rounded to the cent as it
+# is shown, so a difference of two running totals is exact however long the
+# ledger; it is converted back to a decimal amount once, in total().
+def build(view_frame):
+    rows = view_frame[view_frame["Date"].notna()]
+    rows = rows.sort_values(["Type", "Date"], kind="stable").reset_index(drop=True)
+    minor = np.rint(rows["Amount"].fillna(0).to_numpy(dtype=float) * ledger.MINOR_UNITS).astype("int64")
+    # Searching an object column reads it in place; other string dtypes
+    # would be converted on every search.
+    return rows.astype({"Type": object}).assign(Running=minor.cumsum())
+
+def bounds(index):
+    if index.empty:
+        today = pd.Timestamp.today().date()
+        return today, today
+    dates = index["Date"]
+    return dates.min().date(), dates.max().date()
+
+# Positions [lo, hi) of `typ` rows dated start..end, both days included.
+def span(index, typ, start, end):
+    types = index["Type"].to_numpy()
+    first, last = np.searchsorted(types, typ, "left"), np.searchsorted(types, typ, "right")
+    dates = index["Date"].to_numpy()[first:last]
+    lo = np.datetime64(start).astype(dates.dtype)
+    hi = (np.datetime64(end) + np.timedelta64(1, "D")).astype(dates.dtype)
+    return int(first + np.searchsorted(dates, lo, "left")), int(first + np.searchsorted(dates, hi, "left"))
+
+def total(index, typ, start, end):
+    lo, hi = span(index, typ, start, end)
+    if hi <= lo:
+        return 0.0, 0
+    running = index["Running"].to_numpy()
+    return int(running[hi - 1] - (running[lo - 1] if lo else 0)) / ledger.MINOR_UNITS, hi - lo
+
+def rows(index, typ, start, end):
+    lo, hi = span(index, typ, start, end)
+    return index.iloc[lo:hi]